@@ -0,0 +1,40 @@
+"""add problem test cases
+
+Revision ID: 005
+Revises: 004
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = "005"
+down_revision: Union[str, None] = "004"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "problem_test_cases",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("problem_id", postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column("position", sa.Integer(), nullable=False),
+        sa.Column("args", postgresql.JSONB(), nullable=False),
+        sa.Column("expected", postgresql.JSONB(), nullable=True),
+        sa.Column("comparison", sa.String(), nullable=False, server_default="exact"),
+        sa.ForeignKeyConstraint(["problem_id"], ["problems.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("problem_id", "position", name="uq_problem_test_cases_position"),
+    )
+    op.create_index(op.f("ix_problem_test_cases_problem_id"), "problem_test_cases", ["problem_id"], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f("ix_problem_test_cases_problem_id"), table_name="problem_test_cases")
+    op.drop_table("problem_test_cases")
@@ -0,0 +1,40 @@
+"""add problem fixtures
+
+Revision ID: 006
+Revises: 005
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = "006"
+down_revision: Union[str, None] = "005"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "problem_fixtures",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("problem_id", postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column("name", sa.String(), nullable=False),
+        sa.Column("typecode", sa.String(length=1), nullable=False, server_default="q"),
+        sa.Column("sha256", sa.String(length=64), nullable=False),
+        sa.Column("data", sa.LargeBinary(), nullable=False),
+        sa.ForeignKeyConstraint(["problem_id"], ["problems.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("problem_id", "name", name="uq_problem_fixtures_name"),
+    )
+    op.create_index(op.f("ix_problem_fixtures_problem_id"), "problem_fixtures", ["problem_id"], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f("ix_problem_fixtures_problem_id"), table_name="problem_fixtures")
+    op.drop_table("problem_fixtures")
@@ -0,0 +1,50 @@
+"""add slug and content hash
+
+Revision ID: 007
+Revises: 006
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "007"
+down_revision: Union[str, None] = "006"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("problems", sa.Column("slug", sa.String(), nullable=True))
+    op.add_column("problems", sa.Column("content_hash", sa.String(length=64), nullable=True))
+    # Backfill slugs from titles so existing rows are matched by the importer
+    op.execute(
+        "UPDATE problems SET slug = coalesce("
+        "nullif(trim(both '-' from lower(regexp_replace(title, '[^a-zA-Z0-9]+', '-', 'g'))), ''), 'problem')"
+    )
+    # Titles that slugify alike would break the unique index: number the later ones, and
+    # fall back to the id should a numbered slug still clash with another title's
+    op.execute(
+        """
+        UPDATE problems SET slug = ranked.slug || '-' || ranked.n
+        FROM (SELECT id, slug, row_number() OVER (PARTITION BY slug ORDER BY id) AS n FROM problems) AS ranked
+        WHERE problems.id = ranked.id AND ranked.n > 1
+        """
+    )
+    op.execute(
+        """
+        UPDATE problems SET slug = slug || '-' || id
+        WHERE EXISTS (SELECT 1 FROM problems AS other WHERE other.slug = problems.slug AND other.id < problems.id)
+        """
+    )
+    op.create_index(op.f("ix_problems_slug"), "problems", ["slug"], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f("ix_problems_slug"), table_name="problems")
+    op.drop_column("problems", "content_hash")
+    op.drop_column("problems", "slug")
@@ -0,0 +1,59 @@
+"""add problem version and updated_at
+
+Revision ID: 008
+Revises: 007
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "008"
+down_revision: Union[str, None] = "007"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Columns whose change makes cached artifacts for a problem stale. content_hash covers
+# test cases and fixtures for problems managed by app.importer.
+CONTENT_COLUMNS = ["title", "description", "category", "function_name", "starter_code", "test_code", "content_hash"]
+
+
+def upgrade() -> None:
+    op.add_column("problems", sa.Column("version", sa.Integer(), nullable=False, server_default="1"))
+    op.add_column(
+        "problems",
+        sa.Column("updated_at", sa.DateTime(timezone=True), nullable=False, server_default=sa.func.now()),
+    )
+
+    new_row = ", ".join(f"NEW.{c}" for c in CONTENT_COLUMNS)
+    old_row = ", ".join(f"OLD.{c}" for c in CONTENT_COLUMNS)
+    op.execute(
+        f"""
+        CREATE FUNCTION problems_bump_version() RETURNS trigger AS $$
+        BEGIN
+            IF ROW({new_row}) IS DISTINCT FROM ROW({old_row}) THEN
+                NEW.version := OLD.version + 1;
+                NEW.updated_at := now();
+            ELSE
+                NEW.version := OLD.version;
+            END IF;
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql
+        """
+    )
+    op.execute(
+        "CREATE TRIGGER problems_bump_version BEFORE UPDATE ON problems "
+        "FOR EACH ROW EXECUTE FUNCTION problems_bump_version()"
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER IF EXISTS problems_bump_version ON problems")
+    op.execute("DROP FUNCTION IF EXISTS problems_bump_version()")
+    op.drop_column("problems", "updated_at")
+    op.drop_column("problems", "version")
@@ -0,0 +1,60 @@
+"""add problem time limit multiplier
+
+Revision ID: 011
+Revises: 010
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "011"
+down_revision: Union[str, None] = "010"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BASE_CONTENT_COLUMNS = [
+    "title",
+    "description",
+    "category",
+    "function_name",
+    "starter_code",
+    "test_code",
+    "content_hash",
+    "reference_solution",
+    "input_generator",
+]
+# The multiplier changes verdicts, so it counts as content for cache versioning
+CONTENT_COLUMNS = BASE_CONTENT_COLUMNS + ["time_limit_multiplier"]
+
+
+def _bump_version_function(columns: list[str]) -> str:
+    new_row = ", ".join(f"NEW.{c}" for c in columns)
+    old_row = ", ".join(f"OLD.{c}" for c in columns)
+    return f"""
+        CREATE OR REPLACE FUNCTION problems_bump_version() RETURNS trigger AS $$
+        BEGIN
+            IF ROW({new_row}) IS DISTINCT FROM ROW({old_row}) THEN
+                NEW.version := OLD.version + 1;
+                NEW.updated_at := now();
+            ELSE
+                NEW.version := OLD.version;
+            END IF;
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql
+        """
+
+
+def upgrade() -> None:
+    op.add_column("problems", sa.Column("time_limit_multiplier", sa.Float(), nullable=True))
+    op.execute(_bump_version_function(CONTENT_COLUMNS))
+
+
+def downgrade() -> None:
+    op.execute(_bump_version_function(BASE_CONTENT_COLUMNS))
+    op.drop_column("problems", "time_limit_multiplier")
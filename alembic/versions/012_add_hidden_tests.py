@@ -0,0 +1,65 @@
+"""add hidden tests
+
+Revision ID: 012
+Revises: 011
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "012"
+down_revision: Union[str, None] = "011"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BASE_CONTENT_COLUMNS = [
+    "title",
+    "description",
+    "category",
+    "function_name",
+    "starter_code",
+    "test_code",
+    "content_hash",
+    "reference_solution",
+    "input_generator",
+    "time_limit_multiplier",
+]
+CONTENT_COLUMNS = BASE_CONTENT_COLUMNS + ["hidden_test_code"]
+
+
+def _bump_version_function(columns: list[str]) -> str:
+    new_row = ", ".join(f"NEW.{c}" for c in columns)
+    old_row = ", ".join(f"OLD.{c}" for c in columns)
+    return f"""
+        CREATE OR REPLACE FUNCTION problems_bump_version() RETURNS trigger AS $$
+        BEGIN
+            IF ROW({new_row}) IS DISTINCT FROM ROW({old_row}) THEN
+                NEW.version := OLD.version + 1;
+                NEW.updated_at := now();
+            ELSE
+                NEW.version := OLD.version;
+            END IF;
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql
+        """
+
+
+def upgrade() -> None:
+    op.add_column("problems", sa.Column("hidden_test_code", sa.Text(), nullable=True))
+    # Existing cases stay visible, so "Run" keeps checking what it checked before
+    op.add_column(
+        "problem_test_cases", sa.Column("sample", sa.Boolean(), nullable=False, server_default=sa.text("true"))
+    )
+    op.execute(_bump_version_function(CONTENT_COLUMNS))
+
+
+def downgrade() -> None:
+    op.execute(_bump_version_function(BASE_CONTENT_COLUMNS))
+    op.drop_column("problem_test_cases", "sample")
+    op.drop_column("problems", "hidden_test_code")
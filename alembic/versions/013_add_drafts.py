@@ -0,0 +1,39 @@
+"""add drafts
+
+Revision ID: 013
+Revises: 012
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = "013"
+down_revision: Union[str, None] = "012"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "drafts",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("client_id", sa.String(length=64), nullable=False),
+        sa.Column("problem_id", postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column("code", sa.Text(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(timezone=True), nullable=False),
+        sa.ForeignKeyConstraint(["problem_id"], ["problems.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("client_id", "problem_id", name="uq_drafts_client_problem"),
+    )
+    op.create_index(op.f("ix_drafts_problem_id"), "drafts", ["problem_id"], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f("ix_drafts_problem_id"), table_name="drafts")
+    op.drop_table("drafts")
@@ -0,0 +1,74 @@
+"""add run analytics
+
+Revision ID: 014
+Revises: 013
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = "014"
+down_revision: Union[str, None] = "013"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "run_outcomes",
+        sa.Column("id", postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column("problem_id", postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column("mode", sa.String(length=16), nullable=False),
+        sa.Column("success", sa.Boolean(), nullable=False),
+        sa.Column("passed_count", sa.Integer(), nullable=False),
+        sa.Column("total_count", sa.Integer(), nullable=False),
+        sa.Column("failed_tests", postgresql.JSONB(), nullable=False),
+        sa.Column("duration_seconds", sa.Float(), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=False),
+        sa.ForeignKeyConstraint(["problem_id"], ["problems.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_run_outcomes_problem_id_created_at", "run_outcomes", ["problem_id", "created_at"])
+
+    op.create_table(
+        "problem_run_stats",
+        sa.Column("problem_id", postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column("mode", sa.String(length=16), nullable=False),
+        sa.Column("attempts", sa.Integer(), nullable=False),
+        sa.Column("passes", sa.Integer(), nullable=False),
+        sa.Column("total_seconds", sa.Float(), nullable=False),
+        sa.ForeignKeyConstraint(["problem_id"], ["problems.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("problem_id", "mode"),
+    )
+    op.create_table(
+        "problem_test_failures",
+        sa.Column("problem_id", postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column("mode", sa.String(length=16), nullable=False),
+        sa.Column("test_name", sa.String(), nullable=False),
+        sa.Column("failures", sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(["problem_id"], ["problems.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("problem_id", "mode", "test_name"),
+    )
+    op.create_table(
+        "problem_runtime_buckets",
+        sa.Column("problem_id", postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column("mode", sa.String(length=16), nullable=False),
+        sa.Column("bucket", sa.Integer(), nullable=False),
+        sa.Column("runs", sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(["problem_id"], ["problems.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("problem_id", "mode", "bucket"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("problem_runtime_buckets")
+    op.drop_table("problem_test_failures")
+    op.drop_table("problem_run_stats")
+    op.drop_index("ix_run_outcomes_problem_id_created_at", table_name="run_outcomes")
+    op.drop_table("run_outcomes")
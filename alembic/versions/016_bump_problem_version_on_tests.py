@@ -0,0 +1,100 @@
+"""bump problem version on test case and fixture changes
+
+Revision ID: 016
+Revises: 015
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "016"
+down_revision: Union[str, None] = "015"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+CONTENT_COLUMNS = [
+    "title",
+    "description",
+    "category",
+    "function_name",
+    "starter_code",
+    "test_code",
+    "content_hash",
+    "reference_solution",
+    "input_generator",
+    "time_limit_multiplier",
+    "hidden_test_code",
+    "test_shards",
+]
+# Rows of these tables are part of a problem's tests, so any change to them makes caches stale
+CHILD_TABLES = ["problem_test_cases", "problem_fixtures"]
+# Postgres allows transition tables only on single-event triggers
+EVENTS = ["INSERT", "UPDATE", "DELETE"]
+
+
+def _bump_version_function(keep_version: str) -> str:
+    new_row = ", ".join(f"NEW.{c}" for c in CONTENT_COLUMNS)
+    old_row = ", ".join(f"OLD.{c}" for c in CONTENT_COLUMNS)
+    return f"""
+        CREATE OR REPLACE FUNCTION problems_bump_version() RETURNS trigger AS $$
+        BEGIN
+            IF ROW({new_row}) IS DISTINCT FROM ROW({old_row}) THEN
+                NEW.version := OLD.version + 1;
+                NEW.updated_at := now();
+            ELSE
+                NEW.version := {keep_version};
+            END IF;
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql
+        """
+
+
+def _transition_tables(event: str) -> str:
+    if event == "INSERT":
+        return "REFERENCING NEW TABLE AS new_rows"
+    if event == "DELETE":
+        return "REFERENCING OLD TABLE AS old_rows"
+    return "REFERENCING NEW TABLE AS new_rows OLD TABLE AS old_rows"
+
+
+def upgrade() -> None:
+    # Keep a version raised by the child table triggers below; it still never goes back
+    op.execute(_bump_version_function("GREATEST(OLD.version, NEW.version)"))
+    op.execute(
+        """
+        CREATE FUNCTION problem_tests_bump_version() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP = 'INSERT' THEN
+                UPDATE problems SET version = version + 1, updated_at = now()
+                WHERE id IN (SELECT problem_id FROM new_rows);
+            ELSIF TG_OP = 'DELETE' THEN
+                UPDATE problems SET version = version + 1, updated_at = now()
+                WHERE id IN (SELECT problem_id FROM old_rows);
+            ELSE
+                UPDATE problems SET version = version + 1, updated_at = now()
+                WHERE id IN (SELECT problem_id FROM new_rows UNION SELECT problem_id FROM old_rows);
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+        """
+    )
+    for table in CHILD_TABLES:
+        for event in EVENTS:
+            op.execute(
+                f"CREATE TRIGGER {table}_{event.lower()}_bump_version AFTER {event} ON {table} "
+                f"{_transition_tables(event)} FOR EACH STATEMENT EXECUTE FUNCTION problem_tests_bump_version()"
+            )
+
+
+def downgrade() -> None:
+    for table in CHILD_TABLES:
+        for event in EVENTS:
+            op.execute(f"DROP TRIGGER IF EXISTS {table}_{event.lower()}_bump_version ON {table}")
+    op.execute("DROP FUNCTION IF EXISTS problem_tests_bump_version()")
+    op.execute(_bump_version_function("OLD.version"))
@@ -0,0 +1,158 @@
+"""
+Per-problem run analytics for instructors.
+
+Every run's verdict is appended to ``run_outcomes`` and, at the same time, folded into
+aggregate tables keyed by (problem, mode): attempt and pass counters, a failure count per
+test, and a histogram of run durations in log-scaled buckets. All four are written by
+``BatchWriter``s, so the aggregates are maintained incrementally - a flush adds the
+deltas gathered since the last one - and reading them never touches the raw outcomes.
+A problem's report costs the same whether it has seen ten runs or ten million.
+"""
+
+import datetime
+import math
+import os
+import uuid
+from typing import Any
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.batch_writer import BatchWriter
+from app.models import ProblemRunStats, ProblemRuntimeBucket, ProblemTestFailure, RunOutcome
+from app.results import ExecutionResult
+from app.runtime_stats import reached_sandbox
+
+ANALYTICS_FLUSH_SECONDS = float(os.getenv("ANALYTICS_FLUSH_SECONDS", "10"))
+
+# Runtime buckets per doubling: bucket b covers [2^(b/4), 2^((b+1)/4)) milliseconds, about 19% wide
+BUCKETS_PER_DOUBLING = 4
+# Tests listed in a report's failure histogram
+TOP_FAILING_TESTS = 20
+
+outcome_writer = BatchWriter(RunOutcome, ["id"], interval=ANALYTICS_FLUSH_SECONDS)
+stats_writer = BatchWriter(
+    ProblemRunStats,
+    ["problem_id", "mode"],
+    interval=ANALYTICS_FLUSH_SECONDS,
+    increment_columns=["attempts", "passes", "total_seconds"],
+)
+failure_writer = BatchWriter(
+    ProblemTestFailure,
+    ["problem_id", "mode", "test_name"],
+    interval=ANALYTICS_FLUSH_SECONDS,
+    increment_columns=["failures"],
+)
+runtime_writer = BatchWriter(
+    ProblemRuntimeBucket,
+    ["problem_id", "mode", "bucket"],
+    interval=ANALYTICS_FLUSH_SECONDS,
+    increment_columns=["runs"],
+)
+analytics_writers = [outcome_writer, stats_writer, failure_writer, runtime_writer]
+
+
+def runtime_bucket(seconds: float) -> int:
+    milliseconds = seconds * 1000
+    return max(0, math.floor(BUCKETS_PER_DOUBLING * math.log2(milliseconds))) if milliseconds >= 1 else 0
+
+
+def bucket_seconds(bucket: int) -> float:
+    """Geometric middle of a bucket."""
+    return 2 ** ((bucket + 0.5) / BUCKETS_PER_DOUBLING) / 1000
+
+
+def record_outcome(problem_id: uuid.UUID, mode: str, seconds: float, result: ExecutionResult) -> None:
+    """Queue a run's verdict for the raw log and add it to the problem's aggregates."""
+    failed_tests = sorted({test.name for test in result.test_results if not test.passed})
+    outcome_writer.put(
+        {
+            "id": uuid.uuid4(),
+            "problem_id": problem_id,
+            "mode": mode,
+            "success": result.success,
+            "passed_count": result.passed_count,
+            "total_count": result.total_count,
+            "failed_tests": failed_tests,
+            "duration_seconds": seconds,
+            "created_at": datetime.datetime.now(datetime.timezone.utc),
+        }
+    )
+    # Code rejected before it ran counts as an attempt, but says nothing about runtime
+    ran = reached_sandbox(result)
+    stats_writer.put(
+        {
+            "problem_id": problem_id,
+            "mode": mode,
+            "attempts": 1,
+            "passes": int(result.success),
+            "total_seconds": seconds if ran else 0.0,
+        }
+    )
+    for name in failed_tests:
+        failure_writer.put({"problem_id": problem_id, "mode": mode, "test_name": name, "failures": 1})
+    if ran:
+        runtime_writer.put({"problem_id": problem_id, "mode": mode, "bucket": runtime_bucket(seconds), "runs": 1})
+
+
+def median_runtime(buckets: list[tuple[int, int]]) -> float | None:
+    """Median duration from (bucket, runs) pairs, to the bucket's resolution."""
+    total = sum(runs for _, runs in buckets)
+    seen = 0
+    for bucket, runs in sorted(buckets):
+        seen += runs
+        if seen * 2 >= total:
+            return bucket_seconds(bucket)
+    return None
+
+
+def problem_report(db: Session, problem_id: uuid.UUID) -> dict[str, Any]:
+    """A problem's analytics per mode, as of the last flush; reads only the aggregates."""
+    report: dict[str, dict[str, Any]] = {}
+    for stats in db.scalars(select(ProblemRunStats).where(ProblemRunStats.problem_id == problem_id)):
+        report[stats.mode] = {
+            "attempts": stats.attempts,
+            "passes": stats.passes,
+            "pass_rate": round(stats.passes / stats.attempts, 4) if stats.attempts else None,
+            "median_runtime_seconds": None,
+            "failing_tests": [],
+        }
+
+    buckets: dict[str, list[tuple[int, int]]] = {}
+    for mode, bucket, runs in db.execute(
+        select(ProblemRuntimeBucket.mode, ProblemRuntimeBucket.bucket, ProblemRuntimeBucket.runs).where(
+            ProblemRuntimeBucket.problem_id == problem_id
+        )
+    ):
+        buckets.setdefault(mode, []).append((bucket, runs))
+    for mode, pairs in buckets.items():
+        median = median_runtime(pairs)
+        if mode in report and median is not None:
+            report[mode]["median_runtime_seconds"] = round(median, 4)
+
+    for mode, test_name, failures in db.execute(
+        select(ProblemTestFailure.mode, ProblemTestFailure.test_name, ProblemTestFailure.failures)
+        .where(ProblemTestFailure.problem_id == problem_id)
+        .order_by(ProblemTestFailure.failures.desc())
+    ):
+        if mode in report and len(report[mode]["failing_tests"]) < TOP_FAILING_TESTS:
+            report[mode]["failing_tests"].append({"name": test_name, "failures": failures})
+    return report
+
+
+def summary_report(db: Session) -> list[dict[str, Any]]:
+    """Attempts and pass rate of every problem that has been run, per mode."""
+    return [
+        {
+            "problem_id": str(stats.problem_id),
+            "mode": stats.mode,
+            "attempts": stats.attempts,
+            "passes": stats.passes,
+            "pass_rate": round(stats.passes / stats.attempts, 4) if stats.attempts else None,
+        }
+        for stats in db.scalars(select(ProblemRunStats).order_by(ProblemRunStats.attempts.desc()))
+    ]
+
+
+def analytics_metrics() -> dict[str, Any]:
+    return {writer.model.__tablename__: writer.metrics() for writer in analytics_writers}
@@ -0,0 +1,187 @@
+"""
+Coalesced, batched database writes.
+
+Hot paths hand rows to a ``BatchWriter`` instead of writing them. Pending rows are kept
+in memory by key, so repeated writes to one key between flushes only replace the
+pending row. A background task upserts everything pending every ``interval`` seconds,
+in a few multi-row statements and one transaction. Database write load then follows the
+flush interval and the number of distinct keys, not the request rate.
+
+Counter rows (``increment_columns``) are deltas instead: pending deltas for a key are summed,
+and the flush adds them to the stored counts, so aggregates are maintained without reads.
+"""
+
+import asyncio
+import logging
+import threading
+from typing import Any
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import DataError, IntegrityError
+
+from app.database import SessionLocal
+
+logger = logging.getLogger("uvicorn.error.batch_writer")
+
+# Rows per INSERT ... ON CONFLICT statement
+UPSERT_BATCH_SIZE = 500
+# Errors caused by the rows themselves (say, their problem was deleted), not by the database
+ROW_ERRORS = (IntegrityError, DataError)
+
+
+class BatchWriter:
+    """
+    Upserts rows of ``model`` keyed by ``key_columns``, coalescing writes between flushes.
+
+    With ``newer_column``, a flushed row only replaces a stored one whose value in that
+    column is older, so processes flushing out of order can't roll a row back. Columns in
+    ``increment_columns`` are added to, both between flushes and in the database.
+    """
+
+    def __init__(
+        self,
+        model: Any,
+        key_columns: list[str],
+        interval: float,
+        max_pending: int = 10000,
+        newer_column: str | None = None,
+        increment_columns: list[str] | None = None,
+    ):
+        self.model = model
+        self.key_columns = key_columns
+        self.interval = interval
+        self.max_pending = max_pending
+        self.newer_column = newer_column
+        self.increment_columns = increment_columns or []
+        self._pending: dict[tuple, dict[str, Any]] = {}
+        # Rows taken by a flush that is still writing them; still newer than the stored ones
+        self._flushing: dict[tuple, dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._flush_soon: asyncio.Event | None = None
+        self.writes = 0
+        self.coalesced = 0
+        self.flushes = 0
+        self.flushed_rows = 0
+        self.failures = 0
+        self.dropped_rows = 0
+
+    def key(self, row: dict[str, Any]) -> tuple:
+        return tuple(row[column] for column in self.key_columns)
+
+    def _merge(self, key: tuple, row: dict[str, Any]) -> None:
+        """Fold ``row`` into the pending row for ``key``; the caller holds the lock."""
+        previous = self._pending.get(key)
+        if previous is not None and self.increment_columns:
+            row = {**row, **{column: previous[column] + row[column] for column in self.increment_columns}}
+        self._pending[key] = row
+
+    def put(self, row: dict[str, Any]) -> None:
+        """Queue ``row`` for the next flush, replacing (or adding to) any pending row with the same key."""
+        key = self.key(row)
+        with self._lock:
+            if key in self._pending:
+                self.coalesced += 1
+            self._merge(key, row)
+            self.writes += 1
+            full = len(self._pending) >= self.max_pending
+        if full and self._flush_soon is not None:
+            self._flush_soon.set()
+
+    def pending(self, key: tuple) -> dict[str, Any] | None:
+        """The row waiting to be written for ``key``, which is newer than the stored one (not for counters)."""
+        with self._lock:
+            return self._pending.get(key) or self._flushing.get(key)
+
+    def _upsert(self, rows: list[dict[str, Any]]) -> None:
+        table = self.model.__table__
+        with SessionLocal() as db:
+            for start in range(0, len(rows), UPSERT_BATCH_SIZE):
+                stmt = insert(table).values(rows[start : start + UPSERT_BATCH_SIZE])
+                update = {c: stmt.excluded[c] for c in rows[0] if c not in self.key_columns}
+                for column in self.increment_columns:
+                    update[column] = table.c[column] + stmt.excluded[column]
+                where = None
+                if self.newer_column:
+                    where = table.c[self.newer_column] < stmt.excluded[self.newer_column]
+                db.execute(stmt.on_conflict_do_update(index_elements=self.key_columns, set_=update, where=where))
+            db.commit()
+
+    def _requeue(self, rows: list[dict[str, Any]]) -> None:
+        """
+        Put unwritten rows back for the next flush, unless a newer write has replaced them;
+        counter deltas are added to whatever has accumulated since.
+        """
+        with self._lock:
+            for row in rows:
+                key = self.key(row)
+                if self.increment_columns:
+                    self._merge(key, row)
+                else:
+                    self._pending.setdefault(key, row)
+
+    def _upsert_each(self, rows: list[dict[str, Any]]) -> list[dict[str, Any]]:
+        """Write ``rows`` one at a time, dropping each that can't be written; returns those written."""
+        written = []
+        for index, row in enumerate(rows):
+            try:
+                self._upsert([row])
+            except ROW_ERRORS as e:
+                self.dropped_rows += 1
+                logger.warning("Dropped a %s row that could not be written: %s", self.model.__tablename__, e)
+            except Exception:
+                self._requeue(rows[index:])
+                raise
+            else:
+                written.append(row)
+        return written
+
+    def flush(self) -> int:
+        """Write every pending row in one transaction; returns the number written."""
+        with self._lock:
+            self._flushing, self._pending = self._pending, {}
+            rows = list(self._flushing.values())
+        if not rows:
+            return 0
+        try:
+            try:
+                self._upsert(rows)
+            except ROW_ERRORS:
+                # Some row can't be written; write the others one by one
+                self.failures += 1
+                rows = self._upsert_each(rows)
+            except Exception:
+                self.failures += 1
+                self._requeue(rows)
+                raise
+        finally:
+            with self._lock:
+                self._flushing = {}
+        self.flushes += 1
+        self.flushed_rows += len(rows)
+        return len(rows)
+
+    async def flush_forever(self) -> None:
+        """Flush every ``interval`` seconds, or sooner once ``max_pending`` rows are waiting."""
+        self._flush_soon = asyncio.Event()
+        while True:
+            try:
+                await asyncio.wait_for(self._flush_soon.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_soon.clear()
+            try:
+                await run_in_threadpool(self.flush)
+            except Exception as e:
+                logger.warning("Flushing %s failed: %s", self.model.__tablename__, e)
+
+    def metrics(self) -> dict[str, int]:
+        return {
+            "pending": len(self._pending),
+            "writes": self.writes,
+            "coalesced": self.coalesced,
+            "flushes": self.flushes,
+            "flushed_rows": self.flushed_rows,
+            "failures": self.failures,
+            "dropped_rows": self.dropped_rows,
+        }
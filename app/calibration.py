@@ -0,0 +1,147 @@
+"""
+Host-calibrated time limits.
+
+A problem with a reference solution and a ``time_limit_multiplier`` gets a time limit
+of ``multiplier`` times the reference solution's runtime, as measured on this host
+rather than a fixed number of seconds. Each web process times the reference (minus the
+fixed cost of starting a sandbox) at startup and again every
+``CALIBRATION_INTERVAL_SECONDS``. A slower or busier machine therefore gets
+proportionally longer limits, while an O(n^2) submission still times out where the
+O(n) reference would not.
+"""
+
+import asyncio
+import logging
+import os
+import statistics
+import time
+import uuid
+from collections.abc import Callable
+from typing import Any
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select
+from sqlalchemy.orm import Session, undefer
+
+from app.code_executor import execute_code_secure
+from app.database import SessionLocal
+from app.models import Problem
+from app.scheduler import scheduler
+
+logger = logging.getLogger("uvicorn.error.calibration")
+
+DEFAULT_TIME_LIMIT = 5.0
+MIN_TIME_LIMIT = float(os.getenv("MIN_TIME_LIMIT", "1.0"))
+MAX_TIME_LIMIT = float(os.getenv("MAX_TIME_LIMIT", "10.0"))
+CALIBRATION_INTERVAL_SECONDS = float(os.getenv("CALIBRATION_INTERVAL_SECONDS", "600"))
+
+# Timed runs per measurement; the median is kept
+CALIBRATION_RUNS = 3
+
+OVERHEAD_CODE = "def calibrate(x):\n    return x\n"
+OVERHEAD_TESTS = (
+    "from calibration.calibrate import calibrate\n\n\ndef test_calibrate():\n    assert calibrate(1) == 1\n"
+)
+
+
+def timed_run(**kwargs: Any) -> float | None:
+    """Median wall time of a passing sandbox run, or None if it doesn't pass."""
+    durations = []
+    for _ in range(CALIBRATION_RUNS):
+        started = time.perf_counter()
+        result = execute_code_secure(timeout=MAX_TIME_LIMIT, **kwargs)
+        durations.append(time.perf_counter() - started)
+        if not result.success:
+            return None
+    return statistics.median(durations)
+
+
+class Calibrator:
+    """Per-problem time limits measured on this host, keyed by problem version."""
+
+    def __init__(self) -> None:
+        self.overhead: float | None = None
+        self._limits: dict[uuid.UUID, tuple[int, float]] = {}
+        self.calibrated_at: float | None = None
+        self.failures = 0
+
+    def time_limit(self, problem: Problem) -> float:
+        """The problem's calibrated limit, or the default until it has been measured."""
+        entry = self._limits.get(problem.id)
+        if entry is None or entry[0] != problem.version:
+            return DEFAULT_TIME_LIMIT
+        return entry[1]
+
+    def measure_overhead(self) -> None:
+        overhead = timed_run(user_code=OVERHEAD_CODE, test_code=OVERHEAD_TESTS, module_path="calibration.calibrate")
+        if overhead is not None:
+            self.overhead = overhead
+
+    def calibrate(self, problem: Problem, job: dict[str, Any]) -> float | None:
+        """Time the reference solution against the problem's tests and store the resulting limit."""
+        # Unsharded: a run that gets no spare cores gets the same limit in a single process
+        reference_time = timed_run(user_code=str(problem.reference_solution), **{**job, "shards": 1})
+        if reference_time is None:
+            self.failures += 1
+            logger.warning("Reference solution for problem %s does not pass its tests; not calibrated", problem.id)
+            return None
+        overhead = min(self.overhead or 0.0, reference_time)
+        work = reference_time - overhead
+        limit = overhead + float(problem.time_limit_multiplier) * work
+        limit = max(MIN_TIME_LIMIT, min(MAX_TIME_LIMIT, limit))
+        self._limits[problem.id] = (int(problem.version), limit)
+        return limit
+
+    async def refresh(self, load_job: Callable[[Session, Problem], dict[str, Any]]) -> None:
+        """Re-measure the sandbox overhead and every problem with a calibrated time limit."""
+        started = time.monotonic()
+        # Calibration runs take sandbox slots like submissions, so they measure the host as users see it
+        async with scheduler.slot("calibration"):
+            await run_in_threadpool(self.measure_overhead)
+
+        with SessionLocal() as db:
+            problems = db.scalars(
+                select(Problem)
+                .options(undefer(Problem.reference_solution), undefer(Problem.hidden_test_code))
+                .where(Problem.reference_solution.is_not(None), Problem.time_limit_multiplier.is_not(None))
+            ).all()
+            jobs = [(problem, load_job(db, problem)) for problem in problems]
+
+        for problem, job in jobs:
+            async with scheduler.slot("calibration"):
+                await run_in_threadpool(self.calibrate, problem, job)
+
+        live = {problem.id for problem in problems}
+        for problem_id in list(self._limits):
+            if problem_id not in live:
+                del self._limits[problem_id]
+        self.calibrated_at = time.time()
+        logger.info(
+            "Calibrated %d time limits in %.1fs (sandbox overhead %.3fs)",
+            len(self._limits),
+            time.monotonic() - started,
+            self.overhead or 0.0,
+        )
+
+    async def refresh_forever(
+        self,
+        load_job: Callable[[Session, Problem], dict[str, Any]],
+        interval: float = CALIBRATION_INTERVAL_SECONDS,
+    ) -> None:
+        while True:
+            try:
+                await self.refresh(load_job)
+            except Exception as e:
+                logger.warning("Time limit calibration failed: %s", e)
+            await asyncio.sleep(interval)
+
+    def metrics(self) -> dict[str, Any]:
+        return {
+            "overhead_seconds": self.overhead,
+            "problems": len(self._limits),
+            "failures": self.failures,
+            "calibrated_at": self.calibrated_at,
+        }
+
+
+calibrator = Calibrator()
@@ -0,0 +1,176 @@
+"""
+Sampled capture of slow and failed runs, for offline replay.
+
+A run is notable when it timed out, failed as a whole (crashed, flooded its output or
+couldn't load the tests) or took ``CAPTURE_SLOW_FACTOR`` times its problem's expected
+runtime. A ``CAPTURE_SAMPLE_RATE`` fraction of notable runs is written to ``CAPTURE_DIR``,
+one JSON file each: the code and its hash, the problem and version, the exact job and time
+limit it ran with, its duration and verdict, and the state of the host at the time. The
+oldest files are removed past ``MAX_CAPTURES``. ``python -m app.replay`` re-runs them.
+
+Captures hold submitted code, so the directory should be treated like the database.
+"""
+
+import datetime
+import hashlib
+import json
+import logging
+import os
+import platform
+import random
+import socket
+import tempfile
+import uuid
+from pathlib import Path
+from typing import Any, NamedTuple
+
+from fastapi.concurrency import run_in_threadpool
+
+from app.executors import executor
+from app.results import ExecutionResult
+from app.runtime_stats import reached_sandbox, runtime_stats
+from app.scheduler import scheduler
+
+logger = logging.getLogger("uvicorn.error.captures")
+
+CAPTURE_DIR = Path(os.getenv("CAPTURE_DIR", Path(tempfile.gettempdir()) / "algorithms-captures"))
+CAPTURE_SAMPLE_RATE = float(os.getenv("CAPTURE_SAMPLE_RATE", "0.2"))
+CAPTURE_SLOW_FACTOR = float(os.getenv("CAPTURE_SLOW_FACTOR", "3.0"))
+MAX_CAPTURES = int(os.getenv("MAX_CAPTURES", "1000"))
+
+# Runs faster than this are never slow enough to be worth capturing
+MIN_SLOW_SECONDS = 0.5
+# Output kept with a capture
+MAX_CAPTURED_OUTPUT_CHARS = 4000
+
+
+class RunContext(NamedTuple):
+    """What a run executed: enough to repeat it exactly."""
+
+    problem_id: uuid.UUID
+    version: int
+    mode: str
+    code: str
+    job: dict[str, Any]
+    time_limit: float
+    # Ran in an editor session's warm sandbox rather than on the executor backend
+    session: bool = False
+
+
+def code_hash(code: str) -> str:
+    return hashlib.sha256(code.encode("utf-8")).hexdigest()
+
+
+def capture_reason(seconds: float, expected: float, result: ExecutionResult) -> str | None:
+    """Why a run is worth capturing ("timeout", "error" or "slow"), or None."""
+    if not reached_sandbox(result):
+        return None
+    if result.error and result.error.startswith("Execution timed out"):
+        return "timeout"
+    if not result.success and result.total_count == 0:
+        return "error"
+    if seconds >= max(MIN_SLOW_SECONDS, CAPTURE_SLOW_FACTOR * expected):
+        return "slow"
+    return None
+
+
+def environment() -> dict[str, Any]:
+    """The host's state when a run was captured."""
+    metrics = scheduler.metrics()
+    return {
+        "hostname": socket.gethostname(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "load_average": os.getloadavg(),
+        "executor": executor.name,
+        "slots": metrics["slots"],
+        "in_flight": metrics["in_flight"],
+        "queued": metrics["queued"],
+        "background_in_flight": metrics["background_in_flight"],
+        "backlog_seconds": metrics["backlog_seconds"],
+    }
+
+
+class CaptureStore:
+    """Notable runs as JSON files in ``directory``, at most ``max_captures`` of them."""
+
+    def __init__(self, directory: Path, sample_rate: float, max_captures: int):
+        self.directory = directory
+        self.sample_rate = sample_rate
+        self.max_captures = max_captures
+        self.captured = 0
+        self.skipped = 0
+        self.errors = 0
+
+    def save(self, context: RunContext, seconds: float, result: ExecutionResult, reason: str) -> Path:
+        captured_at = datetime.datetime.now(datetime.timezone.utc)
+        capture = {
+            "id": uuid.uuid4().hex,
+            "captured_at": captured_at.isoformat(),
+            "reason": reason,
+            "problem_id": str(context.problem_id),
+            "problem_version": context.version,
+            "mode": context.mode,
+            "session": context.session,
+            "code_hash": code_hash(context.code),
+            "code": context.code,
+            "job": context.job,
+            "time_limit": context.time_limit,
+            "seconds": seconds,
+            "expected_seconds": runtime_stats.expected((context.problem_id, context.mode)),
+            "result": {
+                "success": result.success,
+                "error": result.error,
+                "passed_count": result.passed_count,
+                "failed_count": result.failed_count,
+                "total_count": result.total_count,
+                "not_run_count": result.not_run_count,
+                "output": result.output[:MAX_CAPTURED_OUTPUT_CHARS],
+            },
+            "environment": environment(),
+        }
+        self.directory.mkdir(parents=True, exist_ok=True)
+        # Timestamped names sort oldest first
+        path = self.directory / f"{captured_at:%Y%m%dT%H%M%S%f}-{capture['id']}.json"
+        tmp_path = path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(capture, default=str), encoding="utf-8")
+        tmp_path.replace(path)
+        self._prune()
+        self.captured += 1
+        return path
+
+    def _prune(self) -> None:
+        paths = sorted(self.directory.glob("*.json"))
+        for path in paths[: max(0, len(paths) - self.max_captures)]:
+            path.unlink(missing_ok=True)
+
+    def load(self) -> list[dict[str, Any]]:
+        """Every capture in the store, oldest first."""
+        captures = []
+        for path in sorted(self.directory.glob("*.json")):
+            try:
+                captures.append(json.loads(path.read_text(encoding="utf-8")))
+            except (OSError, ValueError) as e:
+                logger.warning("Skipping unreadable capture %s: %s", path.name, e)
+        return captures
+
+    async def consider(self, context: RunContext, seconds: float, result: ExecutionResult) -> None:
+        """Capture the run if it is notable and sampled; call before its duration is recorded."""
+        reason = capture_reason(seconds, runtime_stats.expected((context.problem_id, context.mode)), result)
+        if reason is None:
+            return
+        if random.random() >= self.sample_rate:
+            self.skipped += 1
+            return
+        try:
+            await run_in_threadpool(self.save, context, seconds, result, reason)
+        except OSError as e:
+            self.errors += 1
+            logger.warning("Capturing a %s run failed: %s", reason, e)
+
+    def metrics(self) -> dict[str, Any]:
+        return {"captured": self.captured, "skipped": self.skipped, "errors": self.errors}
+
+
+captures = CaptureStore(CAPTURE_DIR, CAPTURE_SAMPLE_RATE, MAX_CAPTURES)
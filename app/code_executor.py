@@ -1,12 +1,16 @@
 import ast
+import functools
+import json
 import os
+import re
+import shutil
+import signal
 import subprocess
-import sys
-import tempfile
-import traceback
 from pathlib import Path
 from typing import Any
 
+from app.results import ExecutionResult, ProfileReport, StressSummary, TestResult, ValueDiff
+
 
 # Allowed imports - only safe built-in modules
 ALLOWED_IMPORTS = {
@@ -149,12 +153,67 @@ BLOCKED_MODULES = {
     "atexit",
     "traceback",
     "__future__",
+    # The runner's own module and the real builtins, which reach everything it holds
+    "__main__",
+    "builtins",
+}
+
+# Attributes that walk from the user's objects to the runner's frames and the job they hold
+# (``sys`` too, which other modules such as ``typing`` import). Imported modules' private
+# attributes (``collections._sys``) are refused as well, and getattr and friends only take
+# constant names, so none of these can be reached by a name built at run time.
+BLOCKED_ATTRIBUTES = {
+    "sys",
+    "_getframe",
+    "_current_frames",
+    "tb_frame",
+    "gi_frame",
+    "cr_frame",
+    "ag_frame",
+    "f_back",
+    "f_globals",
+    "f_locals",
+    "f_builtins",
+    "__globals__",
+    "__subclasses__",
 }
 
 
+# Builtins taking an attribute name as their second argument
+ATTRIBUTE_BUILTINS = ("getattr", "hasattr", "setattr", "delattr")
+
+
+def imported_names(tree: ast.AST) -> set[str]:
+    """Names the code binds to imported modules and their members."""
+    names = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            names.update(alias.asname or alias.name.split(".")[0] for alias in node.names)
+        elif isinstance(node, ast.ImportFrom):
+            names.update(alias.asname or alias.name for alias in node.names)
+    return names
+
+
+def root_name(node: ast.AST) -> str | None:
+    """The name an attribute chain like ``a.b.c`` starts from."""
+    while isinstance(node, ast.Attribute):
+        node = node.value
+    return node.id if isinstance(node, ast.Name) else None
+
+
 class SecureImportTransformer(ast.NodeTransformer):
     """Transformer to block dangerous imports and operations."""
 
+    def __init__(self, modules: set[str] | None = None):
+        super().__init__()
+        self.modules = modules or set()
+
+    def check_attribute(self, value: ast.AST, attr: str) -> None:
+        if attr in BLOCKED_ATTRIBUTES:
+            raise ValueError(f"Access to attribute '{attr}' is not allowed")
+        if attr.startswith("_") and root_name(value) in self.modules:
+            raise ValueError(f"Access to private attribute '{attr}' of an imported module is not allowed")
+
     def visit_Import(self, node: ast.Import) -> ast.AST:
         for alias in node.names:
             module_name = alias.name.split(".")[0]
@@ -167,6 +226,9 @@ class SecureImportTransformer(ast.NodeTransformer):
             module_name = node.module.split(".")[0]
             if module_name in BLOCKED_MODULES:
                 raise ValueError(f"Import from '{module_name}' is not allowed")
+        for alias in node.names:
+            if alias.name.startswith("_"):
+                raise ValueError(f"Import of private name '{alias.name}' is not allowed")
         return self.generic_visit(node)
 
     def visit_Call(self, node: ast.Call) -> ast.AST:
@@ -184,6 +246,16 @@ class SecureImportTransformer(ast.NodeTransformer):
             if isinstance(node.func, ast.Attribute) and node.func.attr == "getattr":
                 if isinstance(node.func.value, ast.Name) and node.func.value.id == "__builtins__":
                     raise ValueError("getattr on __builtins__ is not allowed")
+        # Block getattr(obj, "f_" + "locals") style access: names must be visible to the checks above
+        if isinstance(node.func, ast.Name) and node.func.id in ATTRIBUTE_BUILTINS and len(node.args) > 1:
+            name = node.args[1]
+            if not isinstance(name, ast.Constant) or not isinstance(name.value, str):
+                raise ValueError(f"{node.func.id} is only allowed with a constant attribute name")
+            self.check_attribute(node.args[0], name.value)
+        # Block vars(module), whose dict holds the module's private attributes
+        if isinstance(node.func, ast.Name) and node.func.id == "vars" and node.args:
+            if root_name(node.args[0]) in self.modules:
+                raise ValueError("vars on an imported module is not allowed")
         # Block getattr(__builtins__, ...) pattern
         if isinstance(node.func, ast.Name) and node.func.id == "getattr":
             if len(node.args) >= 1:
@@ -202,6 +274,7 @@ class SecureImportTransformer(ast.NodeTransformer):
         return self.generic_visit(node)
 
     def visit_Attribute(self, node: ast.Attribute) -> ast.AST:
+        self.check_attribute(node.value, node.attr)
         # Block access to dangerous attributes via __builtins__
         # Only block if explicitly accessing __builtins__ and the attribute is dangerous
         if isinstance(node.value, ast.Name) and node.value.id == "__builtins__":
@@ -237,7 +310,7 @@ def validate_code(code: str) -> tuple[bool, str | None]:
     """Validate code for dangerous operations."""
     try:
         tree = ast.parse(code)
-        transformer = SecureImportTransformer()
+        transformer = SecureImportTransformer(imported_names(tree))
         transformer.visit(tree)
         return True, None
     except SyntaxError as e:
@@ -248,345 +321,338 @@ def validate_code(code: str) -> tuple[bool, str | None]:
         return False, f"Validation error: {str(e)}"
 
 
-def execute_code_secure(user_code: str, test_code: str, module_path: str, timeout: int = 5) -> dict[str, Any]:
-    """
-    Execute user code and run tests in a secure subprocess.
+# Supported comparison modes for data-driven test cases (see app/sandbox_runner.py)
+COMPARISON_MODES = ("exact", "unordered", "approx")
 
-    Args:
-        user_code: The user's solution code
-        test_code: The test code to run
-        module_path: The module path (e.g., "arrays_and_strings.clone_even_numbers")
-        timeout: Maximum execution time in seconds
+RUNNER_PATH = Path(__file__).parent / "sandbox_runner.py"
 
-    Returns:
-        Dictionary with execution results
+# Stress mode defaults: generated cases per run and share of the timeout spent generating
+STRESS_CASES = 5000
+STRESS_BUDGET_FRACTION = 0.6
+
+# Profile mode: share of the timeout (from runner start) the instrumented pass may use, and rows reported
+PROFILE_BUDGET_FRACTION = 0.7
+PROFILE_TOP = 10
+
+# How long a timed-out runner gets to report buffered results before its group is killed
+TERMINATE_GRACE_SECONDS = 0.25
+
+# Output kept from one run, and the address-space cap for each sandbox process
+MAX_OUTPUT_BYTES = int(os.getenv("SANDBOX_MAX_OUTPUT_BYTES", str(4 * 2**20)))
+SANDBOX_MEMORY_MB = int(os.getenv("SANDBOX_MEMORY_MB", "512"))
+
+# Tests one run may ask full values for
+MAX_FULL_VALUES = 5
+# Longest full value: the expected and actual values of that many tests, plus a share for
+# the rest of the run's output, must fit in the output limit
+FULL_VALUE_CHARS = MAX_OUTPUT_BYTES // (2 * MAX_FULL_VALUES + 2)
+
+
+@functools.cache
+def _runner_source() -> str:
+    return RUNNER_PATH.read_text(encoding="utf-8")
+
+
+def stress_job(reference: str, generator: str, timeout: float, seed: int | None = None) -> dict[str, Any]:
+    """Stress-mode settings for the sandbox: reference solution and input generator sources."""
+    return {
+        "reference": reference,
+        "generator": generator,
+        "cases": STRESS_CASES,
+        "budget": timeout * STRESS_BUDGET_FRACTION,
+        "seed": seed,
+    }
+
+
+def profile_job(timeout: float) -> dict[str, Any]:
+    """Profiling settings for the sandbox; instrumented re-runs stop at the budget."""
+    return {"budget": timeout * PROFILE_BUDGET_FRACTION, "top": PROFILE_TOP}
+
+
+def validation_failure(error: str | None) -> ExecutionResult:
+    return ExecutionResult.failure(error or "Invalid code", "Code validation")
+
+
+def timeout_failure(timeout: float, output: str = "") -> ExecutionResult:
     """
-    # Validate user code
-    is_valid, error = validate_code(user_code)
-    if not is_valid:
-        return {
-            "success": False,
-            "error": error,
-            "test_results": [{"name": "Code validation", "passed": False, "error": error}],
-            "output": "",
-            "passed_count": 0,
-            "failed_count": 1,
-        }
+    Result for a run killed at its deadline, keeping whatever the runner reported before.
 
-    # Create temporary directory for execution
-    with tempfile.TemporaryDirectory() as tmpdir:
-        tmp_path = Path(tmpdir)
-
-        # Create module directory structure
-        module_parts = module_path.split(".")
-        module_dir = tmp_path
-        for part in module_parts[:-1]:
-            module_dir = module_dir / part
-            module_dir.mkdir(exist_ok=True)
-            (module_dir / "__init__.py").touch()
-
-        # Write user code to module file
-        module_file = module_dir / f"{module_parts[-1]}.py"
-        module_file.write_text(user_code, encoding="utf-8")
-
-        # Create test runner script
-        test_runner = tmp_path / "run_tests.py"
-        # Indent the test code properly for the try block
-        indented_lines = []
-        for line in test_code.split("\n"):
-            if line.strip():
-                indented_lines.append("    " + line)
-            else:
-                indented_lines.append(line)
-        indented_test_code = "\n".join(indented_lines)
-
-        # Store test code source for parsing
-        test_code_source = test_code
-
-        test_runner_content = f"""import sys
-from pathlib import Path
-import ast as ast_module
-import json
+    The first named test that never reported is the one that was running and is marked
+    as timed out; later ones are marked as not run.
+    """
+    message = f"Execution timed out after {timeout} seconds"
+    if not re.search(r"^Found \d+ test", output, re.MULTILINE):
+        return ExecutionResult.failure(message, "Execution", output=output.strip())
+
+    result = parse_test_output(output, False)
+    test_results = [t for t in result.test_results if t.name not in ("All tests", "Execution")]
+    reported = {t.name for t in test_results}
+    declared = next((line[len("TESTS:") :].split() for line in output.split("\n") if line.startswith("TESTS:")), [])
+    pending = [name for name in declared if name not in reported]
+    if pending:
+        test_results.append(TestResult(name=pending[0], passed=False, error=message))
+        test_results.extend(TestResult(name=name, passed=False, error="Not run") for name in pending[1:])
+    else:
+        # Timed out in the data-driven cases, which aren't named up front
+        test_results.append(TestResult(name="Execution", passed=False, error=message))
+    failed_count = result.failed_count + 1
+    return ExecutionResult(
+        success=False,
+        error=message,
+        test_results=test_results,
+        output=result.output,
+        passed_count=result.passed_count,
+        failed_count=failed_count,
+        total_count=result.total_count,
+        not_run_count=max(0, result.total_count - result.passed_count - failed_count),
+    )
+
+
+def prepare_sandbox(
+    tmp_path: Path,
+    test_code: str,
+    module_path: str,
+    function_name: str | None = None,
+    test_cases: list[tuple[Any, Any, str]] | None = None,
+    fixtures: dict[str, tuple[str, str]] | None = None,
+    stress: dict[str, Any] | None = None,
+    profile: dict[str, Any] | None = None,
+    full_values: list[str] | None = None,
+    shard: tuple[int, int] | None = None,
+) -> tuple[Path, Path, str]:
+    """
+    Lay out a sandbox directory; returns (test runner path, user module path, job line).
 
-# Add tmpdir to path
-sys.path.insert(0, r"{tmp_path}")
-
-# Store test code source for parsing actual values
-TEST_CODE_SOURCE = {repr(test_code_source)}
-
-# Execute test code to define test functions
-try:
-{indented_test_code}
-except Exception as e:
-    error_type = type(e).__name__
-    error_msg = str(e) if str(e) else "Unknown error"
-    print(f"ERROR: Failed to load test code: {{error_type}}: {{error_msg}}")
-    sys.exit(1)
-
-# Discover and run all test functions
-test_functions = [
-    name for name, obj in globals().items()
-    if name.startswith("test_") and callable(obj)
-]
-
-if not test_functions:
-    print("ERROR: No test functions found (functions must start with 'test_')")
-    sys.exit(1)
-
-print(f"Found {{len(test_functions)}} test(s)")
-failed_tests = []
-passed_tests = []
-
-def extract_actual_value(test_name, test_func):
-    \"\"\"Extract actual value from a failed assertion by parsing test code and re-evaluating.\"\"\"
+    The job - tests, cases and any stress reference - is never written into the sandbox,
+    where the user's code could read it: the runner gets the returned line on stdin.
+    """
+    # Create module directory structure
+    module_parts = module_path.split(".")
+    module_dir = tmp_path
+    for part in module_parts[:-1]:
+        module_dir = module_dir / part
+        module_dir.mkdir(exist_ok=True)
+        (module_dir / "__init__.py").touch()
+
+    # Copy the test runner into the sandbox and describe the job for it
+    test_runner = tmp_path / "run_tests.py"
+    test_runner.write_text(_runner_source(), encoding="utf-8")
+    job = {
+        "test_code": test_code,
+        "module_path": module_path,
+        "function_name": function_name or module_parts[-1],
+        "cases": test_cases or [],
+        "fixtures": fixtures or {},
+        "stress": stress,
+        "profile": profile,
+        "full_values": full_values or [],
+        "full_value_chars": FULL_VALUE_CHARS,
+        "shard": shard,
+        "memory_limit": SANDBOX_MEMORY_MB * 2**20,
+    }
+    return test_runner, module_dir / f"{module_parts[-1]}.py", json.dumps(job) + "\n"
+
+
+def sandbox_env(tmp_path: Path) -> dict[str, str]:
+    # Create minimal environment
+    env = os.environ.copy()
+    env.update(
+        {
+            "PYTHONPATH": str(tmp_path),
+            "PYTHONUNBUFFERED": "1",
+            "PYTHONDONTWRITEBYTECODE": "1",  # Don't write .pyc files
+        }
+    )
+    # Remove potentially dangerous environment variables
+    for key in list(env.keys()):
+        if key.startswith("LD_") or key.startswith("DYLD_"):
+            del env[key]
+    return env
+
+
+def signal_process_group(process: subprocess.Popen, signum: int) -> None:
+    """Signal a sandbox started with start_new_session together with anything it spawned."""
+    # Until it is reaped the leader's pid still names the group, so this can't hit a reused pgid
+    if process.returncode is not None:
+        return
     try:
-        # Parse the test code source to find the test function
-        tree = ast_module.parse(TEST_CODE_SOURCE)
-        for node in ast_module.walk(tree):
-            if isinstance(node, ast_module.FunctionDef) and node.name == test_name:
-                # Found the test function, look for assert statements
-                for stmt in ast_module.walk(node):
-                    if isinstance(stmt, ast_module.Assert):
-                        if isinstance(stmt.test, ast_module.Compare):
-                            # It's a comparison like func(args) == expected
-                            left = stmt.test.left
-                            if isinstance(left, ast_module.Call):
-                                # It's a function call
-                                func_name = left.func.id if isinstance(left.func, ast_module.Name) else None
-                                if func_name:
-                                    # Try to find the function in globals
-                                    func = None
-                                    if func_name in globals():
-                                        func = globals()[func_name]
-                                    
-                                    if func and callable(func):
-                                        # Evaluate the function call to get actual result
-                                        try:
-                                            args = []
-                                            for arg_node in left.args:
-                                                try:
-                                                    # Try to evaluate the argument using AST
-                                                    code = ast_module.Expression(arg_node)
-                                                    compiled = compile(code, "<string>", "eval")
-                                                    args.append(eval(compiled))
-                                                except Exception:
-                                                    # If AST evaluation fails, try constant extraction
-                                                    try:
-                                                        if isinstance(arg_node, ast_module.Constant):
-                                                            args.append(arg_node.value)
-                                                        elif isinstance(arg_node, ast_module.List):
-                                                            list_vals = []
-                                                            for elem in arg_node.elts:
-                                                                try:
-                                                                    if isinstance(elem, ast_module.Constant):
-                                                                        list_vals.append(elem.value)
-                                                                    else:
-                                                                        elem_code = ast_module.Expression(elem)
-                                                                        elem_compiled = compile(elem_code, "<string>", "eval")
-                                                                        list_vals.append(eval(elem_compiled))
-                                                                except:
-                                                                    pass
-                                                            args.append(list_vals)
-                                                        else:
-                                                            # Last resort: try to unparse and eval
-                                                            if hasattr(ast_module, 'unparse'):
-                                                                code_str = ast_module.unparse(arg_node)
-                                                                args.append(eval(code_str))
-                                                    except Exception:
-                                                        pass
-                                            
-                                            if len(args) == len(left.args):  # Only proceed if we got all args
-                                                # Call the function
-                                                actual_result = func(*args)
-                                                # Format the result
-                                                try:
-                                                    return json.dumps(actual_result) if isinstance(actual_result, (list, dict)) else repr(actual_result)
-                                                except:
-                                                    return repr(actual_result)
-                                        except Exception:
-                                            pass
-                break  # Found the function, no need to continue
-    except Exception:
+        os.killpg(process.pid, signum)
+    except ProcessLookupError:
         pass
-    return None
 
-for test_name in sorted(test_functions):
-    try:
-        test_func = globals()[test_name]
-        test_func()
-        print(f"PASSED: {{test_name}}")
-        passed_tests.append(test_name)
-    except AssertionError as e:
-        error_msg = str(e) if str(e) else "Assertion failed"
-        # Try to extract actual value by re-evaluating the assertion
-        actual_value = extract_actual_value(test_name, test_func)
-        
-        print(f"FAILED: {{test_name}} - {{error_msg}}")
-        if actual_value:
-            # Clean up the actual value - remove quotes if present
-            actual_value_clean = actual_value.strip('"').strip("'")
-            print(f"ACTUAL_VALUE: {{test_name}} - {{actual_value_clean}}")
-        failed_tests.append(test_name)
-    except Exception as e:
-        # Extract the most relevant error message
-        error_type = type(e).__name__
-        error_msg = str(e) if str(e) else "Error occurred"
-        # For common errors, show a cleaner message
-        if "NameError" in error_type:
-            formatted_msg = "NameError: " + error_msg
-        elif "TypeError" in error_type:
-            formatted_msg = "TypeError: " + error_msg
-        elif "AttributeError" in error_type:
-            formatted_msg = "AttributeError: " + error_msg
-        elif "IndexError" in error_type:
-            formatted_msg = "IndexError: " + error_msg
-        elif "KeyError" in error_type:
-            formatted_msg = "KeyError: " + error_msg
-        else:
-            formatted_msg = error_type + ": " + error_msg
-        print("ERROR in " + test_name + ": " + formatted_msg)
-        failed_tests.append(test_name)
-
-print(f"\\nTest Summary: {{len(passed_tests)}} passed, {{len(failed_tests)}} failed out of {{len(test_functions)}} total")
-
-if failed_tests:
-    sys.exit(1)
-else:
-    print("SUCCESS: All tests passed")
-"""
-        test_runner.write_text(test_runner_content, encoding="utf-8")
-
-        # Execute in subprocess with timeout and resource limits
-        try:
-            # Create minimal environment
-            env = os.environ.copy()
-            env.update(
-                {
-                    "PYTHONPATH": str(tmp_path),
-                    "PYTHONUNBUFFERED": "1",
-                    "PYTHONDONTWRITEBYTECODE": "1",  # Don't write .pyc files
-                }
-            )
-            # Remove potentially dangerous environment variables
-            for key in list(env.keys()):
-                if key.startswith("LD_") or key.startswith("DYLD_"):
-                    del env[key]
-
-            # Use a reliable Python executable path
-            # On Heroku, sys.executable might point to a non-existent path
-            # Use 'python3' from PATH which is more reliable on Heroku
-            import shutil
-
-            python_executable = shutil.which("python3") or "python3"
-
-            result = subprocess.run(
-                [python_executable, str(test_runner)],
-                capture_output=True,
-                text=True,
-                timeout=timeout,
-                cwd=str(tmp_path),
-                env=env,
-                # Prevent subprocess from spawning new processes (Unix only)
-                preexec_fn=None if sys.platform == "win32" else lambda: None,
-            )
-
-            output = result.stdout + result.stderr
-            success = result.returncode == 0
-
-            # Parse test results from output
-            test_results = []
-            passed_tests = []
-            failed_tests = []
-            total_tests = 0
-
-            # Parse individual test results
-            for line in output.split("\n"):
-                line = line.strip()
-                if line.startswith("Found"):
-                    # Extract total test count: "Found 6 test(s)"
-                    import re
-
-                    match = re.search(r"Found (\d+) test", line)
-                    if match:
-                        total_tests = int(match.group(1))
-                elif line.startswith("PASSED:"):
-                    test_name = line.replace("PASSED:", "").strip()
-                    passed_tests.append(test_name)
-                    test_results.append({"name": test_name, "passed": True, "error": None})
-                elif line.startswith("FAILED:"):
-                    # Extract test name and error message
-                    parts = line.replace("FAILED:", "").strip().split(" - ", 1)
-                    test_name = parts[0].strip()
-                    error_msg = parts[1].strip() if len(parts) > 1 else "Assertion failed"
-                    # Clean up error message - remove any traceback-like content
-                    error_msg = error_msg.split("\n")[0].split("Traceback")[0].strip()
-                    failed_tests.append(test_name)
-                    test_result = {"name": test_name, "passed": False, "error": error_msg, "actual": None}
-                    test_results.append(test_result)
-                elif line.startswith("ACTUAL_VALUE:"):
-                    # Extract actual value from test output
-                    parts = line.replace("ACTUAL_VALUE:", "").strip().split(" - ", 1)
-                    if len(parts) == 2:
-                        test_name = parts[0].strip()
-                        actual_value = parts[1].strip()
-                        # Find the corresponding test result and update it
-                        for result in test_results:
-                            if result["name"] == test_name:
-                                result["actual"] = actual_value
-                                break
-                elif line.startswith("ERROR in"):
-                    # Extract test name and error message
-                    parts = line.replace("ERROR in", "").strip().split(":", 1)
-                    test_name = parts[0].strip()
-                    error_msg = parts[1].strip() if len(parts) > 1 else "Error occurred"
-                    # Clean up error message - remove any traceback-like content
-                    error_msg = error_msg.split("\n")[0].split("Traceback")[0].strip()
-                    failed_tests.append(test_name)
-                    test_results.append({"name": test_name, "passed": False, "error": error_msg})
-
-            # If we found a total count but don't have that many results, some tests might not have run
-            if total_tests > 0 and len(test_results) < total_tests:
-                # We can't know which tests weren't executed without more info, so we'll just note it
+
+def kill_process_group(process: subprocess.Popen) -> None:
+    """SIGKILL the sandbox's whole process group and reap it."""
+    signal_process_group(process, signal.SIGKILL)
+    process.wait()
+
+
+def output_limit_failure(limit: int = MAX_OUTPUT_BYTES) -> ExecutionResult:
+    return ExecutionResult.failure(f"Output limit exceeded ({limit // 1024} KiB)", "Execution")
+
+
+def python_executable() -> str:
+    # Use a reliable Python executable path
+    # On Heroku, sys.executable might point to a non-existent path
+    # Use 'python3' from PATH which is more reliable on Heroku
+    return shutil.which("python3") or "python3"
+
+
+def parse_test_output(output: str, success: bool) -> ExecutionResult:
+    """Build the result from the runner's line protocol."""
+    test_results: list[TestResult] = []
+    results_by_name: dict[str, TestResult] = {}
+    passed_count = 0
+    failed_count = 0
+    total_tests = 0
+    stress = None
+    profile = None
+    # Lines outside the protocol (user prints, tracebacks); protocol lines are already in test_results
+    extra_output = []
+
+    # Parse individual test results; lines are stripped only to match the protocol, so
+    # the code's own output keeps its indentation
+    for raw_line in output.split("\n"):
+        line = raw_line.strip()
+        if line.startswith("Found"):
+            # Extract total test count: "Found 6 test(s)"
+            match = re.search(r"Found (\d+) test", line)
+            if match:
+                total_tests = int(match.group(1))
+        elif line.startswith("PASSED:"):
+            test_name = line.replace("PASSED:", "").strip()
+            passed_count += 1
+            test_results.append(TestResult(name=test_name, passed=True))
+        elif line.startswith("FAILED:"):
+            # Extract test name and error message
+            parts = line.replace("FAILED:", "").strip().split(" - ", 1)
+            test_name = parts[0].strip()
+            error_msg = parts[1].strip() if len(parts) > 1 else "Assertion failed"
+            # Clean up error message - remove any traceback-like content
+            error_msg = error_msg.split("\n")[0].split("Traceback")[0].strip()
+            failed_count += 1
+            test_result = TestResult(name=test_name, passed=False, error=error_msg)
+            test_results.append(test_result)
+            results_by_name[test_name] = test_result
+        elif line.startswith("ACTUAL_VALUE:"):
+            # Extract actual value from test output
+            parts = line.replace("ACTUAL_VALUE:", "").strip().split(" - ", 1)
+            if len(parts) == 2:
+                test_name = parts[0].strip()
+                actual_value = parts[1].strip()
+                # Find the corresponding test result and update it
+                if test_name in results_by_name:
+                    results_by_name[test_name].actual = actual_value
+        elif line.startswith("DIFF:"):
+            test_name, _, diff = line.replace("DIFF:", "", 1).strip().partition(" - ")
+            if test_name in results_by_name:
+                try:
+                    results_by_name[test_name].diff = ValueDiff.model_validate_json(diff)
+                except ValueError:
+                    pass
+        elif line.startswith("TESTS:"):
+            continue
+        elif line.startswith("PROFILE:"):
+            try:
+                profile = ProfileReport.model_validate_json(line.replace("PROFILE:", "", 1))
+            except ValueError:
+                pass
+        elif line.startswith("STRESS:"):
+            try:
+                stress = StressSummary.model_validate_json(line.replace("STRESS:", "", 1))
+            except ValueError:
                 pass
+        elif line.startswith("ERROR in"):
+            # Extract test name and error message
+            parts = line.replace("ERROR in", "").strip().split(":", 1)
+            test_name = parts[0].strip()
+            error_msg = parts[1].strip() if len(parts) > 1 else "Error occurred"
+            # Clean up error message - remove any traceback-like content
+            error_msg = error_msg.split("\n")[0].split("Traceback")[0].strip()
+            failed_count += 1
+            test_results.append(TestResult(name=test_name, passed=False, error=error_msg))
+        elif not line.startswith(("SUCCESS:", "Test Summary:")):
+            extra_output.append(raw_line.rstrip("\r"))
+
+    # If no individual test results parsed, check for overall status
+    if not test_results:
+        if "SUCCESS" in output:
+            test_results.append(TestResult(name="All tests", passed=True))
+        elif "ERROR: Failed to load test code" in output:
+            test_results.append(TestResult(name="Test setup", passed=False, error="Failed to load test code"))
+        else:
+            # Generic error
+            error_msg = output.split("\n")[0] if output else "Unknown error"
+            test_results.append(TestResult(name="Execution", passed=False, error=error_msg))
+
+    total_count = total_tests if total_tests > 0 else len(test_results)
+    extra = "\n".join(extra_output).strip("\n")
+    if success:
+        error = None
+    elif failed_count:
+        error = f"{failed_count} of {total_count} tests failed"
+    else:
+        error = extra or test_results[0].error or "Tests failed"
+    return ExecutionResult(
+        success=success,
+        error=error,
+        test_results=test_results,
+        output=extra,
+        passed_count=passed_count,
+        failed_count=failed_count,
+        total_count=total_count,
+        stress=stress,
+        profile=profile,
+    )
+
+
+def execute_code_secure(
+    user_code: str,
+    test_code: str,
+    module_path: str,
+    timeout: int = 5,
+    function_name: str | None = None,
+    test_cases: list[tuple[Any, Any, str]] | None = None,
+    fixtures: dict[str, tuple[str, str]] | None = None,
+    stress: dict[str, Any] | None = None,
+    profile: dict[str, Any] | None = None,
+    full_values: list[str] | None = None,
+    shards: int = 1,
+) -> ExecutionResult:
+    """
+    Execute user code and run tests in a secure subprocess, on the configured executor backend.
+
+    Args:
+        user_code: The user's solution code
+        test_code: The test code to run
+        module_path: The module path (e.g., "arrays_and_strings.clone_even_numbers")
+        timeout: Maximum execution time in seconds
+        function_name: The function under test, defaults to the last part of module_path
+        test_cases: Data-driven (args, expected, comparison) cases evaluated in one batch
+        fixtures: Large read-only inputs as {name: (typecode, path)}, mapped by the sandbox
+        stress: Randomized comparison against a reference solution (see stress_job)
+        profile: Re-run the tests instrumented and report hot spots (see profile_job)
+        full_values: Tests whose expected and actual values are reported whole, not previewed
+        shards: Split the tests across up to this many parallel sandboxes (see app.sharding)
 
-            # If no individual test results parsed, check for overall status
-            if not test_results:
-                if "SUCCESS" in output:
-                    test_results.append({"name": "All tests", "passed": True, "error": None})
-                elif "ERROR: Failed to load test code" in output:
-                    test_results.append({"name": "Test setup", "passed": False, "error": "Failed to load test code"})
-                else:
-                    # Generic error
-                    error_msg = output.split("\n")[0] if output else "Unknown error"
-                    test_results.append({"name": "Execution", "passed": False, "error": error_msg})
-
-            return {
-                "success": success,
-                "error": None if success else output,
-                "test_results": test_results,
-                "output": output,
-                "passed_count": len(passed_tests),
-                "failed_count": len(failed_tests),
-                "total_count": total_tests if total_tests > 0 else len(test_results),
-            }
-
-        except subprocess.TimeoutExpired:
-            return {
-                "success": False,
-                "error": f"Execution timed out after {timeout} seconds",
-                "test_results": [
-                    {"name": "Execution", "passed": False, "error": f"Execution timed out after {timeout} seconds"}
-                ],
-                "output": "",
-                "passed_count": 0,
-                "failed_count": 1,
-            }
-        except Exception as e:
-            return {
-                "success": False,
-                "error": f"Execution error: {str(e)}",
-                "test_results": [{"name": "Execution", "passed": False, "error": str(e)}],
-                "output": traceback.format_exc(),
-                "passed_count": 0,
-                "failed_count": 1,
-            }
+    Returns:
+        The execution result
+    """
+    # The backends build on this module's helpers, hence the deferred imports
+    from app.executors import executor
+    from app.sharding import execute_sharded
+
+    job = {
+        "test_code": test_code,
+        "module_path": module_path,
+        "function_name": function_name,
+        "test_cases": test_cases,
+        "fixtures": fixtures,
+        "stress": stress,
+        "profile": profile,
+        "full_values": full_values,
+    }
+    # Profiling measures the suite as a whole
+    if shards > 1 and profile is None:
+        return execute_sharded(executor, shards, user_code, timeout, **job)
+    return executor.execute(user_code, timeout=timeout, **job)
@@ -0,0 +1,158 @@
+"""
+Adaptive sizing of the scheduler's sandbox slots.
+
+``SANDBOX_SLOTS`` is only the starting point. Every ``CONCURRENCY_INTERVAL_SECONDS`` the
+limiter looks at three signals gathered since its last look:
+
+    latency   median ratio of each run's wall time to its problem's expected runtime
+    cpu       share of time runnable tasks waited for a CPU (Linux PSI, else load average)
+    memory    share of the memory limit in use (cgroup limit, else the host's memory)
+
+If any is over its limit (``LATENCY_TOLERANCE``, ``CPU_PRESSURE_LIMIT``,
+``MEMORY_PRESSURE_LIMIT``) the slots are cut by a quarter; if all are healthy and the
+slots were all in use or had work waiting, one is added (AIMD). The slots stay between
+``MIN_SANDBOX_SLOTS`` and ``MAX_SANDBOX_SLOTS``, so throughput follows what the host can
+actually sustain: more runs on idle cores, fewer when memory-heavy solutions thrash.
+With ``ADAPTIVE_CONCURRENCY`` off the slots stay at ``SANDBOX_SLOTS``.
+"""
+
+import asyncio
+import logging
+import os
+import statistics
+import time
+from collections import deque
+from typing import Any
+
+from app.results import ExecutionResult
+from app.runtime_stats import RuntimeKey, reached_sandbox, runtime_stats
+from app.scheduler import FairScheduler, scheduler
+
+logger = logging.getLogger("uvicorn.error.concurrency")
+
+ADAPTIVE_CONCURRENCY = os.getenv("ADAPTIVE_CONCURRENCY", "true").lower() in ("1", "true", "yes")
+MIN_SANDBOX_SLOTS = int(os.getenv("MIN_SANDBOX_SLOTS", "1"))
+MAX_SANDBOX_SLOTS = int(os.getenv("MAX_SANDBOX_SLOTS", str(2 * (os.cpu_count() or 1))))
+CONCURRENCY_INTERVAL_SECONDS = float(os.getenv("CONCURRENCY_INTERVAL_SECONDS", "5"))
+LATENCY_TOLERANCE = float(os.getenv("LATENCY_TOLERANCE", "1.5"))
+CPU_PRESSURE_LIMIT = float(os.getenv("CPU_PRESSURE_LIMIT", "0.25"))
+MEMORY_PRESSURE_LIMIT = float(os.getenv("MEMORY_PRESSURE_LIMIT", "0.9"))
+
+# Share of the slots kept on a decrease
+DECREASE_FACTOR = 0.75
+# Runs needed in an interval before their latency counts
+MIN_LATENCY_SAMPLES = 3
+# Floor for expected runtimes, so jitter on millisecond runs doesn't read as slowness
+MIN_EXPECTED_SECONDS = 0.05
+# Adjustments listed in the metrics
+RECENT_ADJUSTMENTS = 20
+
+
+def cpu_pressure() -> float:
+    """Share of the last ten seconds some runnable task waited for a CPU."""
+    try:
+        with open("/proc/pressure/cpu") as pressure:
+            some = pressure.readline().split()
+        return float(some[1].split("=")[1]) / 100
+    except (OSError, IndexError, ValueError):
+        pass
+    # Without PSI: the share of runnable tasks beyond the CPU count
+    load = os.getloadavg()[0]
+    return max(0.0, 1 - (os.cpu_count() or 1) / load) if load > 0 else 0.0
+
+
+def memory_pressure() -> float | None:
+    """Share of the memory limit in use: the cgroup's if it has one, else the host's."""
+    try:
+        with open("/sys/fs/cgroup/memory.max") as limit_file:
+            limit = limit_file.read().strip()
+        if limit != "max":
+            with open("/sys/fs/cgroup/memory.current") as current:
+                return int(current.read()) / int(limit)
+    except (OSError, ValueError):
+        pass
+    try:
+        with open("/proc/meminfo") as meminfo:
+            fields = {line.split(":")[0]: int(line.split()[1]) for line in meminfo}
+        return 1 - fields["MemAvailable"] / fields["MemTotal"]
+    except (OSError, KeyError, ValueError, IndexError):
+        return None
+
+
+class ConcurrencyLimiter:
+    """AIMD control of ``scheduler.slots`` from run latency, CPU and memory pressure."""
+
+    def __init__(self, scheduler: FairScheduler, minimum: int = MIN_SANDBOX_SLOTS, maximum: int = MAX_SANDBOX_SLOTS):
+        self.scheduler = scheduler
+        self.minimum = max(1, minimum)
+        self.maximum = max(self.minimum, maximum)
+        # Starts from SANDBOX_SLOTS; only moves once adjust() runs
+        self.limit = scheduler.slots
+        self.increases = 0
+        self.decreases = 0
+        self.signals: dict[str, float | None] = {"latency": None, "cpu": None, "memory": None}
+        self._latencies: list[float] = []
+        self._saturated = False
+        self._adjustments: deque[dict[str, Any]] = deque(maxlen=RECENT_ADJUSTMENTS)
+
+    def observe(self, key: RuntimeKey, seconds: float, result: ExecutionResult) -> None:
+        """Note a finished run; call before its duration is added to the runtime estimates."""
+        # A problem's first runs have no estimate to be slow against
+        if reached_sandbox(result) and key in runtime_stats:
+            self._latencies.append(seconds / max(runtime_stats.expected(key), MIN_EXPECTED_SECONDS))
+        # Checked at each run's end as well as at each interval: a busy spell between two looks counts
+        self._saturated = self._saturated or self.scheduler.saturated()
+
+    def adjust(self) -> int:
+        """Apply one AIMD step from the signals since the last call; returns the new limit."""
+        latencies, self._latencies = self._latencies, []
+        saturated = self._saturated or self.scheduler.saturated()
+        self._saturated = False
+        self.signals = {
+            "latency": statistics.median(latencies) if len(latencies) >= MIN_LATENCY_SAMPLES else None,
+            "cpu": cpu_pressure(),
+            "memory": memory_pressure(),
+        }
+        limits = {"latency": LATENCY_TOLERANCE, "cpu": CPU_PRESSURE_LIMIT, "memory": MEMORY_PRESSURE_LIMIT}
+        over = [name for name, value in self.signals.items() if value is not None and value > limits[name]]
+        if over:
+            self._set(int(self.limit * DECREASE_FACTOR), ", ".join(over))
+        elif saturated:
+            self._set(self.limit + 1, "saturated")
+        return self.limit
+
+    def _set(self, limit: int, reason: str) -> None:
+        limit = max(self.minimum, min(self.maximum, limit))
+        if limit == self.limit:
+            return
+        if limit > self.limit:
+            self.increases += 1
+        else:
+            self.decreases += 1
+            logger.info("Sandbox slots %d -> %d (%s)", self.limit, limit, reason)
+        self._adjustments.append({"at": time.time(), "from": self.limit, "to": limit, "reason": reason})
+        self.limit = limit
+        self.scheduler.set_slots(limit)
+
+    async def adjust_forever(self, interval: float = CONCURRENCY_INTERVAL_SECONDS) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                self.adjust()
+            except Exception as e:
+                logger.warning("Adjusting sandbox slots failed: %s", e)
+
+    def metrics(self) -> dict[str, Any]:
+        return {
+            "adaptive": ADAPTIVE_CONCURRENCY,
+            "limit": self.limit,
+            "minimum": self.minimum,
+            "maximum": self.maximum,
+            "increases": self.increases,
+            "decreases": self.decreases,
+            "signals": {name: None if value is None else round(value, 3) for name, value in self.signals.items()},
+            "recent_adjustments": list(self._adjustments),
+        }
+
+
+concurrency = ConcurrencyLimiter(scheduler)
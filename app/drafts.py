@@ -0,0 +1,82 @@
+"""
+Server-side draft autosave.
+
+The editor sends its code a second after the user stops typing. Saves only update an
+in-memory buffer (``draft_writer``), so a burst of keystroke-driven saves from one
+browser collapses into a single pending row. The buffer is upserted into ``drafts``
+every ``DRAFT_FLUSH_SECONDS`` in one batched transaction, whatever the number of
+active editors. Browsers are told apart by a random ``client_id`` cookie. Saves are
+rate-limited per client (``DRAFT_RATE``, ``DRAFT_BURST``) like submissions, so a
+misbehaving client can't grow the buffer faster than the flushes drain it.
+"""
+
+import datetime
+import os
+import re
+import uuid
+
+from fastapi import Response
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from starlette.requests import HTTPConnection
+
+from app.batch_writer import BatchWriter
+from app.models import Draft
+from app.scheduler import RateLimiter
+
+DRAFT_FLUSH_SECONDS = float(os.getenv("DRAFT_FLUSH_SECONDS", "5"))
+MAX_PENDING_DRAFTS = int(os.getenv("MAX_PENDING_DRAFTS", "10000"))
+DRAFT_RATE = float(os.getenv("DRAFT_RATE", "1.0"))  # saves per second per client
+DRAFT_BURST = float(os.getenv("DRAFT_BURST", "10"))
+
+CLIENT_COOKIE = "client_id"
+CLIENT_COOKIE_MAX_AGE = 365 * 24 * 3600
+CLIENT_ID_PATTERN = re.compile(r"^[0-9a-f]{32}$")
+
+draft_writer = BatchWriter(
+    Draft,
+    ["client_id", "problem_id"],
+    interval=DRAFT_FLUSH_SECONDS,
+    max_pending=MAX_PENDING_DRAFTS,
+    newer_column="updated_at",
+)
+draft_limiter = RateLimiter(DRAFT_RATE, DRAFT_BURST)
+
+
+def browser_id(request: HTTPConnection) -> str | None:
+    """The browser's ``client_id`` cookie, if it carries a well-formed one."""
+    value = request.cookies.get(CLIENT_COOKIE, "")
+    return value if CLIENT_ID_PATTERN.match(value) else None
+
+
+def issue_browser_id(response: Response) -> str:
+    client_id = uuid.uuid4().hex
+    response.set_cookie(
+        CLIENT_COOKIE, client_id, max_age=CLIENT_COOKIE_MAX_AGE, httponly=True, samesite="lax", path="/"
+    )
+    return client_id
+
+
+def save_draft(client_id: str, problem_id: uuid.UUID, code: str) -> None:
+    draft_writer.put(
+        {
+            "client_id": client_id,
+            "problem_id": problem_id,
+            "code": code,
+            "updated_at": datetime.datetime.now(datetime.timezone.utc),
+        }
+    )
+
+
+def load_draft(db: Session, client_id: str, problem_id: uuid.UUID) -> tuple[str, datetime.datetime] | None:
+    """
+    The browser's latest (code, saved at) for the problem: a pending save if there is
+    one, else the stored draft.
+    """
+    pending = draft_writer.pending((client_id, problem_id))
+    if pending is not None:
+        return pending["code"], pending["updated_at"]
+    row = db.execute(
+        select(Draft.code, Draft.updated_at).where(Draft.client_id == client_id, Draft.problem_id == problem_id)
+    ).first()
+    return tuple(row) if row else None
@@ -0,0 +1,587 @@
+"""
+Interchangeable backends for running submissions in the sandbox.
+
+    spawn              a fresh interpreter per run (the default, and the strongest isolation)
+    fork-server        each run is forked from a warm server process with the runner and
+                       the allowed modules already imported
+    persistent-worker  long-lived interpreters take jobs over a pipe and fork a child
+                       for each, so no submission's state outlives its run; workers are
+                       still recycled after ``WORKER_MAX_RUNS`` runs
+
+Every backend lays out a sandbox directory for the job (``prepare``) and starts the
+runner on it with the user's code (``start``). The returned ``Run`` streams protocol
+lines as they arrive (``stream``), can be stopped early (``cancel``) and parses into the
+same ``ExecutionResult`` whatever the backend (``result``, or ``finish`` once streamed).
+``EXECUTOR_BACKEND`` picks the backend; ``bench_executors.py`` compares them on a
+deployment's hardware and ``python -m app.replay`` re-runs captured slow runs on them.
+"""
+
+import json
+import os
+import select
+import shutil
+import signal
+import socket
+import subprocess
+import tempfile
+import threading
+import time
+import traceback
+import uuid
+from collections.abc import Iterator
+from pathlib import Path
+from typing import Any
+
+from app.code_executor import (
+    ALLOWED_IMPORTS,
+    MAX_OUTPUT_BYTES,
+    TERMINATE_GRACE_SECONDS,
+    _runner_source,
+    kill_process_group,
+    output_limit_failure,
+    parse_test_output,
+    prepare_sandbox,
+    python_executable,
+    sandbox_env,
+    signal_process_group,
+    timeout_failure,
+    validate_code,
+    validation_failure,
+)
+from app.results import ExecutionResult
+
+EXECUTOR_BACKEND = os.getenv("EXECUTOR_BACKEND", "spawn")
+WORKER_MAX_RUNS = int(os.getenv("WORKER_MAX_RUNS", "50"))
+# Idle persistent workers kept for reuse
+WORKER_POOL_SIZE = int(os.getenv("WORKER_POOL_SIZE", str(os.cpu_count() or 1)))
+
+# How long a backend's helper process may take to start
+STARTUP_SECONDS = 10.0
+
+
+class PreparedJob:
+    """
+    A sandbox directory laid out for one job; each run only rewrites the user's module.
+
+    ``job`` is the runner's job line, sent to it on every start rather than stored in the sandbox.
+    """
+
+    def __init__(self, path: Path, module_file: Path, job: str):
+        self.path = path
+        self.module_file = module_file
+        self.job = job
+
+    def write_code(self, user_code: str) -> None:
+        self.module_file.write_text(user_code, encoding="utf-8")
+
+    def cleanup(self) -> None:
+        shutil.rmtree(self.path, ignore_errors=True)
+
+
+class Run:
+    """
+    A submission in flight: its output stream and how to stop it.
+
+    Reading is bounded by the run's deadline and ``MAX_OUTPUT_BYTES``; ``outcome`` says
+    how it ended ("exited", "timeout" or "overflow").
+    """
+
+    def __init__(self, fd: int, timeout: float):
+        self.fd = fd
+        self.timeout = timeout
+        self.deadline = time.monotonic() + timeout
+        self.lines: list[str] = []
+        self.outcome: str | None = None
+        self._buffer = b""
+        self._received = 0
+
+    def _is_end(self, raw: bytes) -> bool:
+        """Whether ``raw`` marks the end of the run's output, for backends whose stream outlives it."""
+        return False
+
+    def _read(self, deadline: float) -> Iterator[str]:
+        while True:
+            while b"\n" in self._buffer:
+                raw, self._buffer = self._buffer.split(b"\n", 1)
+                if self._is_end(raw):
+                    self.outcome = "exited"
+                    return
+                line = raw.decode("utf-8", errors="replace")
+                self.lines.append(line)
+                yield line
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                self.outcome = "timeout"
+                return
+            ready, _, _ = select.select([self.fd], [], [], remaining)
+            if not ready:
+                continue
+            chunk = os.read(self.fd, 65536)
+            if not chunk:
+                if self._buffer:
+                    self.lines.append(self._buffer.decode("utf-8", errors="replace"))
+                    self._buffer = b""
+                    yield self.lines[-1]
+                self.outcome = "exited"
+                return
+            self._received += len(chunk)
+            if self._received > MAX_OUTPUT_BYTES:
+                self.outcome = "overflow"
+                return
+            self._buffer += chunk
+
+    def stream(self) -> Iterator[str]:
+        """Yield output lines as the runner writes them, until it finishes, times out or floods."""
+        return self._read(self.deadline)
+
+    def cancel(self) -> None:
+        """Stop the run: SIGTERM lets the runner report buffered results, then whatever is left is killed."""
+        self.signal(signal.SIGTERM)
+        for _ in self._read(time.monotonic() + TERMINATE_GRACE_SECONDS):
+            pass
+        self.kill()
+
+    def result(self) -> ExecutionResult:
+        """Read the run to the end and parse its results; releases the run."""
+        try:
+            for _ in self.stream():
+                pass
+        except BaseException:
+            self.close()
+            raise
+        return self.finish()
+
+    def finish(self) -> ExecutionResult:
+        """Parse the results of a run whose stream has been read to the end; releases the run."""
+        try:
+            exit_code = self.wait() if self.outcome == "exited" else None
+            if self.outcome == "overflow":
+                self.kill()
+                return output_limit_failure()
+            if exit_code is None:
+                self.cancel()
+                return timeout_failure(self.timeout, "\n".join(self.lines))
+            return parse_test_output("\n".join(self.lines) + "\n", exit_code == 0)
+        finally:
+            self.close()
+
+    def signal(self, signum: int) -> None:
+        raise NotImplementedError
+
+    def kill(self) -> None:
+        raise NotImplementedError
+
+    def wait(self) -> int | None:
+        """Exit code of the finished run, or None if it hasn't exited by the deadline."""
+        raise NotImplementedError
+
+    def close(self) -> None:
+        raise NotImplementedError
+
+
+class ExecutorBackend:
+    """Runs prepared jobs; subclasses decide how the runner process comes to be."""
+
+    name = ""
+
+    def prepare(
+        self,
+        test_code: str,
+        module_path: str,
+        function_name: str | None = None,
+        test_cases: list[tuple[Any, Any, str]] | None = None,
+        fixtures: dict[str, tuple[str, str]] | None = None,
+        stress: dict[str, Any] | None = None,
+        profile: dict[str, Any] | None = None,
+        full_values: list[str] | None = None,
+        shard: tuple[int, int] | None = None,
+    ) -> PreparedJob:
+        path = Path(tempfile.mkdtemp(prefix="sandbox-"))
+        _, module_file, job = prepare_sandbox(
+            path, test_code, module_path, function_name, test_cases, fixtures, stress, profile, full_values, shard
+        )
+        return PreparedJob(path, module_file, job)
+
+    def start(self, prepared: PreparedJob, timeout: float) -> Run:
+        """Start the runner on ``prepared`` with the user's code already written."""
+        raise NotImplementedError
+
+    def run(self, prepared: PreparedJob, user_code: str, timeout: float = 5) -> ExecutionResult:
+        is_valid, error = validate_code(user_code)
+        if not is_valid:
+            return validation_failure(error)
+        try:
+            prepared.write_code(user_code)
+            return self.start(prepared, timeout).result()
+        except Exception as e:
+            return ExecutionResult.failure(f"Execution error: {str(e)}", "Execution", output=traceback.format_exc())
+
+    def execute(self, user_code: str, timeout: float = 5, **job: Any) -> ExecutionResult:
+        """Prepare, run and clean up a one-off job."""
+        is_valid, error = validate_code(user_code)
+        if not is_valid:
+            return validation_failure(error)
+        prepared = self.prepare(**job)
+        try:
+            return self.run(prepared, user_code, timeout)
+        finally:
+            prepared.cleanup()
+
+    def close(self) -> None:
+        """Stop any helper processes the backend keeps."""
+
+    def metrics(self) -> dict[str, Any]:
+        return {"backend": self.name}
+
+
+class SpawnRun(Run):
+    def __init__(self, process: subprocess.Popen, timeout: float):
+        assert process.stdout is not None
+        super().__init__(process.stdout.fileno(), timeout)
+        self.process = process
+
+    def signal(self, signum: int) -> None:
+        signal_process_group(self.process, signum)
+
+    def kill(self) -> None:
+        kill_process_group(self.process)
+
+    def wait(self) -> int | None:
+        try:
+            return self.process.wait(timeout=max(0.0, self.deadline - time.monotonic()))
+        except subprocess.TimeoutExpired:
+            return None
+
+    def close(self) -> None:
+        kill_process_group(self.process)
+        assert self.process.stdout is not None
+        self.process.stdout.close()
+
+
+class SpawnBackend(ExecutorBackend):
+    """A new interpreter per run."""
+
+    name = "spawn"
+
+    def start(self, prepared: PreparedJob, timeout: float) -> Run:
+        # Its own session (process group), so a timeout can kill everything it started
+        process = subprocess.Popen(
+            [python_executable(), str(prepared.path / "run_tests.py")],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            cwd=str(prepared.path),
+            env=sandbox_env(prepared.path),
+            start_new_session=True,
+        )
+        assert process.stdin is not None
+        try:
+            process.stdin.write(prepared.job.encode("utf-8"))
+        except BrokenPipeError:
+            # The runner died before reading its job; its output says why
+            pass
+        finally:
+            try:
+                process.stdin.close()
+            except BrokenPipeError:
+                pass
+        return SpawnRun(process, timeout)
+
+
+def read_line(sock: socket.socket, deadline: float) -> str | None:
+    """Read one short control line from ``sock``, or None on EOF or at the deadline."""
+    data = b""
+    while not data.endswith(b"\n"):
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return None
+        sock.settimeout(remaining)
+        try:
+            chunk = sock.recv(64)
+        except (TimeoutError, OSError):
+            return None
+        if not chunk:
+            return None
+        data += chunk
+    return data.decode().strip()
+
+
+class ForkServerRun(Run):
+    def __init__(self, pid: int, conn: socket.socket, fd: int, timeout: float):
+        super().__init__(fd, timeout)
+        self.pid = pid
+        self.conn = conn
+        self.exit_code: int | None = None
+
+    def _poll_exit(self, deadline: float) -> int | None:
+        if self.exit_code is None:
+            line = read_line(self.conn, deadline)
+            if line and line.startswith("EXIT "):
+                self.exit_code = int(line.split()[1])
+        return self.exit_code
+
+    def signal(self, signum: int) -> None:
+        # Once the server has reported the exit the child is reaped and its pid may be reused
+        if self._poll_exit(time.monotonic()) is not None:
+            return
+        try:
+            os.killpg(self.pid, signum)
+        except (ProcessLookupError, PermissionError):
+            pass
+
+    def kill(self) -> None:
+        self.signal(signal.SIGKILL)
+        self._poll_exit(time.monotonic() + 1.0)
+
+    def wait(self) -> int | None:
+        return self._poll_exit(self.deadline)
+
+    def close(self) -> None:
+        if self.exit_code is None:
+            self.kill()
+        os.close(self.fd)
+        self.conn.close()
+
+
+class ForkServerBackend(ExecutorBackend):
+    """Forks each run from a long-lived server that has paid the interpreter start-up once."""
+
+    name = "fork-server"
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._process: subprocess.Popen | None = None
+        self._dir: str | None = None
+        self.restarts = 0
+
+    def _socket_path(self) -> str:
+        """Path of the running server's socket, (re)starting the server if needed."""
+        with self._lock:
+            if self._process is None or self._process.poll() is not None:
+                self._start_server()
+            assert self._dir is not None
+            return os.path.join(self._dir, "fork-server.sock")
+
+    def _start_server(self) -> None:
+        self._stop_server()
+        self._dir = tempfile.mkdtemp(prefix="fork-server-")
+        path = Path(self._dir)
+        runner = path / "run_tests.py"
+        runner.write_text(_runner_source(), encoding="utf-8")
+        self._process = subprocess.Popen(
+            [
+                python_executable(),
+                str(runner),
+                "--fork-server",
+                str(path / "fork-server.sock"),
+                ",".join(sorted(ALLOWED_IMPORTS)),
+            ],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            cwd=str(path),
+            env=sandbox_env(path),
+            start_new_session=True,
+        )
+        assert self._process.stdout is not None
+        ready, _, _ = select.select([self._process.stdout], [], [], STARTUP_SECONDS)
+        line = self._process.stdout.readline().decode(errors="replace").strip() if ready else ""
+        if line != "READY":
+            self._stop_server()
+            raise RuntimeError(f"Fork server failed to start: {line or 'no response'}")
+        self.restarts += 1
+
+    def _stop_server(self) -> None:
+        if self._process is not None:
+            kill_process_group(self._process)
+            assert self._process.stdout is not None
+            self._process.stdout.close()
+            self._process = None
+        if self._dir is not None:
+            shutil.rmtree(self._dir, ignore_errors=True)
+            self._dir = None
+
+    def start(self, prepared: PreparedJob, timeout: float) -> Run:
+        socket_path = self._socket_path()
+        read_fd, write_fd = os.pipe()
+        job_read_fd, job_write_fd = os.pipe()
+        conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            conn.connect(socket_path)
+            socket.send_fds(conn, [json.dumps({"dir": str(prepared.path)}).encode()], [write_fd, job_read_fd])
+        except OSError:
+            conn.close()
+            os.close(read_fd)
+            os.close(job_write_fd)
+            raise
+        finally:
+            # The child holds the only write end, so EOF means it (and anything it started) is done
+            os.close(write_fd)
+            os.close(job_read_fd)
+        # The job goes through its own pipe, never through the sandbox directory
+        with os.fdopen(job_write_fd, "wb") as job_stream:
+            try:
+                job_stream.write(prepared.job.encode("utf-8"))
+            except BrokenPipeError:
+                pass
+        line = read_line(conn, time.monotonic() + STARTUP_SECONDS)
+        if not line or not line.startswith("PID "):
+            conn.close()
+            os.close(read_fd)
+            raise RuntimeError("Fork server did not start the run")
+        return ForkServerRun(int(line.split()[1]), conn, read_fd, timeout)
+
+    def close(self) -> None:
+        with self._lock:
+            self._stop_server()
+
+    def metrics(self) -> dict[str, Any]:
+        return {"backend": self.name, "server_starts": self.restarts}
+
+
+class Worker:
+    """A persistent runner process executing one job at a time."""
+
+    def __init__(self) -> None:
+        self.dir = tempfile.mkdtemp(prefix="worker-")
+        path = Path(self.dir)
+        runner = path / "run_tests.py"
+        runner.write_text(_runner_source(), encoding="utf-8")
+        self.process = subprocess.Popen(
+            [python_executable(), str(runner), "--worker"],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            cwd=str(path),
+            env=sandbox_env(path),
+            start_new_session=True,
+        )
+        self.runs = 0
+        assert self.process.stdout is not None
+        ready, _, _ = select.select([self.process.stdout], [], [], STARTUP_SECONDS)
+        line = self.process.stdout.readline().decode(errors="replace").strip() if ready else ""
+        if line != "READY":
+            self.close()
+            raise RuntimeError(f"Worker failed to start: {line or 'no response'}")
+
+    @property
+    def alive(self) -> bool:
+        return self.process.poll() is None
+
+    def close(self) -> None:
+        kill_process_group(self.process)
+        for stream in (self.process.stdin, self.process.stdout):
+            if stream is not None:
+                stream.close()
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+
+class WorkerRun(Run):
+    def __init__(self, backend: "PersistentWorkerBackend", worker: Worker, token: str, timeout: float):
+        assert worker.process.stdout is not None
+        super().__init__(worker.process.stdout.fileno(), timeout)
+        self.backend = backend
+        self.worker = worker
+        self.marker = f"DONE {token} ".encode()
+        self.exit_code: int | None = None
+        self.killed = False
+
+    def _is_end(self, raw: bytes) -> bool:
+        if raw.startswith(self.marker):
+            self.exit_code = int(raw[len(self.marker) :])
+            return True
+        return False
+
+    def finish(self) -> ExecutionResult:
+        result = super().finish()
+        # The worker's "\nDONE" adds an empty line to whatever the run printed
+        result.output = result.output.strip()
+        return result
+
+    def signal(self, signum: int) -> None:
+        self.killed = True
+        signal_process_group(self.worker.process, signum)
+
+    def kill(self) -> None:
+        self.killed = True
+        kill_process_group(self.worker.process)
+
+    def wait(self) -> int | None:
+        if self.exit_code is None and not self.worker.alive:
+            # The worker itself died mid-run
+            return self.worker.process.returncode
+        return self.exit_code
+
+    def close(self) -> None:
+        healthy = self.exit_code is not None and not self.killed and self.worker.alive
+        self.backend.release(self.worker, healthy)
+
+
+class PersistentWorkerBackend(ExecutorBackend):
+    """Reuses long-lived interpreters, recycled after ``WORKER_MAX_RUNS`` runs or any crash or timeout."""
+
+    name = "persistent-worker"
+
+    def __init__(self, pool_size: int = WORKER_POOL_SIZE, max_runs: int = WORKER_MAX_RUNS):
+        self.pool_size = pool_size
+        self.max_runs = max_runs
+        self._idle: list[Worker] = []
+        self._lock = threading.Lock()
+        self.started = 0
+        self.recycled = 0
+
+    def _acquire(self) -> Worker:
+        with self._lock:
+            while self._idle:
+                worker = self._idle.pop()
+                if worker.alive:
+                    return worker
+                worker.close()
+            self.started += 1
+        return Worker()
+
+    def release(self, worker: Worker, healthy: bool) -> None:
+        with self._lock:
+            if healthy and worker.runs < self.max_runs and len(self._idle) < self.pool_size:
+                self._idle.append(worker)
+                return
+            self.recycled += 1
+        worker.close()
+
+    def start(self, prepared: PreparedJob, timeout: float) -> Run:
+        worker = self._acquire()
+        token = uuid.uuid4().hex
+        request = json.dumps({"dir": str(prepared.path), "token": token, "job": json.loads(prepared.job)}) + "\n"
+        assert worker.process.stdin is not None
+        try:
+            worker.process.stdin.write(request.encode("utf-8"))
+            worker.process.stdin.flush()
+        except OSError:
+            self.release(worker, healthy=False)
+            raise
+        worker.runs += 1
+        return WorkerRun(self, worker, token, timeout)
+
+    def close(self) -> None:
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for worker in idle:
+            worker.close()
+
+    def metrics(self) -> dict[str, Any]:
+        return {"backend": self.name, "idle": len(self._idle), "started": self.started, "recycled": self.recycled}
+
+
+BACKENDS: dict[str, type[ExecutorBackend]] = {
+    "spawn": SpawnBackend,
+    "fork-server": ForkServerBackend,
+    "persistent-worker": PersistentWorkerBackend,
+}
+
+
+def make_backend(name: str) -> ExecutorBackend:
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown EXECUTOR_BACKEND '{name}' (choose from {', '.join(BACKENDS)})")
+    return BACKENDS[name]()
+
+
+executor = make_backend(EXECUTOR_BACKEND)
@@ -0,0 +1,81 @@
+"""
+Large binary test fixtures shared across sandbox runs.
+
+Fixtures are stored once per problem in the database as packed ``array`` bytes
+(e.g. typecode ``"q"`` for 64-bit ints). Before a run they are materialized into a
+host-local, content-addressed cache directory, and the sandbox maps them read-only
+with ``mmap`` so concurrent runs share the page cache instead of each parsing and
+copying megabytes of literals.
+"""
+
+import array
+import hashlib
+import os
+import tempfile
+import uuid
+from collections.abc import Iterable
+from pathlib import Path
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.models import ProblemFixture
+
+FIXTURE_CACHE_DIR = Path(os.getenv("FIXTURE_CACHE_DIR", Path(tempfile.gettempdir()) / "algorithms-fixtures"))
+
+# Typecodes accepted by both array.array and memoryview.cast
+FIXTURE_TYPECODES = {"b", "B", "h", "H", "i", "I", "l", "L", "q", "Q", "f", "d"}
+
+
+def pack_fixture(values: Iterable[int | float], typecode: str = "q") -> bytes:
+    """Pack values into the array-compatible layout fixtures are stored in."""
+    if typecode not in FIXTURE_TYPECODES:
+        raise ValueError(f"Unsupported fixture typecode '{typecode}'")
+    return array.array(typecode, values).tobytes()
+
+
+def fixture_digest(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def _cache_path(sha256: str) -> Path:
+    return FIXTURE_CACHE_DIR / f"{sha256}.bin"
+
+
+def _materialize(path: Path, data: bytes) -> None:
+    """Write a fixture into the cache atomically so readers never see a partial file."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_name = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.chmod(tmp_name, 0o444)
+        os.replace(tmp_name, path)
+    except BaseException:
+        Path(tmp_name).unlink(missing_ok=True)
+        raise
+
+
+def load_fixtures(db: Session, problem_id: uuid.UUID) -> dict[str, tuple[str, str]]:
+    """
+    Return ``{name: (typecode, path)}`` for a problem's fixtures.
+
+    Only metadata is queried on the hot path; fixture bytes are fetched from the
+    database the first time a fixture is needed on this host.
+    """
+    rows = db.execute(
+        select(ProblemFixture.id, ProblemFixture.name, ProblemFixture.typecode, ProblemFixture.sha256).where(
+            ProblemFixture.problem_id == problem_id
+        )
+    ).all()
+
+    fixtures = {}
+    for fixture_id, name, typecode, sha256 in rows:
+        path = _cache_path(sha256)
+        if not path.exists():
+            data = db.scalar(select(ProblemFixture.data).where(ProblemFixture.id == fixture_id))
+            if data is None or fixture_digest(data) != sha256:
+                raise ValueError(f"Fixture '{name}' is corrupt (checksum mismatch)")
+            _materialize(path, data)
+        fixtures[name] = (typecode, str(path))
+    return fixtures
@@ -0,0 +1,254 @@
+"""
+Bulk import of problem packages.
+
+A problem package is a directory containing:
+
+    problem.json     {"title", "category", "function_name", optional "fixtures": {name: typecode},
+                      optional "time_limit_multiplier" (needs reference.py),
+                      optional "test_shards" (parallel sandboxes for a large suite, default 1)}
+    description.md   problem statement
+    starter.py       starter code shown in the editor
+    tests.py         sample test_* functions, run on "Run" (may be empty when cases.json is given)
+    hidden_tests.py  optional test_* functions only run on "Submit"
+    cases.json       optional [{"args": [...], "expected": ..., "comparison": "exact", "sample": true}, ...];
+                     cases with "sample": false only run on "Submit"
+    reference.py     optional correct solution, used by stress mode
+    generator.py     optional generate(rng, size) -> args list (and shrink(args)); needs reference.py
+    fixtures/        optional <name>.bin files in packed array layout
+
+The directory name is the problem's slug. Packages are validated in parallel and
+hashed; only problems whose content hash changed are written, in batched upserts keyed
+by slug, so unchanged problems keep their UUIDs and any cached artifacts.
+
+Usage:
+    python -m app.importer [DIRECTORY] [--prune]
+"""
+
+import ast
+import hashlib
+import json
+import os
+import sys
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any
+
+from sqlalchemy import delete, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from app.code_executor import COMPARISON_MODES
+from app.database import SessionLocal
+from app.fixtures import FIXTURE_TYPECODES, fixture_digest
+from app.models import Problem, ProblemFixture, ProblemTestCase
+from app.sharding import MAX_TEST_SHARDS
+
+PROBLEMS_DIR = Path(__file__).parent.parent / "problems"
+
+# Rows per INSERT ... ON CONFLICT statement
+UPSERT_BATCH_SIZE = 500
+
+
+class PackageError(ValueError):
+    """Raised when a problem package is malformed."""
+
+
+def _read(package: Path, name: str) -> str:
+    path = package / name
+    if not path.is_file():
+        raise PackageError(f"{package.name}: missing {name}")
+    return path.read_text(encoding="utf-8")
+
+
+def load_package(package: Path) -> dict[str, Any]:
+    """Read, validate and hash a single problem package."""
+    try:
+        meta = json.loads(_read(package, "problem.json"))
+    except json.JSONDecodeError as e:
+        raise PackageError(f"{package.name}: invalid problem.json: {e}") from e
+    for field in ("title", "category", "function_name"):
+        if not isinstance(meta.get(field), str) or not meta[field].strip():
+            raise PackageError(f"{package.name}: problem.json needs a non-empty '{field}'")
+
+    starter_code = _read(package, "starter.py")
+    test_code = _read(package, "tests.py")
+    hidden_test_code = _read(package, "hidden_tests.py") if (package / "hidden_tests.py").is_file() else None
+    sources = [("starter.py", starter_code), ("tests.py", test_code)]
+    if hidden_test_code is not None:
+        sources.append(("hidden_tests.py", hidden_test_code))
+    for name, source in sources:
+        try:
+            ast.parse(source)
+        except SyntaxError as e:
+            raise PackageError(f"{package.name}: syntax error in {name}: {e}") from e
+    starter_functions = {node.name for node in ast.walk(ast.parse(starter_code)) if isinstance(node, ast.FunctionDef)}
+    if meta["function_name"] not in starter_functions:
+        raise PackageError(f"{package.name}: starter.py does not define {meta['function_name']}()")
+
+    reference_solution = input_generator = None
+    if (package / "reference.py").is_file() or (package / "generator.py").is_file():
+        reference_solution = _read(package, "reference.py")
+        input_generator = _read(package, "generator.py")
+        for name, source, required in (
+            ("reference.py", reference_solution, meta["function_name"]),
+            ("generator.py", input_generator, "generate"),
+        ):
+            try:
+                tree = ast.parse(source)
+            except SyntaxError as e:
+                raise PackageError(f"{package.name}: syntax error in {name}: {e}") from e
+            if required not in {node.name for node in tree.body if isinstance(node, ast.FunctionDef)}:
+                raise PackageError(f"{package.name}: {name} does not define {required}()")
+
+    cases = []
+    cases_file = package / "cases.json"
+    if cases_file.is_file():
+        try:
+            raw_cases = json.loads(cases_file.read_text(encoding="utf-8"))
+        except json.JSONDecodeError as e:
+            raise PackageError(f"{package.name}: invalid cases.json: {e}") from e
+        for position, case in enumerate(raw_cases):
+            if not isinstance(case, dict) or not isinstance(case.get("args"), list) or "expected" not in case:
+                raise PackageError(f"{package.name}: case {position} needs 'args' (a list) and 'expected'")
+            comparison = case.get("comparison", "exact")
+            if comparison not in COMPARISON_MODES:
+                raise PackageError(f"{package.name}: case {position} has unknown comparison '{comparison}'")
+            sample = case.get("sample", True)
+            if not isinstance(sample, bool):
+                raise PackageError(f"{package.name}: case {position} has a non-boolean 'sample'")
+            cases.append(
+                {
+                    "position": position,
+                    "args": case["args"],
+                    "expected": case["expected"],
+                    "comparison": comparison,
+                    "sample": sample,
+                }
+            )
+
+    fixtures = []
+    for name, typecode in sorted((meta.get("fixtures") or {}).items()):
+        if typecode not in FIXTURE_TYPECODES:
+            raise PackageError(f"{package.name}: fixture '{name}' has unsupported typecode '{typecode}'")
+        fixture_file = package / "fixtures" / f"{name}.bin"
+        if not fixture_file.is_file():
+            raise PackageError(f"{package.name}: missing fixtures/{name}.bin")
+        data = fixture_file.read_bytes()
+        fixtures.append({"name": name, "typecode": typecode, "sha256": fixture_digest(data), "data": data})
+
+    multiplier = meta.get("time_limit_multiplier")
+    if multiplier is not None:
+        if not isinstance(multiplier, (int, float)) or multiplier <= 0:
+            raise PackageError(f"{package.name}: time_limit_multiplier must be a positive number")
+        if reference_solution is None:
+            raise PackageError(f"{package.name}: time_limit_multiplier needs reference.py")
+
+    shards = meta.get("test_shards", 1)
+    if not isinstance(shards, int) or isinstance(shards, bool) or not 1 <= shards <= MAX_TEST_SHARDS:
+        raise PackageError(f"{package.name}: test_shards must be an integer from 1 to {MAX_TEST_SHARDS}")
+
+    problem = {
+        "slug": package.name,
+        "title": meta["title"].strip(),
+        "description": _read(package, "description.md").strip(),
+        "category": meta["category"].strip(),
+        "function_name": meta["function_name"].strip(),
+        "starter_code": starter_code,
+        "test_code": test_code,
+        "hidden_test_code": hidden_test_code,
+        "reference_solution": reference_solution,
+        "input_generator": input_generator,
+        "time_limit_multiplier": float(multiplier) if multiplier is not None else None,
+        "test_shards": shards,
+    }
+    hashed = {
+        **problem,
+        "cases": cases,
+        "fixtures": [{k: f[k] for k in ("name", "typecode", "sha256")} for f in fixtures],
+    }
+    problem["content_hash"] = hashlib.sha256(json.dumps(hashed, sort_keys=True).encode("utf-8")).hexdigest()
+    return {"problem": problem, "cases": cases, "fixtures": fixtures}
+
+
+def load_packages(directory: Path, max_workers: int | None = None) -> list[dict[str, Any]]:
+    """Validate every package in ``directory``, in parallel for large catalogs."""
+    packages = sorted(p for p in directory.iterdir() if p.is_dir() and (p / "problem.json").exists())
+    workers = max_workers or os.cpu_count() or 1
+    if len(packages) < 2 * workers:
+        return [load_package(p) for p in packages]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(load_package, packages, chunksize=max(1, len(packages) // (workers * 4))))
+
+
+def _batches(items: list, size: int = UPSERT_BATCH_SIZE):
+    for start in range(0, len(items), size):
+        yield items[start : start + size]
+
+
+def import_problems(db: Session, packages: list[dict[str, Any]], prune: bool = False) -> dict[str, int]:
+    """Upsert changed packages by slug; returns counts of created, updated, unchanged and deleted problems."""
+    existing = dict(db.execute(select(Problem.slug, Problem.content_hash).where(Problem.slug.is_not(None))).all())
+    changed = [p for p in packages if existing.get(p["problem"]["slug"]) != p["problem"]["content_hash"]]
+
+    ids_by_slug: dict[str, uuid.UUID] = {}
+    for batch in _batches(changed):
+        rows = [{"id": uuid.uuid4(), **p["problem"]} for p in batch]
+        stmt = insert(Problem).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[Problem.slug],
+            set_={column: stmt.excluded[column] for column in rows[0] if column not in ("id", "slug")},
+        ).returning(Problem.slug, Problem.id)
+        ids_by_slug.update(dict(db.execute(stmt).all()))
+
+    if changed:
+        changed_ids = list(ids_by_slug.values())
+        for batch in _batches(changed_ids):
+            db.execute(delete(ProblemTestCase).where(ProblemTestCase.problem_id.in_(batch)))
+            db.execute(delete(ProblemFixture).where(ProblemFixture.problem_id.in_(batch)))
+        case_rows = [{"problem_id": ids_by_slug[p["problem"]["slug"]], **case} for p in changed for case in p["cases"]]
+        for batch in _batches(case_rows, 5000):
+            db.execute(insert(ProblemTestCase), batch)
+        fixture_rows = [
+            {"problem_id": ids_by_slug[p["problem"]["slug"]], **fixture} for p in changed for fixture in p["fixtures"]
+        ]
+        for batch in _batches(fixture_rows, 50):
+            db.execute(insert(ProblemFixture), batch)
+
+    deleted = 0
+    if prune:
+        stale = set(existing) - {p["problem"]["slug"] for p in packages}
+        for batch in _batches(sorted(stale)):
+            deleted += db.execute(delete(Problem).where(Problem.slug.in_(batch))).rowcount
+    db.commit()
+
+    created = sum(1 for p in changed if p["problem"]["slug"] not in existing)
+    return {
+        "created": created,
+        "updated": len(changed) - created,
+        "unchanged": len(packages) - len(changed),
+        "deleted": deleted,
+    }
+
+
+def run_import(directory: Path = PROBLEMS_DIR, prune: bool = False) -> dict[str, int]:
+    packages = load_packages(directory)
+    db = SessionLocal()
+    try:
+        return import_problems(db, packages, prune=prune)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    args = [a for a in sys.argv[1:] if not a.startswith("-")]
+    directory = Path(args[0]) if args else PROBLEMS_DIR
+    try:
+        counts = run_import(directory, prune="--prune" in sys.argv)
+    except PackageError as e:
+        print(f"Import failed: {e}")
+        sys.exit(1)
+    print(
+        f"Imported problems from {directory}: {counts['created']} created, {counts['updated']} updated, "
+        f"{counts['unchanged']} unchanged, {counts['deleted']} deleted"
+    )
@@ -1,13 +1,68 @@
+import asyncio
+import logging
+import os
+import resource
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
 from pathlib import Path
 
 from fastapi import FastAPI
+from fastapi.middleware.gzip import GZipMiddleware
 from fastapi.responses import JSONResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 
-from app.routes import router
+from app.analytics import analytics_metrics, analytics_writers
+from app.calibration import calibrator
+from app.captures import captures
+from app.concurrency import ADAPTIVE_CONCURRENCY, concurrency
+from app.drafts import draft_limiter, draft_writer
+from app.executors import executor
+from app.routes import load_submit_job, router
+from app.runtime_stats import runtime_stats
+from app.scheduler import scheduler
+from app.sessions import sessions
+from app.shared_cache import shared_cache
+from app.sharding import core_budget
+from app.startup import readiness, warm_up
+from app.submissions import submissions
 
-app = FastAPI(title="Algorithms Practice")
+logger = logging.getLogger("uvicorn.error")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    # Warm up in the background so /health answers immediately while /ready waits
+    warm_up_task = asyncio.create_task(warm_up())
+    reaper_task = asyncio.create_task(sessions.reap_forever())
+    calibration_task = asyncio.create_task(calibrator.refresh_forever(load_submit_job))
+    draft_task = asyncio.create_task(draft_writer.flush_forever())
+    analytics_tasks = [asyncio.create_task(writer.flush_forever()) for writer in analytics_writers]
+    concurrency_task = asyncio.create_task(concurrency.adjust_forever()) if ADAPTIVE_CONCURRENCY else None
+    yield
+    warm_up_task.cancel()
+    reaper_task.cancel()
+    calibration_task.cancel()
+    draft_task.cancel()
+    for task in analytics_tasks:
+        task.cancel()
+    if concurrency_task:
+        concurrency_task.cancel()
+    # Don't lose the last seconds of autosaves and run outcomes
+    for writer in [draft_writer, *analytics_writers]:
+        try:
+            writer.flush()
+        except Exception as e:
+            logger.warning("Final %s flush failed: %s", writer.model.__tablename__, e)
+    submissions.cancel_all()
+    sessions.close_all()
+    executor.close()
+
+
+app = FastAPI(title="Algorithms Practice", lifespan=lifespan)
+
+# Results for problems with thousands of cases are large but highly repetitive
+app.add_middleware(GZipMiddleware, minimum_size=1024)
 
 # Use absolute path for templates to work reliably on Heroku
 template_dir = Path(__file__).parent / "templates"
@@ -23,3 +78,42 @@ app.include_router(router)
 @app.get("/health")
 async def health() -> JSONResponse:
     return JSONResponse({"status": "ok"})
+
+
+@app.get("/ready")
+async def ready() -> JSONResponse:
+    if not readiness.ready:
+        return JSONResponse({"status": "warming_up", "phases": readiness.phases}, status_code=503)
+    return JSONResponse({"status": "ready", "ready_after": readiness.ready_after, "phases": readiness.phases})
+
+
+def process_metrics() -> dict[str, int]:
+    """Current and peak resident set size of this web process."""
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024  # KiB on Linux
+    try:
+        with open("/proc/self/statm") as statm:
+            rss = int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        rss = peak_rss
+    return {"rss_bytes": rss, "peak_rss_bytes": peak_rss}
+
+
+@app.get("/metrics")
+async def metrics() -> JSONResponse:
+    return JSONResponse(
+        {
+            "scheduler": scheduler.metrics(),
+            "concurrency": concurrency.metrics(),
+            "runtimes": runtime_stats.metrics(),
+            "sessions": sessions.metrics(),
+            "submissions": submissions.metrics(),
+            "drafts": {**draft_writer.metrics(), "rate_limited": draft_limiter.limited},
+            "analytics": analytics_metrics(),
+            "captures": captures.metrics(),
+            "sharding": core_budget.metrics(),
+            "shared_cache": shared_cache.metrics(),
+            "executor": executor.metrics(),
+            "calibration": calibrator.metrics(),
+            "process": process_metrics(),
+        }
+    )
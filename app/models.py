@@ -1,6 +1,22 @@
 import uuid
-from sqlalchemy import Column, String, Text
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy import (
+    Boolean,
+    Column,
+    Computed,
+    DateTime,
+    FetchedValue,
+    Float,
+    ForeignKey,
+    Index,
+    Integer,
+    LargeBinary,
+    String,
+    Text,
+    UniqueConstraint,
+    func,
+)
+from sqlalchemy.dialects.postgresql import JSONB, TSVECTOR, UUID
+from sqlalchemy.orm import deferred, relationship
 from app.database import Base
 
 
@@ -8,15 +24,142 @@ class Problem(Base):
     __tablename__ = "problems"
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, index=True)
+    slug = Column(String, nullable=True, unique=True, index=True)
     title = Column(String, nullable=False)
     description = Column(Text, nullable=False)
     category = Column(String, nullable=False, index=True)
     function_name = Column(String, nullable=False)
     starter_code = Column(Text, nullable=False)
     test_code = Column(Text, nullable=False)
+    # test_* functions only run on "Submit"; test_code holds the visible sample tests
+    hidden_test_code = deferred(Column(Text, nullable=True))
+    content_hash = Column(String(64), nullable=True)
+    # Optional sources for stress mode: a correct solution and generate(rng, size) for inputs
+    reference_solution = deferred(Column(Text, nullable=True))
+    input_generator = deferred(Column(Text, nullable=True))
+    # Time limit as a multiple of the reference solution's runtime on the host (see app.calibration)
+    time_limit_multiplier = Column(Float, nullable=True)
+    # Parallel sandboxes the tests may be split across when cores are idle (see app.sharding)
+    test_shards = Column(Integer, nullable=False, default=1, server_default="1")
+    # Bumped by triggers whenever content, test cases or fixtures change; key caches on it
+    version = Column(Integer, nullable=False, server_default="1", server_onupdate=FetchedValue())
+    updated_at = Column(
+        DateTime(timezone=True), nullable=False, server_default=func.now(), server_onupdate=FetchedValue()
+    )
+    # Weighted title + description document, GIN-indexed for full-text search
+    search_vector = deferred(
+        Column(
+            TSVECTOR,
+            Computed(
+                "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+                "setweight(to_tsvector('english', coalesce(description, '')), 'B')",
+                persisted=True,
+            ),
+        )
+    )
+
+    test_cases = relationship(
+        "ProblemTestCase",
+        order_by="ProblemTestCase.position",
+        cascade="all, delete-orphan",
+        passive_deletes=True,
+    )
+    fixtures = relationship("ProblemFixture", cascade="all, delete-orphan", passive_deletes=True)
 
     @property
     def module_path(self) -> str:
         """Generate module path from category and function_name."""
         category_module = self.category.replace("-", "_")
         return f"{category_module}.{self.function_name}"
+
+
+class ProblemTestCase(Base):
+    """A data-driven test case: call function_name(*args) and compare with expected."""
+
+    __tablename__ = "problem_test_cases"
+    __table_args__ = (UniqueConstraint("problem_id", "position", name="uq_problem_test_cases_position"),)
+
+    id = Column(Integer, primary_key=True)
+    problem_id = Column(UUID(as_uuid=True), ForeignKey("problems.id", ondelete="CASCADE"), nullable=False, index=True)
+    position = Column(Integer, nullable=False)
+    args = Column(JSONB, nullable=False)
+    expected = Column(JSONB, nullable=True)
+    comparison = Column(String, nullable=False, default="exact", server_default="exact")
+    # Sample cases run on every "Run"; the rest only on "Submit"
+    sample = Column(Boolean, nullable=False, default=True, server_default="true")
+
+
+class ProblemFixture(Base):
+    """A large binary input stored once per problem as packed ``array`` bytes."""
+
+    __tablename__ = "problem_fixtures"
+    __table_args__ = (UniqueConstraint("problem_id", "name", name="uq_problem_fixtures_name"),)
+
+    id = Column(Integer, primary_key=True)
+    problem_id = Column(UUID(as_uuid=True), ForeignKey("problems.id", ondelete="CASCADE"), nullable=False, index=True)
+    name = Column(String, nullable=False)
+    typecode = Column(String(1), nullable=False, default="q", server_default="q")
+    sha256 = Column(String(64), nullable=False)
+    data = deferred(Column(LargeBinary, nullable=False))
+
+
+class Draft(Base):
+    """The latest unsubmitted code of one browser (``client_id`` cookie) for a problem."""
+
+    __tablename__ = "drafts"
+    __table_args__ = (UniqueConstraint("client_id", "problem_id", name="uq_drafts_client_problem"),)
+
+    id = Column(Integer, primary_key=True)
+    client_id = Column(String(64), nullable=False)
+    problem_id = Column(UUID(as_uuid=True), ForeignKey("problems.id", ondelete="CASCADE"), nullable=False, index=True)
+    code = Column(Text, nullable=False)
+    updated_at = Column(DateTime(timezone=True), nullable=False)
+
+
+class RunOutcome(Base):
+    """One run's verdict, kept as the raw record behind the analytics aggregates."""
+
+    __tablename__ = "run_outcomes"
+    __table_args__ = (Index("ix_run_outcomes_problem_id_created_at", "problem_id", "created_at"),)
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    problem_id = Column(UUID(as_uuid=True), ForeignKey("problems.id", ondelete="CASCADE"), nullable=False)
+    mode = Column(String(16), nullable=False)
+    success = Column(Boolean, nullable=False)
+    passed_count = Column(Integer, nullable=False)
+    total_count = Column(Integer, nullable=False)
+    failed_tests = Column(JSONB, nullable=False)
+    duration_seconds = Column(Float, nullable=False)
+    created_at = Column(DateTime(timezone=True), nullable=False)
+
+
+class ProblemRunStats(Base):
+    """Running totals of a problem's runs in one mode; counters only ever grow."""
+
+    __tablename__ = "problem_run_stats"
+
+    problem_id = Column(UUID(as_uuid=True), ForeignKey("problems.id", ondelete="CASCADE"), primary_key=True)
+    mode = Column(String(16), primary_key=True)
+    attempts = Column(Integer, nullable=False)
+    passes = Column(Integer, nullable=False)
+    total_seconds = Column(Float, nullable=False)
+
+
+class ProblemTestFailure(Base):
+    __tablename__ = "problem_test_failures"
+
+    problem_id = Column(UUID(as_uuid=True), ForeignKey("problems.id", ondelete="CASCADE"), primary_key=True)
+    mode = Column(String(16), primary_key=True)
+    test_name = Column(String, primary_key=True)
+    failures = Column(Integer, nullable=False)
+
+
+class ProblemRuntimeBucket(Base):
+    """Runs of a problem whose duration falls in one log-scaled bucket (see ``app.analytics``)."""
+
+    __tablename__ = "problem_runtime_buckets"
+
+    problem_id = Column(UUID(as_uuid=True), ForeignKey("problems.id", ondelete="CASCADE"), primary_key=True)
+    mode = Column(String(16), primary_key=True)
+    bucket = Column(Integer, primary_key=True)
+    runs = Column(Integer, nullable=False)
@@ -0,0 +1,187 @@
+"""
+Re-run captured slow and failed runs (see ``app.captures``) with per-phase timing.
+
+Each capture is run ``--repeat`` times on every backend in ``--backends``, with the code,
+job and time limit it had in production, and the median time of each phase is reported:
+
+    prepare       lay out the sandbox directory
+    write         write the user's module
+    start         start the runner (spawn, fork or hand to a worker)
+    first_output  until the runner's first line: interpreter start-up and loading the tests
+    tests         the tests themselves
+    finish        wait for the exit and parse the results
+    cleanup       remove the sandbox directory
+
+Suites that ran sharded (see ``app.sharding``) are replayed in a single process. Verdicts
+are compared with the captured one, so an executor change can be A/B tested on
+real traffic. Captures rely on host-local fixture paths, so replay them on a host that has
+the problems' fixtures cached.
+
+Usage:
+    python -m app.replay [--dir DIR] [--backends spawn,fork-server] [--repeat 3]
+                         [--reason timeout,slow,error] [--problem ID] [--limit 20]
+                         [--timeout-scale 1.0] [--list]
+"""
+
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Any
+
+from app.captures import CAPTURE_DIR, CaptureStore
+from app.code_executor import validate_code
+from app.executors import BACKENDS, EXECUTOR_BACKEND, ExecutorBackend, make_backend
+from app.results import ExecutionResult
+
+PHASES = ["prepare", "write", "start", "first_output", "tests", "finish", "cleanup"]
+
+
+def timed_run(
+    backend: ExecutorBackend, capture: dict[str, Any], timeout: float
+) -> tuple[dict[str, float], ExecutionResult]:
+    """Run a capture once; returns (seconds per phase, result)."""
+    phases = {}
+    mark = time.perf_counter()
+
+    def lap(phase: str) -> None:
+        nonlocal mark
+        now = time.perf_counter()
+        phases[phase] = now - mark
+        mark = now
+
+    # Phases are only meaningful for one process, so sharded suites are replayed whole
+    job = {name: value for name, value in capture["job"].items() if name != "shards"}
+    prepared = backend.prepare(**job)
+    lap("prepare")
+    try:
+        prepared.write_code(capture["code"])
+        lap("write")
+        run = backend.start(prepared, timeout)
+        lap("start")
+        try:
+            lines = run.stream()
+            next(lines, None)
+            lap("first_output")
+            for _ in lines:
+                pass
+            lap("tests")
+        except BaseException:
+            run.close()
+            raise
+        result = run.finish()
+        lap("finish")
+    finally:
+        prepared.cleanup()
+        lap("cleanup")
+    return phases, result
+
+
+def verdict(result: dict[str, Any] | ExecutionResult) -> str:
+    if not isinstance(result, dict):
+        result = result.model_dump()
+    if result["success"]:
+        return f"passed {result['passed_count']}/{result['total_count']}"
+    error = (result["error"] or "failed").split(" after ")[0]
+    return f"{error[:40]} ({result['passed_count']}/{result['total_count']})"
+
+
+def select_captures(captures: list[dict[str, Any]], args: argparse.Namespace) -> list[dict[str, Any]]:
+    reasons = set(args.reason.split(",")) if args.reason else None
+    selected = [
+        capture
+        for capture in captures
+        if (reasons is None or capture["reason"] in reasons)
+        and (args.problem is None or capture["problem_id"] == args.problem)
+        and (not args.ids or capture["id"] in args.ids)
+    ]
+    # Most recent first
+    return selected[::-1][: args.limit]
+
+
+def list_captures(captures: list[dict[str, Any]]) -> None:
+    print(f"{'id':<32} {'captured at':<20} {'reason':<8} {'mode':<8} {'seconds':>8} {'limit':>6}  verdict")
+    for capture in captures:
+        print(
+            f"{capture['id']:<32} {capture['captured_at'][:19]:<20} {capture['reason']:<8} {capture['mode']:<8} "
+            f"{capture['seconds']:>8.3f} {capture['time_limit']:>6.1f}  {verdict(capture['result'])}"
+        )
+
+
+def run(args: argparse.Namespace) -> int:
+    captures = select_captures(CaptureStore(Path(args.dir), 1.0, sys.maxsize).load(), args)
+    if not captures:
+        print(f"No matching captures in {args.dir}")
+        return 1
+    if args.list:
+        list_captures(captures)
+        return 0
+    names = [name.strip() for name in args.backends.split(",") if name.strip()]
+    unknown = [name for name in names if name not in BACKENDS]
+    if unknown:
+        sys.exit(f"Unknown backends: {', '.join(unknown)} (choose from {', '.join(BACKENDS)})")
+
+    backends = {name: make_backend(name) for name in names}
+    totals: dict[str, list[float]] = {name: [] for name in names}
+    mismatches: dict[str, int] = {name: 0 for name in names}
+    try:
+        for capture in captures:
+            is_valid, error = validate_code(capture["code"])
+            if not is_valid:
+                print(f"\n{capture['id']}: skipped, the code no longer validates ({error})")
+                continue
+            environment = capture["environment"]
+            shards = capture["job"].get("shards", 1)
+            print(
+                f"\n{capture['id']} {capture['reason']} {capture['mode']} problem {capture['problem_id']} "
+                f"v{capture['problem_version']}, code {capture['code_hash'][:12]}"
+            )
+            print(
+                f"  captured: {capture['seconds']:.3f}s of {capture['time_limit']:.1f}s on {environment['executor']}"
+                f"{' (session)' if capture['session'] else ''}{f' in up to {shards} shards' if shards > 1 else ''}, "
+                f"expected {capture['expected_seconds']:.3f}s, "
+                f"load {environment['load_average'][0]:.2f}, {environment['in_flight']}/{environment['slots']} slots "
+                f"busy, {environment['queued']} queued - {verdict(capture['result'])}"
+            )
+            print(f"  {'backend':<18} " + " ".join(f"{phase:>12}" for phase in PHASES) + f" {'total':>9}  verdict")
+            timeout = capture["time_limit"] * args.timeout_scale
+            for name, backend in backends.items():
+                runs = [timed_run(backend, capture, timeout) for _ in range(args.repeat)]
+                medians = {phase: statistics.median(phases[phase] for phases, _ in runs) for phase in PHASES}
+                total = sum(medians.values())
+                totals[name].append(total)
+                replayed = verdict(runs[-1][1])
+                same = replayed == verdict(capture["result"])
+                mismatches[name] += not same
+                print(
+                    f"  {name:<18} "
+                    + " ".join(f"{medians[phase] * 1000:>10.1f}ms" for phase in PHASES)
+                    + f" {total:>8.3f}s  {replayed}{'' if same else '  (differs)'}"
+                )
+    finally:
+        for backend in backends.values():
+            backend.close()
+
+    print(f"\n{'backend':<18} {'captures':>8} {'median s':>9} {'total s':>8}  verdicts differing")
+    for name in names:
+        if totals[name]:
+            print(
+                f"{name:<18} {len(totals[name]):>8} {statistics.median(totals[name]):>9.3f} "
+                f"{sum(totals[name]):>8.3f}  {mismatches[name]}"
+            )
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n")[0])
+    parser.add_argument("ids", nargs="*", help="capture ids to replay (default: all matching)")
+    parser.add_argument("--dir", default=str(CAPTURE_DIR), help="capture directory")
+    parser.add_argument("--backends", default=EXECUTOR_BACKEND, help="comma-separated executor backends")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per capture and backend")
+    parser.add_argument("--reason", help="only these capture reasons, comma-separated")
+    parser.add_argument("--problem", help="only captures of this problem id")
+    parser.add_argument("--limit", type=int, default=20, help="most recent captures to replay")
+    parser.add_argument("--timeout-scale", type=float, default=1.0, help="multiply captured time limits")
+    parser.add_argument("--list", action="store_true", help="list the captures instead of replaying them")
+    sys.exit(run(parser.parse_args()))
@@ -0,0 +1,135 @@
+"""
+Typed results of running a submission.
+
+Every run - whether it passed, failed, timed out or was rejected before reaching the
+sandbox - produces an ``ExecutionResult`` with the same set of keys, so clients can rely
+on the schema. Results are serialized straight to JSON bytes by pydantic-core, skipping
+the intermediate dict and ``json.dumps`` pass of a stock ``JSONResponse``.
+"""
+
+from typing import Any, Literal
+
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+from pydantic_core import to_json
+
+
+class ValueDiff(BaseModel):
+    """Where a failed test's value first differs from the expected one; previews are bounded."""
+
+    # e.g. "[3][\"key\"][0]"; empty when the values differ at the top level
+    path: str
+    reason: Literal["value", "length", "type", "keys"]
+    expected: str | None = None
+    actual: str | None = None
+    # The innermost lists on the path: their lengths and the elements around the mismatch
+    expected_length: int | None = None
+    actual_length: int | None = None
+    context_start: int | None = None
+    expected_context: list[str] = []
+    actual_context: list[str] = []
+    missing_keys: list[str] = []
+    extra_keys: list[str] = []
+    # Unordered comparisons are diffed on the sorted lists
+    compared_sorted: bool = False
+
+
+class TestResult(BaseModel):
+    name: str
+    passed: bool
+    error: str | None = None
+    actual: str | None = None
+    diff: ValueDiff | None = None
+
+
+class Counterexample(BaseModel):
+    call: str
+    expected: str
+    # Withheld from Submit results, where the code's return value could carry anything out
+    actual: str | None = None
+
+
+class StressSummary(BaseModel):
+    cases: int
+    seconds: float
+    cases_per_second: float
+    counterexample: Counterexample | None = None
+
+
+class FunctionProfile(BaseModel):
+    function: str
+    line: int
+    calls: int
+    own_seconds: float
+    cumulative_seconds: float
+
+
+class LineHits(BaseModel):
+    line: int
+    hits: int
+
+
+class LineAllocation(BaseModel):
+    line: int
+    bytes: int
+    blocks: int
+
+
+class ProfileReport(BaseModel):
+    # Fewer iterations than total_iterations means profiling stopped early to stay in the time limit
+    iterations: int
+    total_iterations: int
+    # The last item was interrupted mid-run; its numbers cover only the part that ran
+    truncated: bool = False
+    seconds: float
+    peak_bytes: int
+    functions: list[FunctionProfile] = []
+    lines: list[LineHits] = []
+    allocations: list[LineAllocation] = []
+
+
+class ExecutionResult(BaseModel):
+    success: bool
+    error: str | None = None
+    test_results: list[TestResult] = []
+    # Output the test protocol doesn't account for: user prints, tracebacks, runner errors
+    output: str = ""
+    passed_count: int = 0
+    failed_count: int = 0
+    total_count: int = 0
+    # Tests that never ran because the run timed out first
+    not_run_count: int = 0
+    stress: StressSummary | None = None
+    profile: ProfileReport | None = None
+
+    @classmethod
+    def failure(cls, error: str, test_name: str | None = None, output: str = "") -> "ExecutionResult":
+        """A run that failed as a whole, optionally reported as a single failed test."""
+        if test_name is None:
+            return cls(success=False, error=error, output=output)
+        return cls(
+            success=False,
+            error=error,
+            test_results=[TestResult(name=test_name, passed=False, error=error)],
+            output=output,
+            failed_count=1,
+            total_count=1,
+        )
+
+
+class SubmissionStatus(BaseModel):
+    id: str
+    status: Literal["queued", "running", "done"]
+    # Set once the submission is done
+    result: ExecutionResult | None = None
+    # Estimated seconds until a queued submission starts running
+    expected_wait_seconds: float | None = None
+
+
+class ResultResponse(JSONResponse):
+    """JSON response that encodes pydantic models with pydantic-core directly."""
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, BaseModel):
+            return to_json(content)
+        return super().render(content)
@@ -1,16 +1,36 @@
+import ast
+import json
+import time
 import uuid
+from collections.abc import Callable
 from pathlib import Path
+from typing import Any, Literal, NamedTuple
 
-from fastapi import APIRouter, Depends, HTTPException, Request
-from fastapi.responses import HTMLResponse, JSONResponse
+from fastapi import APIRouter, Depends, HTTPException, Request, WebSocket, WebSocketDisconnect
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import HTMLResponse, JSONResponse, Response
 from fastapi.templating import Jinja2Templates
 from pydantic import BaseModel
-from sqlalchemy.orm import Session
-from sqlalchemy import select
+from starlette.requests import HTTPConnection
+from sqlalchemy.orm import Session, undefer
+from sqlalchemy import func, select
 
-from app.code_executor import execute_code_secure
-from app.database import get_db
-from app.models import Problem
+from app.analytics import problem_report, record_outcome, summary_report
+from app.captures import RunContext, captures, code_hash
+from app.calibration import DEFAULT_TIME_LIMIT, calibrator
+from app.code_executor import MAX_FULL_VALUES, execute_code_secure, profile_job, stress_job
+from app.concurrency import concurrency
+from app.database import SessionLocal, get_db
+from app.drafts import browser_id, draft_limiter, issue_browser_id, load_draft, save_draft
+from app.fixtures import load_fixtures
+from app.models import Problem, ProblemTestCase
+from app.results import ExecutionResult, ResultResponse, SubmissionStatus
+from app.runtime_stats import reached_sandbox, runtime_stats
+from app.scheduler import RejectedError, client_key, scheduler
+from app.search import PAGE_SIZE, category_facets, search_problems
+from app.sessions import SandboxCrashed, WarmSandbox, sessions
+from app.shared_cache import shared_cache
+from app.submissions import submissions
 
 template_dir = Path(__file__).parent / "templates"
 templates = Jinja2Templates(directory=str(template_dir))
@@ -22,13 +42,23 @@ router = APIRouter()
 async def problem_list(
     request: Request,
     category: str | None = None,
+    q: str | None = None,
+    page: int = 1,
     db: Session = Depends(get_db),
 ) -> HTMLResponse:
-    query = select(Problem)
-    if category:
-        query = query.where(Problem.category == category)
-    problems = db.scalars(query).all()
-    return templates.TemplateResponse("problems/list.html", {"request": request, "problems": problems})
+    problems = search_problems(db, query=q, category=category, page=page)
+    return templates.TemplateResponse(
+        "problems/list.html",
+        {
+            "request": request,
+            "problems": problems,
+            "facets": category_facets(db),
+            "category": category,
+            "q": q or "",
+            "page": page,
+            "has_more": len(problems) == PAGE_SIZE,
+        },
+    )
 
 
 @router.get("/problems/{problem_id}", response_class=HTMLResponse)
@@ -36,48 +66,454 @@ async def problem_detail(problem_id: uuid.UUID, request: Request, db: Session =
     problem = db.scalar(select(Problem).where(Problem.id == problem_id))
     if not problem:
         return templates.TemplateResponse("problems/404.html", {"request": request}, status_code=404)
-    return templates.TemplateResponse("problems/detail.html", {"request": request, "problem": problem})
+    client_id = browser_id(request)
+    draft = load_draft(db, client_id, problem_id) if client_id else None
+    # Only sample cases run on "Run"; hidden ones are counted in the "Submit" verdict
+    case_count = db.scalar(select(func.count()).where(ProblemTestCase.problem_id == problem_id, ProblemTestCase.sample))
+    response = templates.TemplateResponse(
+        "problems/detail.html",
+        {
+            "request": request,
+            "problem": problem,
+            "case_count": case_count,
+            "stress_available": problem.reference_solution is not None and problem.input_generator is not None,
+            "draft_code": draft[0] if draft else None,
+        },
+    )
+    if client_id is None:
+        issue_browser_id(response)
+    return response
+
+
+def load_test_cases(db: Session, problem_id: uuid.UUID, hidden: bool = False) -> list[tuple]:
+    """
+    Load a problem's data-driven cases as compact (args, expected, comparison) rows.
+
+    Only sample cases unless ``hidden``; then sample cases come first, so they keep
+    their place in the numbering.
+    """
+    query = select(ProblemTestCase.args, ProblemTestCase.expected, ProblemTestCase.comparison).where(
+        ProblemTestCase.problem_id == problem_id
+    )
+    if hidden:
+        query = query.order_by(ProblemTestCase.sample.desc(), ProblemTestCase.position)
+    else:
+        query = query.where(ProblemTestCase.sample).order_by(ProblemTestCase.position)
+    return [tuple(row) for row in db.execute(query)]
+
+
+@router.get("/api/problems/versions", response_class=JSONResponse)
+async def problem_versions(db: Session = Depends(get_db)) -> JSONResponse:
+    """Return {problem id: version} for every problem, for validating cached entries."""
+    rows = db.execute(select(Problem.id, Problem.version))
+    return JSONResponse({str(problem_id): version for problem_id, version in rows})
+
+
+@router.get("/api/analytics", response_class=JSONResponse)
+async def analytics_summary(db: Session = Depends(get_db)) -> JSONResponse:
+    """Attempts and pass rate per problem and mode, from the incrementally maintained aggregates."""
+    return JSONResponse(summary_report(db))
+
+
+@router.get("/api/problems/{problem_id}/analytics", response_class=JSONResponse)
+async def problem_analytics(problem_id: uuid.UUID, db: Session = Depends(get_db)) -> JSONResponse:
+    """Pass rate, attempts, median runtime and most failed tests per mode, as of the last flush."""
+    if not db.scalar(select(Problem.id).where(Problem.id == problem_id)):
+        raise HTTPException(status_code=404, detail="Problem not found")
+    return JSONResponse({"problem_id": str(problem_id), "modes": problem_report(db, problem_id)})
 
 
 class CodeSubmission(BaseModel):
     code: str
+    # "stress" compares the code with the problem's reference solution on generated inputs;
+    # "profile" also reports the code's hot spots and allocations
+    mode: Literal["tests", "stress", "profile"] = "tests"
+    # Failed sample tests whose values are reported whole rather than as previews and a diff
+    full_values: list[str] = []
+
+
+# Modules whose use can make a run's verdict differ from one run to the next; such runs aren't cached
+NONDETERMINISTIC_MODULES = {"random", "datetime"}
+
+# Limit code length to prevent abuse
+MAX_CODE_LENGTH = 10000
+
+
+def submission_error(code: str) -> str | None:
+    if not code or not code.strip():
+        return "Code cannot be empty"
+    if len(code) > MAX_CODE_LENGTH:
+        return f"Code is too long (max {MAX_CODE_LENGTH} characters)"
+    return None
+
+
+def load_job(db: Session, problem: Problem, hidden: bool = False) -> dict[str, Any]:
+    """
+    Everything the sandbox needs to test a submission for ``problem``, except the code.
+
+    The sample tests and cases for "Run", or with ``hidden`` the full suite for "Submit".
+    Jobs are shared with the node's other workers through ``shared_cache``.
+    """
+    key = f"{problem.id}:{'full' if hidden else 'sample'}"
+    cached = shared_cache.get("job", key, int(problem.version))
+    # Fixture paths point into a host-local cache that may have been cleared since
+    if cached is not None and all(Path(path).exists() for _, path in cached["fixtures"].values()):
+        cached["test_cases"] = [tuple(case) for case in cached["test_cases"]]
+        cached["fixtures"] = {name: tuple(fixture) for name, fixture in cached["fixtures"].items()}
+        return cached
+
+    test_code = str(problem.test_code)
+    if hidden and problem.hidden_test_code:
+        test_code = f"{test_code}\n\n{problem.hidden_test_code}"
+    job = {
+        "test_code": test_code,
+        "module_path": problem.module_path,
+        "function_name": str(problem.function_name),
+        "test_cases": load_test_cases(db, problem.id, hidden=hidden),
+        "fixtures": load_fixtures(db, problem.id),
+        "shards": int(problem.test_shards),
+    }
+    shared_cache.put("job", key, int(problem.version), job)
+    return job
+
+
+def load_submit_job(db: Session, problem: Problem) -> dict[str, Any]:
+    """The full suite, which calibrated time limits are measured against."""
+    return load_job(db, problem, hidden=True)
+
+
+def visible_test_names(db: Session, problem: Problem) -> set[str]:
+    """Names in a full-suite result whose details may be shown: sample tests and cases, and run-level errors."""
+    tree = ast.parse(str(problem.test_code))
+    names = {node.name for node in tree.body if isinstance(node, ast.FunctionDef) and node.name.startswith("test_")}
+    counts = dict(
+        db.execute(
+            select(ProblemTestCase.sample, func.count())
+            .where(ProblemTestCase.problem_id == problem.id)
+            .group_by(ProblemTestCase.sample)
+        ).all()
+    )
+    width = len(str(sum(counts.values())))
+    names.update(f"case_{index:0{width}d}" for index in range(1, counts.get(True, 0) + 1))
+    return names | {"stress", "Execution", "Code validation", "Test setup", "All tests"}
+
+
+def load_stress_job(problem: Problem, timeout: float) -> dict[str, Any]:
+    """Sandbox job for stress mode: only the reference comparison, no tests or cases."""
+    return {
+        "test_code": "",
+        "module_path": problem.module_path,
+        "function_name": str(problem.function_name),
+        "stress": stress_job(str(problem.reference_solution), str(problem.input_generator), timeout),
+    }
+
+
+class Admission(NamedTuple):
+    client_id: str
+    # Expected runtime, whether it counts as heavy, and the expected wait for a slot, in seconds
+    expected: float
+    heavy: bool
+    wait: float
+
+
+def runtime_estimate(problem_id: uuid.UUID, mode: str) -> tuple[float, bool]:
+    """Expected runtime of a submission for the problem in ``mode``, and whether it is heavy."""
+    key = (problem_id, mode)
+    return runtime_stats.expected(key), scheduler.is_heavy(runtime_stats.p95(key))
+
+
+def admit(request: HTTPConnection, problem_id: uuid.UUID, mode: str, background: bool = False) -> Admission:
+    """Rate-limit submissions per client, and shed heavy ones under load, before any DB lookup or validation."""
+    client_id = client_key(request)
+    expected, heavy = runtime_estimate(problem_id, mode)
+    # Background work is deferred rather than shed
+    heavy = heavy and not background
+    try:
+        wait = scheduler.admit(client_id, expected=expected, heavy=heavy)
+    except RejectedError as e:
+        raise HTTPException(
+            status_code=503 if e.reason == "overloaded" else 429,
+            detail=str(e),
+            headers={"Retry-After": str(max(1, round(e.retry_after)))},
+        ) from e
+    if background:
+        wait = scheduler.expected_wait(background=True)
+    return Admission(client_id, expected, heavy, wait)
+
+
+# Async so admission runs on the event loop, with the scheduler's other state changes, not in the threadpool
+async def admit_submission(request: Request, problem_id: uuid.UUID, submission: CodeSubmission) -> Admission:
+    return admit(request, problem_id, submission.mode)
 
 
-@router.post("/api/problems/{problem_id}/run", response_class=JSONResponse)
+async def admit_background_submission(request: Request, problem_id: uuid.UUID) -> Admission:
+    return admit(request, problem_id, "submit", background=True)
+
+
+def result_cache_key(problem_id: uuid.UUID, code: str, full_values: list[str], time_limit: float) -> str | None:
+    """Shared cache key for a "Run" of ``code`` on a problem, or None if its result may vary between runs."""
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        return None
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            modules = {alias.name.split(".")[0] for alias in node.names}
+        elif isinstance(node, ast.ImportFrom):
+            modules = {(node.module or "").split(".")[0]}
+        else:
+            continue
+        if modules & NONDETERMINISTIC_MODULES:
+            return None
+    return f"{problem_id}:{code_hash(json.dumps([code, sorted(full_values), time_limit]))}"
+
+
+def result_cacheable(result: ExecutionResult) -> bool:
+    """Whether a run's verdict depends only on its code: it ran its tests and didn't time out."""
+    timed_out = result.error is not None and result.error.startswith("Execution timed out")
+    return reached_sandbox(result) and result.total_count > 0 and not timed_out
+
+
+async def run_timed(
+    context: RunContext,
+    func: Callable[..., ExecutionResult],
+    *,
+    cache_key: str | None = None,
+    **kwargs: Any,
+) -> ExecutionResult:
+    """
+    Run ``func`` off the event loop; record how long it took and its verdict for the
+    analytics, and capture the run for replay if it was notably slow or failed. With
+    ``cache_key``, a reproducible result is shared with the node's other workers.
+    """
+    started = time.perf_counter()
+    result = await run_in_threadpool(func, **kwargs)
+    seconds = time.perf_counter() - started
+    if cache_key and result_cacheable(result):
+        shared_cache.put("result", cache_key, context.version, {"seconds": seconds, "result": result.model_dump()})
+    # Judged against the estimate before this run is added to it
+    await captures.consider(context, seconds, result)
+    concurrency.observe((context.problem_id, context.mode), seconds, result)
+    runtime_stats.record_result((context.problem_id, context.mode), seconds, result)
+    record_outcome(context.problem_id, context.mode, seconds, result)
+    return result
+
+
+@router.post("/api/problems/{problem_id}/run", response_class=ResultResponse, response_model=ExecutionResult)
 async def run_code(
     problem_id: uuid.UUID,
     submission: CodeSubmission,
+    admission: Admission = Depends(admit_submission),
     db: Session = Depends(get_db),
-) -> JSONResponse:
+) -> ResultResponse:
     """Execute user code against test cases."""
     problem = db.scalar(select(Problem).where(Problem.id == problem_id))
     if not problem:
         raise HTTPException(status_code=404, detail="Problem not found")
 
-    if not submission.code or not submission.code.strip():
-        return JSONResponse(
+    error = submission_error(submission.code)
+    if error:
+        return ResultResponse(ExecutionResult.failure(error), status_code=400)
+    if len(submission.full_values) > MAX_FULL_VALUES:
+        return ResultResponse(
+            ExecutionResult.failure(f"Full values can be requested for at most {MAX_FULL_VALUES} tests"),
             status_code=400,
-            content={"success": False, "error": "Code cannot be empty", "test_results": [], "output": ""},
         )
 
-    # Limit code length to prevent abuse
-    if len(submission.code) > 10000:
-        return JSONResponse(
-            status_code=400,
-            content={
-                "success": False,
-                "error": "Code is too long (max 10000 characters)",
-                "test_results": [],
-                "output": "",
-            },
+    cache_key = None
+    if submission.mode == "stress":
+        if not problem.reference_solution or not problem.input_generator:
+            return ResultResponse(
+                ExecutionResult.failure("This problem has no reference solution to stress test against"),
+                status_code=400,
+            )
+        time_limit = DEFAULT_TIME_LIMIT
+        job = load_stress_job(problem, timeout=time_limit)
+    else:
+        time_limit = calibrator.time_limit(problem)
+        if submission.mode == "tests" and shared_cache.enabled:
+            cache_key = result_cache_key(problem.id, submission.code, submission.full_values, time_limit)
+            cached = shared_cache.get("result", cache_key, int(problem.version)) if cache_key else None
+            if cached is not None:
+                # Counted as an attempt, but it didn't run here: no runtime sample or capture
+                result = ExecutionResult.model_validate(cached["result"])
+                record_outcome(problem.id, submission.mode, cached["seconds"], result)
+                return ResultResponse(result, headers={"X-Expected-Wait": "0.00"})
+        job = load_job(db, problem)
+        if submission.mode == "profile":
+            job["profile"] = profile_job(timeout=time_limit)
+        # Only sample tests run here, so this can't reveal hidden values
+        job["full_values"] = submission.full_values
+
+    # Execute code securely, off the event loop, once the scheduler grants a sandbox slot
+    context = RunContext(problem.id, problem.version, submission.mode, submission.code, job, time_limit)
+    async with scheduler.slot(admission.client_id, expected=admission.expected, heavy=admission.heavy):
+        result = await run_timed(
+            context,
+            execute_code_secure,
+            cache_key=cache_key,
+            user_code=submission.code,
+            timeout=time_limit,
+            **job,
         )
+    if submission.mode == "stress" and result.output:
+        # Anything printed during a stress run could echo what the code learned of the reference
+        if result.error and result.error in result.output:
+            result.error = "Stress test failed"
+        result.output = ""
 
-    # Execute code securely
-    result = execute_code_secure(
-        user_code=submission.code,
-        test_code=str(problem.test_code),
-        module_path=problem.module_path,
-        timeout=5,
+    return ResultResponse(result, headers={"X-Expected-Wait": f"{admission.wait:.2f}"})
+
+
+@router.post(
+    "/api/problems/{problem_id}/submit",
+    response_class=ResultResponse,
+    response_model=SubmissionStatus,
+    status_code=202,
+)
+async def submit_code(
+    problem_id: uuid.UUID,
+    submission: CodeSubmission,
+    admission: Admission = Depends(admit_background_submission),
+    db: Session = Depends(get_db),
+) -> ResultResponse:
+    """Queue user code against the full hidden suite; poll /api/submissions/{id} for the verdict."""
+    problem = db.scalar(
+        select(Problem)
+        .options(
+            undefer(Problem.hidden_test_code), undefer(Problem.reference_solution), undefer(Problem.input_generator)
+        )
+        .where(Problem.id == problem_id)
     )
+    if not problem:
+        raise HTTPException(status_code=404, detail="Problem not found")
+
+    error = submission_error(submission.code)
+    if error:
+        return ResultResponse(ExecutionResult.failure(error), status_code=400)
+
+    job = load_submit_job(db, problem)
+    time_limit = calibrator.time_limit(problem)
+    if problem.reference_solution and problem.input_generator:
+        job["stress"] = stress_job(str(problem.reference_solution), str(problem.input_generator), DEFAULT_TIME_LIMIT)
+        # The stress comparison has its own budget on top of the tests' limit
+        time_limit += DEFAULT_TIME_LIMIT
+    queued = submissions.submit(
+        admission.client_id,
+        problem.id,
+        submission.code,
+        job,
+        time_limit,
+        visible_test_names(db, problem),
+        expected=admission.expected,
+        version=problem.version,
+    )
+    return ResultResponse(queued.summary(), status_code=202)
+
+
+@router.get("/api/submissions/{submission_id}", response_class=ResultResponse, response_model=SubmissionStatus)
+async def submission_status(submission_id: uuid.UUID) -> ResultResponse:
+    submission = submissions.get(submission_id)
+    if submission is None:
+        raise HTTPException(status_code=404, detail="Submission not found")
+    return ResultResponse(submission.summary())
+
+
+class DraftSave(BaseModel):
+    code: str
+
+
+@router.put("/api/problems/{problem_id}/draft", status_code=204)
+async def put_draft(
+    problem_id: uuid.UUID, draft: DraftSave, request: Request, db: Session = Depends(get_db)
+) -> Response:
+    """
+    Autosave the editor's code; written to the database in the next batched flush. Saves
+    are rate-limited per client and only read the problem's primary key.
+    """
+    retry_after = draft_limiter.take(client_key(request))
+    if retry_after:
+        raise HTTPException(
+            status_code=429,
+            detail="You are saving too quickly, please slow down",
+            headers={"Retry-After": str(max(1, round(retry_after)))},
+        )
+    if len(draft.code) > MAX_CODE_LENGTH:
+        raise HTTPException(status_code=400, detail=f"Code is too long (max {MAX_CODE_LENGTH} characters)")
+    if not db.scalar(select(Problem.id).where(Problem.id == problem_id)):
+        raise HTTPException(status_code=404, detail="Problem not found")
+    response = Response(status_code=204)
+    client_id = browser_id(request) or issue_browser_id(response)
+    save_draft(client_id, problem_id, draft.code)
+    return response
+
+
+@router.get("/api/problems/{problem_id}/draft", response_class=JSONResponse)
+async def get_draft(problem_id: uuid.UUID, request: Request, db: Session = Depends(get_db)) -> JSONResponse:
+    client_id = browser_id(request)
+    draft = load_draft(db, client_id, problem_id) if client_id else None
+    if draft is None:
+        raise HTTPException(status_code=404, detail="No draft saved")
+    code, updated_at = draft
+    return JSONResponse({"code": code, "updated_at": updated_at.isoformat()})
+
+
+def run_in_session(key: tuple, job: dict[str, Any], code: str, time_limit: float) -> ExecutionResult:
+    """Run a submission in the session's warm sandbox, starting one if needed."""
+    # A warm sandbox is a single process; a sharded suite runs in fresh ones instead
+    if job.get("shards", 1) > 1:
+        return execute_code_secure(user_code=code, timeout=time_limit, **job)
+    sandbox = sessions.get(key)
+    try:
+        if sandbox is None:
+            sandbox = WarmSandbox(**{name: value for name, value in job.items() if name != "shards"})
+            sessions.add(key, sandbox)
+        return sandbox.run(code, timeout=time_limit)
+    except SandboxCrashed:
+        # Fall back to a one-off sandbox; the next run starts a fresh warm one
+        sessions.discard(key)
+        return execute_code_secure(user_code=code, timeout=time_limit, **job)
+
+
+@router.websocket("/ws/problems/{problem_id}/session")
+async def editor_session(websocket: WebSocket, problem_id: uuid.UUID) -> None:
+    """Editing session: each message is {"code": ...}, answered with the run's results."""
+    await websocket.accept()
+    client_id = client_key(websocket)
+    # Clients behind one address (NAT, a proxy) each get their own sandbox: it is keyed on the
+    # browser's cookie, so a reconnect finds it warm, or else on this connection alone
+    session_id = browser_id(websocket) or uuid.uuid4().hex
+
+    # Load the problem once per session rather than once per run
+    with SessionLocal() as db:
+        problem = db.scalar(select(Problem).where(Problem.id == problem_id))
+        if not problem:
+            await websocket.close(code=4404, reason="Problem not found")
+            return
+        job = load_job(db, problem)
+        key = (session_id, problem_id, problem.version)
 
-    return JSONResponse(content=result)
+    try:
+        while True:
+            message = await websocket.receive_json()
+            code = message.get("code", "") if isinstance(message, dict) else ""
+            error = submission_error(code)
+            if error:
+                await websocket.send_text(ExecutionResult.failure(error).model_dump_json())
+                continue
+            expected, heavy = runtime_estimate(problem_id, "tests")
+            try:
+                scheduler.admit(client_id, expected=expected, heavy=heavy)
+            except RejectedError as e:
+                await websocket.send_json(
+                    {**ExecutionResult.failure(str(e)).model_dump(), "retry_after": e.retry_after}
+                )
+                continue
+            time_limit = calibrator.time_limit(problem)
+            context = RunContext(problem_id, problem.version, "tests", code, job, time_limit, session=True)
+            async with scheduler.slot(client_id, expected=expected, heavy=heavy):
+                result = await run_timed(context, run_in_session, key=key, job=job, code=code, time_limit=time_limit)
+            await websocket.send_text(result.model_dump_json())
+    except WebSocketDisconnect:
+        # The sandbox stays warm for a reconnect until the reaper collects it
+        pass
@@ -0,0 +1,104 @@
+"""
+Rolling runtime estimates per problem.
+
+Every sandbox run's wall time is recorded under ``(problem id, mode)``. Each key keeps an
+exponentially weighted moving average - the expected cost of the next run - and a window
+of recent durations for the p95 - how expensive a run is likely to get. The scheduler
+uses them to tell likely-expensive work apart before it runs (see ``FairScheduler.admit``).
+"""
+
+import uuid
+from collections import OrderedDict, deque
+from typing import Any
+
+from app.results import ExecutionResult
+
+# Weight of the newest sample in the moving average
+RUNTIME_EWMA_ALPHA = 0.2
+# Recent durations kept per key for the p95
+RUNTIME_WINDOW = 200
+# Estimate for a key with no runs yet
+DEFAULT_RUNTIME_SECONDS = 0.2
+# Least recently run keys are dropped past this many
+MAX_TRACKED_KEYS = 10000
+
+RuntimeKey = tuple[uuid.UUID, str]
+
+
+def reached_sandbox(result: ExecutionResult) -> bool:
+    """False when the code was rejected by validation, so the duration says nothing about it."""
+    return not any(test.name == "Code validation" for test in result.test_results)
+
+
+class RuntimeEstimate:
+    __slots__ = ("ewma", "samples", "count")
+
+    def __init__(self, seconds: float):
+        self.ewma = seconds
+        self.samples: deque[float] = deque([seconds], maxlen=RUNTIME_WINDOW)
+        self.count = 1
+
+    def add(self, seconds: float) -> None:
+        self.ewma += RUNTIME_EWMA_ALPHA * (seconds - self.ewma)
+        self.samples.append(seconds)
+        self.count += 1
+
+    @property
+    def p95(self) -> float:
+        samples = sorted(self.samples)
+        return samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+
+
+class RuntimeStats:
+    """EWMA and p95 of run durations keyed by (problem id, mode)."""
+
+    def __init__(self, max_keys: int = MAX_TRACKED_KEYS):
+        self.max_keys = max_keys
+        self._estimates: OrderedDict[RuntimeKey, RuntimeEstimate] = OrderedDict()
+
+    def record(self, key: RuntimeKey, seconds: float) -> None:
+        estimate = self._estimates.get(key)
+        if estimate is None:
+            self._estimates[key] = RuntimeEstimate(seconds)
+            if len(self._estimates) > self.max_keys:
+                self._estimates.popitem(last=False)
+        else:
+            estimate.add(seconds)
+            self._estimates.move_to_end(key)
+
+    def record_result(self, key: RuntimeKey, seconds: float, result: ExecutionResult) -> None:
+        """Record a run's duration, unless its code was rejected before reaching the sandbox."""
+        if reached_sandbox(result):
+            self.record(key, seconds)
+
+    def __contains__(self, key: RuntimeKey) -> bool:
+        return key in self._estimates
+
+    def expected(self, key: RuntimeKey) -> float:
+        """Expected duration of the next run."""
+        estimate = self._estimates.get(key)
+        return estimate.ewma if estimate else DEFAULT_RUNTIME_SECONDS
+
+    def p95(self, key: RuntimeKey) -> float:
+        """Duration most runs stay under."""
+        estimate = self._estimates.get(key)
+        return estimate.p95 if estimate else DEFAULT_RUNTIME_SECONDS
+
+    def metrics(self, top: int = 10) -> dict[str, Any]:
+        slowest = sorted(self._estimates.items(), key=lambda item: item[1].ewma, reverse=True)[:top]
+        return {
+            "tracked": len(self._estimates),
+            "slowest": [
+                {
+                    "problem_id": str(problem_id),
+                    "mode": mode,
+                    "runs": estimate.count,
+                    "ewma_seconds": round(estimate.ewma, 4),
+                    "p95_seconds": round(estimate.p95, 4),
+                }
+                for (problem_id, mode), estimate in slowest
+            ],
+        }
+
+
+runtime_stats = RuntimeStats()
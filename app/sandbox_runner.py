@@ -0,0 +1,938 @@
+"""
+Test runner executed inside the sandbox.
+
+This file is copied into every sandbox directory and run as a standalone script, so it
+must only depend on the standard library. It reads its job as one JSON line on stdin -
+never from a file, so no sandbox file holds the tests, hidden or not, or a stress run's
+reference solution. The tests still run in the submission's process; ``validate_code``
+refuses the frame walks that would read them from the runner's memory. Results go to
+stdout using the line protocol parsed by ``app.code_executor``:
+
+    Found <n> test(s)
+    PASSED: <name>
+    FAILED: <name> - <message>
+    ACTUAL_VALUE: <name> - <value>
+    DIFF: <name> - <json first difference between actual and expected>
+    ERROR in <name>: <message>
+    TESTS: <names of test functions in run order>
+    PROFILE: <json hot spots of a profiling run>
+    STRESS: <json summary of a stress run>
+
+Large fixtures listed in the job are mapped read-only and exposed to test code as
+``FIXTURES[name]`` (a typed memoryview); a case argument or expected value of
+``{"$fixture": name}`` is replaced with the fixture's contents, as one list per run
+shared by every case that names it.
+
+Expected and actual values are reported as bounded previews, plus a structural diff
+locating the first difference (see ``structural_diff``), so a failed test's report stays
+small whatever the size of its values. Tests named in the job's ``full_values`` report
+their values whole instead, up to the job's ``full_value_chars`` each.
+
+With ``--serve`` the runner stays alive as a warm sandbox for an editing session and
+runs each submission read from stdin after the job line in a forked child (see
+``serve``). The ``--fork-server`` and ``--worker`` modes back the executor backends of
+the same names in ``app.executors``: they run jobs from other sandbox directories, each
+sent along with its request, by forking from a pre-initialized parent.
+"""
+
+import ast as ast_module
+import copy
+import importlib
+import json
+import math
+import mmap
+import os
+import pickle
+import random
+import resource
+import selectors
+import signal
+import socket
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+
+SANDBOX_DIR = Path(__file__).resolve().parent
+
+# Add sandbox dir to path so the user's module can be imported
+sys.path.insert(0, str(SANDBOX_DIR))
+
+# Flush buffered result lines every N data-driven cases
+CASE_FLUSH_EVERY = 256
+
+# Longest preview of an expected or actual value, or an assertion message, in result lines
+MAX_VALUE_CHARS = 200
+# Elements shown either side of a diff's first mismatch, and the preview length of each
+DIFF_CONTEXT = 2
+MAX_CONTEXT_CHARS = 60
+# Missing or extra dict keys listed in a diff
+MAX_DIFF_KEYS = 5
+# Stands in for the element past the end of the shorter list in a diff
+ABSENT = object()
+
+# Profiling time granted even when the tests already used up the profile budget
+MIN_PROFILE_SECONDS = 0.2
+
+# Case result lines not yet written; flushed by flush_and_die when the run is stopped
+pending_lines = []
+
+
+def use_sandbox_dir(directory):
+    """Run jobs from another sandbox directory: import its modules."""
+    global SANDBOX_DIR
+    sys.path[sys.path.index(str(SANDBOX_DIR))] = str(directory)
+    SANDBOX_DIR = Path(directory)
+    os.chdir(directory)
+
+
+def flush_pending():
+    if pending_lines:
+        sys.stdout.write("\n".join(pending_lines) + "\n")
+        pending_lines.clear()
+    sys.stdout.flush()
+
+
+def flush_and_die(signum, frame):
+    """Signal handler: report buffered results, then die from the same signal as the host expects."""
+    flush_pending()
+    signal.signal(signum, signal.SIG_DFL)
+    os.kill(os.getpid(), signum)
+
+
+def format_error(e: BaseException) -> str:
+    error_type = type(e).__name__
+    error_msg = str(e) if str(e) else "Error occurred"
+    return error_type + ": " + error_msg
+
+
+def truncate(text, limit=MAX_VALUE_CHARS):
+    # Keep huge values (e.g. fixture-sized results) from flooding the host's output limit
+    return f"{text[:limit]}... ({len(text)} characters)" if len(text) > limit else text
+
+
+def format_value(value, limit=MAX_VALUE_CHARS):
+    try:
+        text = json.dumps(value) if isinstance(value, (list, dict)) else repr(value)
+    except Exception:
+        text = repr(value)
+    return truncate(text, limit)
+
+
+def extract_assertion_values(test_name, test_source, namespace):
+    """
+    Extract (actual, expected) from a failed assertion by parsing test code and re-evaluating;
+    expected is ``ABSENT`` unless the assertion is an ``==`` comparison it could evaluate.
+    """
+    try:
+        # Parse the test code source to find the test function
+        tree = ast_module.parse(test_source)
+        for node in ast_module.walk(tree):
+            if isinstance(node, ast_module.FunctionDef) and node.name == test_name:
+                # Found the test function, look for assert statements
+                for stmt in ast_module.walk(node):
+                    if not isinstance(stmt, ast_module.Assert) or not isinstance(stmt.test, ast_module.Compare):
+                        continue
+                    # It's a comparison like func(args) == expected
+                    left = stmt.test.left
+                    if not isinstance(left, ast_module.Call) or not isinstance(left.func, ast_module.Name):
+                        continue
+                    func = namespace.get(left.func.id)
+                    if not callable(func):
+                        continue
+                    try:
+                        args = []
+                        for arg_node in left.args:
+                            try:
+                                code = ast_module.Expression(arg_node)
+                                args.append(eval(compile(code, "<string>", "eval"), namespace))
+                            except Exception:
+                                pass
+                        if len(args) == len(left.args):  # Only proceed if we got all args
+                            actual = func(*args)
+                            expected = ABSENT
+                            if len(stmt.test.ops) == 1 and isinstance(stmt.test.ops[0], ast_module.Eq):
+                                try:
+                                    code = ast_module.Expression(stmt.test.comparators[0])
+                                    expected = eval(compile(code, "<string>", "eval"), namespace)
+                                except Exception:
+                                    pass
+                            return actual, expected
+                    except Exception:
+                        pass
+                break  # Found the function, no need to continue
+    except Exception:
+        pass
+    return None
+
+
+def open_fixtures(specs):
+    """Map each fixture file read-only and expose it as a typed memoryview."""
+    fixtures = {}
+    for name, (typecode, path) in specs.items():
+        with open(path, "rb") as f:
+            size = f.seek(0, 2)
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+        fixtures[name] = memoryview(buffer).cast(typecode)
+    return fixtures
+
+
+def resolve_fixture(value, fixtures, resolved=None):
+    """
+    Replace a ``{"$fixture": name}`` case value with the fixture's contents as a list.
+
+    With ``resolved``, each fixture is converted once and every case naming it gets the
+    same list, so a case's cost doesn't grow with the size of the fixtures it uses.
+    """
+    if isinstance(value, dict) and len(value) == 1 and "$fixture" in value:
+        name = value["$fixture"]
+        if resolved is None:
+            return fixtures[name].tolist()
+        if name not in resolved:
+            resolved[name] = fixtures[name].tolist()
+        return resolved[name]
+    return value
+
+
+def to_json_like(value):
+    """Normalize tuples and non-string keys the way a JSON round trip would."""
+    if isinstance(value, (list, tuple)):
+        return [to_json_like(v) for v in value]
+    if isinstance(value, dict):
+        return {str(k): to_json_like(v) for k, v in value.items()}
+    return value
+
+
+def compare_exact(actual, expected):
+    return actual == expected or to_json_like(actual) == expected
+
+
+def compare_unordered(actual, expected):
+    if not isinstance(actual, (list, tuple)) or not isinstance(expected, list):
+        return compare_exact(actual, expected)
+    actual = to_json_like(actual)
+    try:
+        return sorted(actual) == sorted(expected)
+    except TypeError:
+        return Counter(json.dumps(v, sort_keys=True) for v in actual) == Counter(
+            json.dumps(v, sort_keys=True) for v in expected
+        )
+
+
+def compare_approx(actual, expected):
+    if isinstance(expected, float) or (isinstance(expected, int) and isinstance(actual, float)):
+        return isinstance(actual, (int, float)) and math.isclose(actual, expected, rel_tol=1e-9, abs_tol=1e-6)
+    if isinstance(expected, list) and isinstance(actual, (list, tuple)):
+        return len(actual) == len(expected) and all(compare_approx(a, e) for a, e in zip(actual, expected))
+    if isinstance(expected, dict) and isinstance(actual, dict):
+        actual = {str(k): v for k, v in actual.items()}
+        return actual.keys() == expected.keys() and all(compare_approx(actual[k], expected[k]) for k in expected)
+    return compare_exact(actual, expected)
+
+
+COMPARATORS = {
+    "exact": compare_exact,
+    "unordered": compare_unordered,
+    "approx": compare_approx,
+}
+
+
+def structural_diff(actual, expected, compare=compare_exact):
+    """
+    Locate the first difference between ``actual`` and ``expected``: its path, the values
+    there, and for lists their lengths and a few elements either side. Only the path down
+    to the mismatch is walked, and everything reported is bounded in size.
+    """
+    actual = to_json_like(actual)
+    diff = {"path": "", "reason": "value"}
+    while True:
+        if isinstance(expected, list) and isinstance(actual, list):
+            mismatch = next((i for i, (a, e) in enumerate(zip(actual, expected)) if not compare(a, e)), None)
+            if mismatch is None and len(actual) == len(expected):
+                break
+            # Without a mismatching element one list is a prefix of the other
+            index = mismatch if mismatch is not None else min(len(actual), len(expected))
+            start = max(0, index - DIFF_CONTEXT)
+            end = index + DIFF_CONTEXT + 1
+            diff.update(
+                expected_length=len(expected),
+                actual_length=len(actual),
+                context_start=start,
+                expected_context=[format_value(v, MAX_CONTEXT_CHARS) for v in expected[start:end]],
+                actual_context=[format_value(v, MAX_CONTEXT_CHARS) for v in actual[start:end]],
+            )
+            diff["path"] += f"[{index}]"
+            if mismatch is None:
+                diff["reason"] = "length"
+                expected = expected[index] if index < len(expected) else ABSENT
+                actual = actual[index] if index < len(actual) else ABSENT
+                break
+            actual, expected = actual[index], expected[index]
+        elif isinstance(expected, dict) and isinstance(actual, dict):
+            missing = [key for key in expected if key not in actual]
+            extra = [key for key in actual if key not in expected]
+            if missing or extra:
+                diff.update(
+                    reason="keys",
+                    missing_keys=[truncate(key, MAX_CONTEXT_CHARS) for key in missing[:MAX_DIFF_KEYS]],
+                    extra_keys=[truncate(key, MAX_CONTEXT_CHARS) for key in extra[:MAX_DIFF_KEYS]],
+                )
+                return diff
+            key = next((key for key in expected if not compare(actual[key], expected[key])), None)
+            if key is None:
+                break
+            diff["path"] += f"[{truncate(json.dumps(key), MAX_CONTEXT_CHARS)}]"
+            actual, expected = actual[key], expected[key]
+        else:
+            numbers = isinstance(actual, (int, float)) and isinstance(expected, (int, float))
+            if type(actual) is not type(expected) and not numbers:
+                diff["reason"] = "type"
+            break
+    diff["expected"] = None if expected is ABSENT else format_value(expected)
+    diff["actual"] = None if actual is ABSENT else format_value(actual)
+    return diff
+
+
+def value_diff(actual, expected, comparison="exact"):
+    """A structural diff for a failed comparison of containers, or None for plain values."""
+    if not isinstance(expected, (list, dict)) and not isinstance(actual, (list, tuple, dict)):
+        return None
+    try:
+        if comparison == "unordered" and isinstance(expected, list) and isinstance(actual, (list, tuple)):
+            # Order doesn't matter, so compare the sorted lists
+            diff = structural_diff(sorted(to_json_like(actual)), sorted(expected))
+            diff["compared_sorted"] = True
+            return diff
+        return structural_diff(actual, expected, COMPARATORS.get(comparison, compare_exact))
+    except Exception:
+        return None
+
+
+def diff_line(name, actual, expected, comparison="exact"):
+    """The DIFF line for a failed test, or None."""
+    diff = value_diff(actual, expected, comparison)
+    return None if diff is None else f"DIFF: {name} - {json.dumps(diff)}"
+
+
+def value_limit(name, full_values):
+    """Longest rendering of a value of test ``name``; ``full_values`` maps tests to their own limit."""
+    return full_values.get(name, MAX_VALUE_CHARS) if full_values else MAX_VALUE_CHARS
+
+
+def run_test_functions(namespace, test_functions, test_source, passed_tests, failed_tests, full_values=None):
+    for test_name in sorted(test_functions):
+        try:
+            namespace[test_name]()
+            print(f"PASSED: {test_name}")
+            passed_tests.append(test_name)
+        except AssertionError as e:
+            error_msg = str(e) if str(e) else "Assertion failed"
+            # Try to extract the actual and expected values by re-evaluating the assertion
+            values = extract_assertion_values(test_name, test_source, namespace)
+
+            print(f"FAILED: {test_name} - {truncate(error_msg)}")
+            if values:
+                actual, expected = values
+                # Clean up the actual value - remove quotes if present
+                actual_value_clean = format_value(actual, value_limit(test_name, full_values)).strip('"').strip("'")
+                print(f"ACTUAL_VALUE: {test_name} - {actual_value_clean}")
+                diff = diff_line(test_name, actual, expected) if expected is not ABSENT else None
+                if diff:
+                    print(diff)
+            failed_tests.append(test_name)
+        except Exception as e:
+            print("ERROR in " + test_name + ": " + format_error(e))
+            failed_tests.append(test_name)
+
+
+def run_cases(func, cases, fixtures, passed_tests, failed_tests, full_values=None, numbers=None):
+    """
+    Evaluate ``func`` over every (args, expected, comparison) case in one tight loop, or
+    only the cases at the 0-based ``numbers``; names are numbered in the full list either way.
+    """
+    width = len(str(len(cases)))
+    lines = pending_lines
+    # Shared by every case, like FIXTURES is by test functions
+    resolved = {}
+    for number in range(len(cases)) if numbers is None else numbers:
+        args, expected, comparison = cases[number]
+        name = f"case_{number + 1:0{width}d}"
+        try:
+            if fixtures:
+                args = [resolve_fixture(arg, fixtures, resolved) for arg in args]
+                expected = resolve_fixture(expected, fixtures, resolved)
+            actual = func(*args)
+            ok = COMPARATORS.get(comparison, compare_exact)(actual, expected)
+        except Exception as e:
+            lines.append(f"ERROR in {name}: {format_error(e)}")
+            failed_tests.append(name)
+        else:
+            if ok:
+                lines.append(f"PASSED: {name}")
+                passed_tests.append(name)
+            else:
+                limit = value_limit(name, full_values)
+                lines.append(f"FAILED: {name} - Expected {format_value(expected, limit)}")
+                lines.append(f"ACTUAL_VALUE: {name} - {format_value(actual, limit)}")
+                diff = diff_line(name, actual, expected, comparison)
+                if diff:
+                    lines.append(diff)
+                failed_tests.append(name)
+        if len(lines) >= CASE_FLUSH_EVERY:
+            flush_pending()
+    flush_pending()
+
+
+def clone_args(args):
+    """Independent copy of a case's arguments, so in-place solutions can't affect each other."""
+    try:
+        return pickle.loads(pickle.dumps(args, protocol=pickle.HIGHEST_PROTOCOL))
+    except Exception:
+        return copy.deepcopy(args)
+
+
+def shrink_candidates(args):
+    """Generic shrinking: drop chunks of list arguments and move ints toward zero."""
+    for i, arg in enumerate(args):
+        if isinstance(arg, list) and arg:
+            chunk = len(arg) // 2 or 1
+            while chunk >= 1:
+                for start in range(0, len(arg), chunk):
+                    yield args[:i] + [arg[:start] + arg[start + chunk :]] + args[i + 1 :]
+                chunk //= 2
+        elif isinstance(arg, int) and not isinstance(arg, bool) and arg != 0:
+            yield args[:i] + [0] + args[i + 1 :]
+            yield args[:i] + [arg // 2] + args[i + 1 :]
+
+
+def run_stress(func, function_name, stress, passed_tests, failed_tests):
+    """
+    Compare ``func`` with the reference solution on generated inputs until the case
+    count or time budget runs out, then shrink the first mismatch to a minimal one.
+
+    The generator source defines ``generate(rng, size)`` returning an argument list and
+    may define ``shrink(args)`` yielding smaller candidates when generic shrinking would
+    break the problem's input constraints.
+    """
+    reference = stress["reference"]
+    generate = stress["generator"]["generate"]
+    shrink = stress["generator"].get("shrink", shrink_candidates)
+
+    compare = COMPARATORS.get(stress.get("comparison", "exact"), compare_exact)
+    rng = random.Random(stress.get("seed"))
+    max_cases = int(stress.get("cases", 5000))
+    max_size = int(stress.get("max_size", 50))
+    started = time.perf_counter()
+    deadline = started + float(stress.get("budget", 2.0))
+
+    def mismatch(args):
+        """Return (expected, actual) if func disagrees with the reference on args, else None."""
+        try:
+            expected = reference(*clone_args(args))
+        except Exception:
+            return None  # Not a valid input for this problem
+        try:
+            actual = func(*clone_args(args))
+        except Exception as e:
+            return expected, format_error(e)
+        if compare(actual, expected):
+            return None
+        return expected, format_value(actual)
+
+    count = 0
+    failure = None
+    for count in range(1, max_cases + 1):
+        # Ramp input sizes up so the first failure found tends to be small already
+        args = generate(rng, 1 + (count * max_size) // max_cases)
+        result = mismatch(args)
+        if result is not None:
+            failure = (args, result)
+            break
+        if count % 32 == 0 and time.perf_counter() > deadline:
+            break
+
+    if failure is not None:
+        args, result = failure
+        improved = True
+        while improved and time.perf_counter() < deadline + 1.0:
+            improved = False
+            for candidate in shrink(args):
+                candidate_result = mismatch(candidate)
+                if candidate_result is not None:
+                    args, result = candidate, candidate_result
+                    improved = True
+                    break
+
+    elapsed = time.perf_counter() - started
+    summary = {
+        "cases": count,
+        "seconds": round(elapsed, 4),
+        "cases_per_second": round(count / elapsed if elapsed else 0),
+    }
+    if failure is None:
+        print(f"STRESS: {json.dumps(summary)}")
+        print("PASSED: stress")
+        passed_tests.append("stress")
+        return
+
+    expected, actual = result
+    call = f"{function_name}({', '.join(format_value(a) for a in args)})"
+    summary["counterexample"] = {"call": call, "expected": format_value(expected), "actual": actual}
+    print(f"STRESS: {json.dumps(summary)}")
+    print(f"FAILED: stress - Counterexample {call} expected {format_value(expected)}")
+    print(f"ACTUAL_VALUE: stress - {actual}")
+    failed_tests.append("stress")
+
+
+class ProfileBudgetExceeded(BaseException):
+    """Raised inside a profiled item when the profiling budget runs out (BaseException so user code can't catch it)."""
+
+
+def _profile_budget_exceeded(signum, frame):
+    raise ProfileBudgetExceeded
+
+
+def run_profile(module, namespace, test_functions, func, cases, fixtures, profile, started):
+    """
+    Re-run the tests and cases under cProfile, tracemalloc and a line-hit counter, then
+    print a ``PROFILE:`` line with hot spots mapped to the user's source lines.
+
+    Instrumentation slows code down several times over, so items are profiled in order
+    only until the budget (measured from ``started``) runs out. A CPU-time timer also
+    interrupts a single item that is too slow to finish instrumented, so even then the
+    report covers what ran before the cut.
+    """
+    import cProfile
+    import pstats
+    import tracemalloc
+
+    user_file = module.__file__
+    top = int(profile.get("top", 10))
+    deadline = started + float(profile.get("budget", 2.0))
+
+    def case_args(args):
+        # Fresh lists, not the ones the cases shared and may have changed
+        return [resolve_fixture(arg, fixtures) for arg in args] if fixtures else args
+
+    # (function, case arguments or None for a test function)
+    workload = [(namespace[name], None) for name in test_functions]
+    workload += [(func, args) for args, _, _ in cases]
+
+    line_hits = Counter()
+    monitoring = sys.monitoring
+    tool = monitoring.COVERAGE_ID
+
+    def on_line(code, line):
+        if code.co_filename != user_file:
+            return monitoring.DISABLE
+        line_hits[line] += 1
+
+    monitoring.use_tool_id(tool, "profile")
+    monitoring.register_callback(tool, monitoring.events.LINE, on_line)
+    profiler = cProfile.Profile()
+    tracemalloc.start(1)
+    user_filter = [tracemalloc.Filter(True, user_file)]
+    heaviest = (0, None)
+    iterations = 0
+    truncated = False
+    profile_started = time.perf_counter()
+    signal.signal(signal.SIGVTALRM, _profile_budget_exceeded)
+    signal.setitimer(signal.ITIMER_VIRTUAL, max(MIN_PROFILE_SECONDS, deadline - profile_started))
+    try:
+        for function, args in workload:
+            if iterations and time.perf_counter() > deadline:
+                break
+            # Resolved before instrumenting, so fixture lookups don't count towards the profile
+            args = () if args is None else case_args(args)
+            tracemalloc.reset_peak()
+            monitoring.set_events(tool, monitoring.events.LINE)
+            profiler.enable()
+            try:
+                result = function(*args)
+            except Exception:
+                result = None
+            finally:
+                profiler.disable()
+                monitoring.set_events(tool, 0)
+            iterations += 1
+            # Snapshot while the item's return value is still alive, for its retained allocations
+            current, _ = tracemalloc.get_traced_memory()
+            if current > heaviest[0]:
+                heaviest = (current, tracemalloc.take_snapshot().filter_traces(user_filter))
+            del result
+    except ProfileBudgetExceeded:
+        truncated = True
+    finally:
+        signal.setitimer(signal.ITIMER_VIRTUAL, 0)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        monitoring.register_callback(tool, monitoring.events.LINE, None)
+        monitoring.free_tool_id(tool)
+
+    functions = [
+        {
+            "function": name,
+            "line": line,
+            "calls": calls,
+            "own_seconds": round(own, 6),
+            "cumulative_seconds": round(cumulative, 6),
+        }
+        for (filename, line, name), (_, calls, own, cumulative, _) in pstats.Stats(profiler).stats.items()
+        if filename == user_file
+    ]
+    functions.sort(key=lambda f: f["own_seconds"], reverse=True)
+    allocations = []
+    if heaviest[1] is not None:
+        allocations = [
+            {"line": stat.traceback[0].lineno, "bytes": stat.size, "blocks": stat.count}
+            for stat in heaviest[1].statistics("lineno")[:top]
+        ]
+    report = {
+        "iterations": iterations,
+        "total_iterations": len(workload),
+        "truncated": truncated,
+        "seconds": round(time.perf_counter() - profile_started, 4),
+        "peak_bytes": peak,
+        "functions": functions[:top],
+        "lines": [{"line": line, "hits": hits} for line, hits in line_hits.most_common(top)],
+        "allocations": allocations,
+    }
+    print("PROFILE: " + json.dumps(report))
+
+
+def run_job(job, fixtures, compiled_tests):
+    """Run the job's test functions and cases, print results and return the exit code."""
+    started = time.perf_counter()
+    test_source = job.get("test_code") or ""
+    cases = job.get("cases") or []
+    stress = job.get("stress")
+    profile = job.get("profile")
+
+    # Execute test code in its own namespace to define test functions
+    namespace = {"__name__": "__tests__", "FIXTURES": fixtures}
+    try:
+        if isinstance(compiled_tests, BaseException):
+            raise compiled_tests
+        exec(compiled_tests, namespace)
+    except Exception as e:
+        error_msg = str(e) if str(e) else "Unknown error"
+        print(f"ERROR: Failed to load test code: {type(e).__name__}: {error_msg}")
+        return 1
+
+    module = func = None
+    if cases or stress or profile:
+        try:
+            module = importlib.import_module(job["module_path"])
+            func = getattr(module, job["function_name"])
+        except Exception as e:
+            print(f"ERROR: Failed to load {job['function_name']}: {format_error(e)}")
+            return 1
+
+    # Discover all test functions
+    test_functions = [name for name, obj in namespace.items() if name.startswith("test_") and callable(obj)]
+
+    if not test_functions and not cases and not stress:
+        print("ERROR: No test functions found (functions must start with 'test_')")
+        return 1
+
+    case_numbers = None
+    if job.get("shard"):
+        # One of several processes sharing the suite: deal test functions, then cases, then
+        # the stress run round-robin, so every shard gets a share whatever the suite's mix
+        index, count = job["shard"]
+        functions = len(test_functions)
+        test_functions = sorted(test_functions)[index::count]
+        case_numbers = range((index - functions) % count, len(cases), count)
+        if stress and (functions + len(cases)) % count != index:
+            stress = None
+
+    total = len(test_functions) + (len(cases) if case_numbers is None else len(case_numbers)) + (1 if stress else 0)
+
+    print(f"Found {total} test(s)")
+    # Named tests in run order (cases are implied by the total), so a host that kills a
+    # timed-out run can tell which tests never reported
+    print("TESTS: " + " ".join(test_functions + (["stress"] if stress else [])))
+    passed_tests = []
+    failed_tests = []
+
+    full_values = dict.fromkeys(job.get("full_values") or (), job.get("full_value_chars", MAX_VALUE_CHARS))
+    # The tests hand cases' arguments straight to the solution, which may change them in place
+    profile_cases = (
+        [(clone_args(args), expected, comparison) for args, expected, comparison in cases] if profile else None
+    )
+    run_test_functions(namespace, test_functions, test_source, passed_tests, failed_tests, full_values)
+    if cases:
+        run_cases(func, cases, fixtures, passed_tests, failed_tests, full_values, case_numbers)
+    if stress:
+        try:
+            run_stress(func, job["function_name"], stress, passed_tests, failed_tests)
+        except Exception as e:
+            print("ERROR in stress: " + format_error(e))
+            failed_tests.append("stress")
+    if profile:
+        try:
+            run_profile(module, namespace, test_functions, func, profile_cases, fixtures, profile, started)
+        except Exception as e:
+            print("ERROR: Profiling failed: " + format_error(e))
+
+    print(f"\nTest Summary: {len(passed_tests)} passed, {len(failed_tests)} failed out of {total} total")
+
+    if failed_tests:
+        return 1
+    print("SUCCESS: All tests passed")
+    return 0
+
+
+def serve(job, fixtures, compiled_tests):
+    """
+    Keep the tests loaded and run one submission per request line on stdin.
+
+    Each request is ``{"code": ..., "timeout": seconds, "token": ...}``. The user's module
+    is written to disk and the tests run in a forked child, so every run starts from this
+    warm, clean parent state. After the child exits, ``TIMEOUT <token>`` (if it hit the
+    deadline) and ``DONE <token> <exit code>`` are printed; the child never sees the token,
+    so a submission can't fake the end of its run.
+    """
+    parts = job["module_path"].split(".")
+    module_file = SANDBOX_DIR.joinpath(*parts[:-1]) / f"{parts[-1]}.py"
+    print("READY", flush=True)
+
+    for line in sys.stdin:
+        request = json.loads(line)
+        module_file.write_text(request["code"], encoding="utf-8")
+        sys.stdout.flush()
+        pid = os.fork()
+        if pid == 0:
+            # Later requests stay out of the submission's reach
+            devnull = os.open(os.devnull, os.O_RDONLY)
+            os.dup2(devnull, 0)
+            os.close(devnull)
+            sys.stdin = open(os.devnull)
+            signal.signal(signal.SIGALRM, flush_and_die)
+            signal.setitimer(signal.ITIMER_REAL, float(request.get("timeout", 5)))
+            try:
+                code = run_job(job, fixtures, compiled_tests)
+            except BaseException:
+                code = 1
+            sys.stdout.flush()
+            os._exit(code)
+        _, status = os.waitpid(pid, 0)
+        # Start a fresh line in case the submission left one unfinished
+        if os.WIFSIGNALED(status) and os.WTERMSIG(status) == signal.SIGALRM:
+            print(f"\nTIMEOUT {request['token']}")
+        print(f"\nDONE {request['token']} {os.waitstatus_to_exitcode(status)}", flush=True)
+
+
+def load_job(job):
+    """
+    Set up ``job`` before any user code is imported: cap the address space, map the
+    fixtures, compile the tests and load any stress reference and generator.
+
+    The stress sources are replaced by the reference function and the generator's
+    namespace, so the reference solution's text isn't kept anywhere in the process.
+    Returns ``(job, fixtures, compiled tests)``, or None after reporting unloadable
+    fixtures or stress sources.
+    """
+    # Cap the address space before any user code is imported; big allocations raise MemoryError
+    if job.get("memory_limit"):
+        resource.setrlimit(resource.RLIMIT_AS, (job["memory_limit"], job["memory_limit"]))
+
+    try:
+        fixtures = open_fixtures(job.get("fixtures") or {})
+    except Exception as e:
+        print(f"ERROR: Failed to load fixtures: {format_error(e)}")
+        return None
+
+    try:
+        compiled_tests = compile(job.get("test_code") or "", "<tests>", "exec")
+    except Exception as e:
+        compiled_tests = e
+
+    stress = job.get("stress")
+    if stress:
+        try:
+            reference_namespace = {"__name__": "__reference__"}
+            exec(compile(stress.pop("reference"), "<reference>", "exec"), reference_namespace)
+            stress["reference"] = reference_namespace[job["function_name"]]
+            generator_namespace = {"__name__": "__generator__"}
+            exec(compile(stress.pop("generator"), "<generator>", "exec"), generator_namespace)
+            stress["generator"] = generator_namespace
+        except Exception as e:
+            print(f"ERROR: Failed to load the stress sources: {format_error(e)}")
+            return None
+    return job, fixtures, compiled_tests
+
+
+def read_job(stream):
+    """The job sent ahead of everything else as one JSON line."""
+    return json.loads(stream.readline())
+
+
+def run_loaded(job):
+    """Run ``job`` in the current sandbox directory; returns the exit code."""
+    loaded = load_job(job)
+    if loaded is None:
+        return 1
+    return run_job(*loaded)
+
+
+def run_forked_child(request, output_fd, job_fd):
+    """Body of a fork-server child: run the job read from ``job_fd`` with ``output_fd`` as stdout."""
+    os.setsid()
+    signal.set_wakeup_fd(-1)
+    signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+    signal.signal(signal.SIGTERM, flush_and_die)
+    os.dup2(output_fd, 1)
+    os.dup2(output_fd, 2)
+    os.close(output_fd)
+    try:
+        with os.fdopen(job_fd, "rb") as job_stream:
+            job = read_job(job_stream)
+        use_sandbox_dir(request["dir"])
+        code = run_loaded(job)
+    except SystemExit as e:
+        code = e.code if isinstance(e.code, int) else 1
+    except BaseException as e:
+        print("ERROR: " + format_error(e))
+        code = 1
+    sys.stdout.flush()
+    os._exit(code)
+
+
+def fork_server(socket_path, preload):
+    """
+    Fork one child per run from this pre-initialized process (``--fork-server``).
+
+    The host connects to ``socket_path`` and sends ``{"dir": ...}`` together with the
+    write end of an output pipe and the read end of a pipe carrying the job. The child
+    becomes a session leader, takes the output pipe as stdout and stderr, reads the job
+    and runs it in ``dir`` as a spawned runner would. The server answers
+    ``PID <pid>`` and, once it has reaped the child, ``EXIT <exit code>``.
+    """
+    # Modules submissions may import are loaded once here, so children start warm
+    for name in preload:
+        importlib.import_module(name)
+
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    listener.bind(socket_path)
+    listener.listen(64)
+    wake_read, wake_write = os.pipe()
+    os.set_blocking(wake_write, False)
+    signal.set_wakeup_fd(wake_write)
+    signal.signal(signal.SIGCHLD, lambda signum, frame: None)
+    selector = selectors.DefaultSelector()
+    selector.register(listener, selectors.EVENT_READ)
+    selector.register(wake_read, selectors.EVENT_READ)
+    children = {}
+    print("READY", flush=True)
+
+    while True:
+        for key, _ in selector.select():
+            if key.fileobj is listener:
+                conn, _ = listener.accept()
+                try:
+                    message, fds, _, _ = socket.recv_fds(conn, 65536, 2)
+                    request = json.loads(message)
+                except (OSError, ValueError):
+                    conn.close()
+                    continue
+                if len(fds) != 2:
+                    for fd in fds:
+                        os.close(fd)
+                    conn.close()
+                    continue
+                pid = os.fork()
+                if pid == 0:
+                    selector.close()
+                    listener.close()
+                    conn.close()
+                    os.close(wake_read)
+                    os.close(wake_write)
+                    run_forked_child(request, fds[0], fds[1])
+                os.close(fds[0])
+                os.close(fds[1])
+                children[pid] = conn
+                try:
+                    conn.sendall(f"PID {pid}\n".encode())
+                except OSError:
+                    pass
+            else:
+                os.read(wake_read, 4096)
+        while children:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                break
+            if pid == 0:
+                break
+            conn = children.pop(pid, None)
+            if conn is not None:
+                try:
+                    conn.sendall(f"EXIT {os.waitstatus_to_exitcode(status)}\n".encode())
+                except OSError:
+                    pass
+                conn.close()
+
+
+def worker():
+    """
+    Run jobs one after another from this process (``--worker``), each in a forked child.
+
+    Each request line is ``{"dir": ..., "token": ..., "job": ...}``; the results are followed by
+    ``DONE <token> <exit code>``, so a submission can't fake the end of its run. The child
+    gets no stdin and exits after its job, so nothing a submission changes - modules,
+    monkeypatched runner functions, resource limits - reaches the jobs after it.
+    """
+    signal.signal(signal.SIGTERM, flush_and_die)
+    print("READY", flush=True)
+
+    for line in sys.stdin:
+        request = json.loads(line)
+        sys.stdout.flush()
+        pid = os.fork()
+        if pid == 0:
+            devnull = os.open(os.devnull, os.O_RDONLY)
+            os.dup2(devnull, 0)
+            os.close(devnull)
+            sys.stdin = open(os.devnull)
+            try:
+                use_sandbox_dir(request["dir"])
+                code = run_loaded(request["job"])
+            except SystemExit as e:
+                code = e.code if isinstance(e.code, int) else 1
+            except BaseException as e:
+                print("ERROR: " + format_error(e))
+                code = 1
+            try:
+                sys.stdout.flush()
+            finally:
+                os._exit(code)
+        _, status = os.waitpid(pid, 0)
+        code = os.WEXITSTATUS(status) if os.WIFEXITED(status) else 1
+        # Start a fresh line in case the submission left one unfinished
+        print(f"\nDONE {request['token']} {code}", flush=True)
+
+
+def main() -> None:
+    if "--fork-server" in sys.argv:
+        index = sys.argv.index("--fork-server")
+        preload = sys.argv[index + 2].split(",") if len(sys.argv) > index + 2 else []
+        fork_server(sys.argv[index + 1], [name for name in preload if name])
+        return
+    if "--worker" in sys.argv:
+        worker()
+        return
+
+    loaded = load_job(read_job(sys.stdin))
+    if loaded is None:
+        sys.exit(1)
+    if "--serve" in sys.argv:
+        serve(*loaded)
+    else:
+        # The host sends SIGTERM at the deadline, before killing the process group
+        signal.signal(signal.SIGTERM, flush_and_die)
+        sys.exit(run_job(*loaded))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,422 @@
+"""
+Fair scheduling and rate limiting for code submissions.
+
+Every submission must first pass ``admit`` - a cheap, synchronous check against the
+client's token bucket and the queue limits - before any database lookup or
+validation happens. Admitted submissions then wait for one of a number of sandbox
+slots, sized by ``app.concurrency`` to what the host can take. Waiting submissions are
+dispatched by weighted fair queuing (start-time fair queuing over virtual time), so a
+single client hammering "Run" only ever gets its fair share of slots no matter how many
+requests it sends.
+
+Work that nobody is waiting on interactively (full hidden-suite submissions) goes to a
+background lane. It is only dispatched when no interactive request is waiting, and
+never holds more than ``BACKGROUND_SLOTS`` slots, so "Run" stays fast under load.
+
+Callers pass each submission's expected runtime (from ``app.runtime_stats``), so the
+scheduler knows the seconds of work queued and running and can estimate the wait for a
+new submission. Work whose p95 runtime reaches ``HEAVY_RUNTIME_SECONDS`` is heavy:
+``RESERVED_SLOTS`` slots are kept out of its reach, and while the expected wait is over
+``SHED_WAIT_SECONDS`` new heavy work is turned away, so cheap problems keep flowing
+during a grading burst on an expensive one.
+"""
+
+import asyncio
+import heapq
+import itertools
+import os
+import time
+from collections import OrderedDict, deque
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from typing import Any
+
+from starlette.requests import HTTPConnection
+
+SANDBOX_SLOTS = int(os.getenv("SANDBOX_SLOTS", str(os.cpu_count() or 1)))
+SUBMISSION_RATE = float(os.getenv("SUBMISSION_RATE", "1.0"))  # tokens per second per client
+SUBMISSION_BURST = float(os.getenv("SUBMISSION_BURST", "5"))
+SUBMISSION_MAX_QUEUE = int(os.getenv("SUBMISSION_MAX_QUEUE", "100"))
+SUBMISSION_MAX_QUEUE_PER_CLIENT = int(os.getenv("SUBMISSION_MAX_QUEUE_PER_CLIENT", "2"))
+# Slots the low-priority background lane (full "Submit" runs) may hold at once
+BACKGROUND_SLOTS = int(os.getenv("BACKGROUND_SLOTS", str(max(1, SANDBOX_SLOTS // 2))))
+HEAVY_RUNTIME_SECONDS = float(os.getenv("HEAVY_RUNTIME_SECONDS", "1.0"))
+# Slots heavy work may never take, queued and running heavy work together
+RESERVED_SLOTS = int(os.getenv("RESERVED_SLOTS", str(max(1, SANDBOX_SLOTS // 4))))
+SHED_WAIT_SECONDS = float(os.getenv("SHED_WAIT_SECONDS", "5.0"))
+
+# Upper bound on per-client state kept in memory (least recently seen clients are dropped)
+MAX_TRACKED_CLIENTS = 10000
+# Queue waits kept for the metrics, and the most recent of them that inform wait estimates
+WAIT_WINDOW = 1000
+RECENT_WAITS = 50
+
+
+def client_key(request: HTTPConnection) -> str:
+    """Identify the submitting client by IP address."""
+    # Heroku's router appends the connecting address, so the last entry is the trustworthy one
+    forwarded_for = request.headers.get("x-forwarded-for")
+    if forwarded_for:
+        return forwarded_for.split(",")[-1].strip()
+    return request.client.host if request.client else "unknown"
+
+
+class RejectedError(Exception):
+    """Raised when a submission is refused before being queued."""
+
+    def __init__(self, reason: str, message: str, retry_after: float):
+        super().__init__(message)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    __slots__ = ("rate", "capacity", "tokens", "updated")
+
+    def __init__(self, rate: float, capacity: float, now: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = now
+
+    def take(self, now: float, cost: float = 1.0) -> bool:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= cost:
+            self.tokens -= cost
+            return True
+        return False
+
+    def seconds_until(self, cost: float = 1.0) -> float:
+        return max(0.0, (cost - self.tokens) / self.rate) if self.rate > 0 else float("inf")
+
+
+class RateLimiter:
+    """Per-client token buckets, for submissions (see ``FairScheduler``) and requests that don't need a slot."""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self._buckets: OrderedDict[str, TokenBucket] = OrderedDict()
+        self.limited = 0
+
+    def take(self, client_id: str, cost: float = 1.0) -> float:
+        """0 if the client may go ahead, else the seconds until it may."""
+        now = time.monotonic()
+        bucket = self._buckets.get(client_id)
+        if bucket is None:
+            bucket = TokenBucket(self.rate, self.burst, now)
+            self._buckets[client_id] = bucket
+            if len(self._buckets) > MAX_TRACKED_CLIENTS:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(client_id)
+        if bucket.take(now, cost):
+            return 0.0
+        self.limited += 1
+        return bucket.seconds_until(cost)
+
+
+class WaitStats:
+    """Queue waits of one lane: a window for percentiles, plus running totals."""
+
+    def __init__(self) -> None:
+        self.waits: deque[float] = deque(maxlen=WAIT_WINDOW)
+        self.total = 0.0
+        self.count = 0
+
+    def record(self, seconds: float) -> None:
+        self.waits.append(seconds)
+        self.total += seconds
+        self.count += 1
+
+    def recent_median(self) -> float:
+        recent = sorted(itertools.islice(reversed(self.waits), RECENT_WAITS))
+        return recent[len(recent) // 2] if recent else 0.0
+
+    def summary(self) -> dict[str, float]:
+        waits = sorted(self.waits)
+        return {
+            "count": self.count,
+            "mean": self.total / self.count if self.count else 0.0,
+            "p50": waits[len(waits) // 2] if waits else 0.0,
+            "p95": waits[int(len(waits) * 0.95)] if waits else 0.0,
+            "max": waits[-1] if waits else 0.0,
+        }
+
+
+class _Waiter:
+    __slots__ = ("client_id", "future", "enqueued_at")
+
+    def __init__(self, client_id: str, future: asyncio.Future, enqueued_at: float):
+        self.client_id = client_id
+        self.future = future
+        self.enqueued_at = enqueued_at
+
+
+class FairScheduler:
+    """Per-client token buckets in front of weighted fair queuing over sandbox slots."""
+
+    def __init__(
+        self,
+        slots: int = SANDBOX_SLOTS,
+        rate: float = SUBMISSION_RATE,
+        burst: float = SUBMISSION_BURST,
+        max_queue: int = SUBMISSION_MAX_QUEUE,
+        max_queue_per_client: int = SUBMISSION_MAX_QUEUE_PER_CLIENT,
+        background_slots: int = BACKGROUND_SLOTS,
+        heavy_runtime: float = HEAVY_RUNTIME_SECONDS,
+        reserved_slots: int = RESERVED_SLOTS,
+        shed_wait: float = SHED_WAIT_SECONDS,
+    ):
+        self.max_background_slots = background_slots
+        self.reserved_slots = reserved_slots
+        self.heavy_runtime = heavy_runtime
+        self._size(slots)
+        self.shed_wait = shed_wait
+        self.limiter = RateLimiter(rate, burst)
+        self.max_queue = max_queue
+        self.max_queue_per_client = max_queue_per_client
+
+        self._last_finish: dict[str, float] = {}
+        self._queued_by_client: dict[str, int] = {}
+        self._queued = 0
+        self._heap: list[tuple[float, int, _Waiter]] = []
+        self._background: list[tuple[float, int, _Waiter]] = []
+        self._sequence = itertools.count()
+        self._virtual_time = 0.0
+        self._background_virtual_time = 0.0
+        self._background_last_finish: dict[str, float] = {}
+        self._in_flight = 0
+        self._background_in_flight = 0
+        # Expected seconds of work queued or running per lane, and heavy submissions among them
+        self._backlog = 0.0
+        self._background_backlog = 0.0
+        self._heavy = 0
+
+        self._admitted = 0
+        self._rejected: dict[str, int] = {"rate_limited": 0, "queue_full": 0, "overloaded": 0}
+        self._waits = WaitStats()
+        self._background_waits = WaitStats()
+
+    def _size(self, slots: int) -> None:
+        self.slots = max(1, slots)
+        self.background_slots = max(1, min(self.max_background_slots, self.slots))
+        # Heavy work always gets at least one slot
+        self.heavy_slots = max(1, self.slots - self.reserved_slots)
+
+    def set_slots(self, slots: int) -> None:
+        """
+        Change the number of slots (see ``app.concurrency``). Runs holding a slot keep it;
+        after a shrink, new runs start once enough of them have finished.
+        """
+        self._size(slots)
+        self._dispatch()
+
+    @property
+    def queued(self) -> int:
+        return self._queued
+
+    def is_heavy(self, p95: float) -> bool:
+        return p95 >= self.heavy_runtime
+
+    def expected_wait(self, background: bool = False) -> float:
+        """Seconds a submission arriving now is expected to wait for a slot."""
+        waiting = self._background if background else self._heap
+        if not waiting and self._can_start(background):
+            return 0.0
+        if background:
+            # Background work also waits for every interactive submission ahead of it, and for
+            # interactive ones yet to arrive, which only the waits it recently saw account for
+            backlog = self._backlog / self.slots + self._background_backlog / self.background_slots
+            return max(backlog, self._background_waits.recent_median())
+        return self._backlog / self.slots
+
+    def admit(self, client_id: str, cost: float = 1.0, expected: float = 0.0, heavy: bool = False) -> float:
+        """
+        Cheap admission check; raises RejectedError instead of queueing.
+
+        Returns the expected wait for a slot. Heavy submissions are refused while heavy
+        work already fills every slot it may use, or while the wait is over the shedding
+        threshold. Like the rest of the scheduler, call it from the event loop only.
+        """
+        if self._queued_by_client.get(client_id, 0) >= self.max_queue_per_client or self.queued >= self.max_queue:
+            self._rejected["queue_full"] += 1
+            raise RejectedError("queue_full", "Too many submissions are waiting, please try again shortly", 1.0)
+        wait = self.expected_wait()
+        if heavy and (self._heavy >= self.heavy_slots or wait > self.shed_wait):
+            self._rejected["overloaded"] += 1
+            raise RejectedError(
+                "overloaded",
+                "This problem's tests are expensive and the server is busy, please try again shortly",
+                max(1.0, wait, expected),
+            )
+        retry_after = self.limiter.take(client_id, cost)
+        if retry_after:
+            self._rejected["rate_limited"] += 1
+            raise RejectedError("rate_limited", "You are submitting too quickly, please slow down", retry_after)
+        self._admitted += 1
+        return wait
+
+    async def acquire(
+        self,
+        client_id: str,
+        weight: float = 1.0,
+        background: bool = False,
+        expected: float = 0.0,
+        heavy: bool = False,
+    ) -> None:
+        """
+        Wait for a sandbox slot, in weighted fair order across clients within the lane.
+
+        ``expected`` seconds of work (and ``heavy`` work) count towards the backlog until
+        the slot is released, or until a cancelled wait gives up.
+        """
+        self._add_work(background, expected, heavy)
+        try:
+            await self._acquire(client_id, weight, background)
+        except asyncio.CancelledError:
+            self._add_work(background, -expected, -heavy)
+            raise
+
+    def _add_work(self, background: bool, expected: float, heavy: int) -> None:
+        if background:
+            self._background_backlog = max(0.0, self._background_backlog + expected)
+        else:
+            self._backlog = max(0.0, self._backlog + expected)
+            self._heavy += heavy
+
+    async def _acquire(self, client_id: str, weight: float, background: bool) -> None:
+        if background:
+            heap, last_finish, virtual_time = (
+                self._background,
+                self._background_last_finish,
+                self._background_virtual_time,
+            )
+        else:
+            heap, last_finish, virtual_time = self._heap, self._last_finish, self._virtual_time
+        if not heap and self._can_start(background):
+            self._start(background)
+            self._record_wait(0.0, background)
+            return
+
+        start = max(virtual_time, last_finish.get(client_id, 0.0))
+        finish = start + 1.0 / weight
+        last_finish[client_id] = finish
+        future = asyncio.get_running_loop().create_future()
+        waiter = _Waiter(client_id, future, time.monotonic())
+        heapq.heappush(heap, (start, next(self._sequence), waiter))
+        self._queued_by_client[client_id] = self._queued_by_client.get(client_id, 0) + 1
+        self._queued += 1
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # The slot was handed over just as we were cancelled; pass it on
+                self._release_slot(background)
+            raise
+        finally:
+            self._dequeued(client_id)
+
+    def _can_start(self, background: bool) -> bool:
+        if self._in_flight >= self.slots:
+            return False
+        if background:
+            # Interactive requests always go first, and background work never fills every slot
+            return not self._heap and self._background_in_flight < self.background_slots
+        return True
+
+    def _start(self, background: bool) -> None:
+        self._in_flight += 1
+        if background:
+            self._background_in_flight += 1
+
+    def release(self, background: bool = False, expected: float = 0.0, heavy: bool = False) -> None:
+        self._add_work(background, -expected, -heavy)
+        self._release_slot(background)
+
+    def _release_slot(self, background: bool) -> None:
+        self._in_flight -= 1
+        if background:
+            self._background_in_flight -= 1
+        self._dispatch()
+
+    def _dispatch(self) -> None:
+        while self._heap and self._can_start(False):
+            start, _, waiter = heapq.heappop(self._heap)
+            if waiter.future.done():
+                continue
+            self._virtual_time = max(self._virtual_time, start)
+            self._start(False)
+            self._record_wait(time.monotonic() - waiter.enqueued_at, False)
+            waiter.future.set_result(None)
+        while self._background and self._can_start(True):
+            start, _, waiter = heapq.heappop(self._background)
+            if waiter.future.done():
+                continue
+            self._background_virtual_time = max(self._background_virtual_time, start)
+            self._start(True)
+            self._record_wait(time.monotonic() - waiter.enqueued_at, True)
+            waiter.future.set_result(None)
+        # Idle clients no longer need their finish tags
+        if not self._heap:
+            self._last_finish.clear()
+        if not self._background:
+            self._background_last_finish.clear()
+
+    def _dequeued(self, client_id: str) -> None:
+        self._queued -= 1
+        remaining = self._queued_by_client.get(client_id, 1) - 1
+        if remaining > 0:
+            self._queued_by_client[client_id] = remaining
+        else:
+            self._queued_by_client.pop(client_id, None)
+
+    def _record_wait(self, seconds: float, background: bool) -> None:
+        (self._background_waits if background else self._waits).record(seconds)
+
+    @asynccontextmanager
+    async def slot(
+        self,
+        client_id: str,
+        weight: float = 1.0,
+        background: bool = False,
+        expected: float = 0.0,
+        heavy: bool = False,
+    ) -> AsyncIterator[None]:
+        await self.acquire(client_id, weight, background, expected, heavy)
+        try:
+            yield
+        finally:
+            self.release(background, expected, heavy)
+
+    def idle_slots(self) -> int:
+        """Slots no run holds or waits for right now; sharded runs borrow these (see ``app.sharding``)."""
+        return max(0, self.slots - self._in_flight - self.queued)
+
+    def saturated(self) -> bool:
+        """Every slot is taken or work is waiting for one: more slots could be used."""
+        return self._in_flight >= self.slots or self.queued > 0
+
+    def metrics(self) -> dict[str, Any]:
+        return {
+            "slots": self.slots,
+            "in_flight": self._in_flight,
+            "queued": self.queued,
+            "background_slots": self.background_slots,
+            "background_in_flight": self._background_in_flight,
+            "background_queued": len(self._background),
+            "heavy": self._heavy,
+            "heavy_slots": self.heavy_slots,
+            "backlog_seconds": round(self._backlog, 3),
+            "background_backlog_seconds": round(self._background_backlog, 3),
+            "expected_wait_seconds": round(self.expected_wait(), 3),
+            "background_expected_wait_seconds": round(self.expected_wait(background=True), 3),
+            "admitted": self._admitted,
+            "rejected": dict(self._rejected),
+            "queue_wait_seconds": self._waits.summary(),
+            "background_queue_wait_seconds": self._background_waits.summary(),
+        }
+
+
+scheduler = FairScheduler()
@@ -0,0 +1,51 @@
+"""
+Problem search and category facets.
+
+Search runs against the GIN-indexed ``search_vector`` column and only selects the
+columns the list page renders, so large description/test_code text is never loaded.
+Facet counts are a small aggregate cached in-process for ``FACET_CACHE_SECONDS``.
+"""
+
+import os
+import time
+from typing import Any
+
+from sqlalchemy import Row, func, select
+from sqlalchemy.orm import Session
+
+from app.models import Problem
+
+PAGE_SIZE = 100
+FACET_CACHE_SECONDS = float(os.getenv("FACET_CACHE_SECONDS", "60"))
+
+_facet_cache: tuple[float, list[tuple[str, int]]] | None = None
+
+
+def search_problems(
+    db: Session, query: str | None = None, category: str | None = None, page: int = 1
+) -> list[Row[Any]]:
+    """Return (id, title, category) rows matching the search, best matches first."""
+    stmt = select(Problem.id, Problem.title, Problem.category)
+    if category:
+        stmt = stmt.where(Problem.category == category)
+    if query and query.strip():
+        ts_query = func.websearch_to_tsquery("english", query.strip())
+        stmt = stmt.where(Problem.search_vector.op("@@")(ts_query)).order_by(
+            func.ts_rank(Problem.search_vector, ts_query).desc(), Problem.title
+        )
+    else:
+        stmt = stmt.order_by(Problem.title)
+    stmt = stmt.limit(PAGE_SIZE).offset((max(page, 1) - 1) * PAGE_SIZE)
+    return list(db.execute(stmt).all())
+
+
+def category_facets(db: Session) -> list[tuple[str, int]]:
+    """Return [(category, problem count)] sorted by category, from a short-lived cache."""
+    global _facet_cache
+    now = time.monotonic()
+    if _facet_cache is not None and now - _facet_cache[0] < FACET_CACHE_SECONDS:
+        return _facet_cache[1]
+    rows = db.execute(select(Problem.category, func.count()).group_by(Problem.category).order_by(Problem.category))
+    facets = [(category, count) for category, count in rows]
+    _facet_cache = (now, facets)
+    return facets
@@ -0,0 +1,225 @@
+"""
+Editing sessions backed by a warm sandbox.
+
+A session reserves one long-lived sandbox process (the test runner in ``--serve``
+mode) for a client and problem. The problem's tests, cases and fixtures are loaded
+once when the session starts, so each "Run" only ships the new source and the runner
+forks a clean child to execute it - no interpreter start-up, DB lookups or job setup
+per run. Sessions idle for longer than ``SESSION_IDLE_SECONDS`` are reaped.
+"""
+
+import asyncio
+import json
+import os
+import select
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Any
+
+from app.code_executor import (
+    MAX_OUTPUT_BYTES,
+    kill_process_group,
+    output_limit_failure,
+    parse_test_output,
+    prepare_sandbox,
+    python_executable,
+    sandbox_env,
+    timeout_failure,
+    validate_code,
+    validation_failure,
+)
+from app.results import ExecutionResult
+
+SESSION_IDLE_SECONDS = float(os.getenv("SESSION_IDLE_SECONDS", "120"))
+MAX_SESSIONS = int(os.getenv("MAX_SESSIONS", "32"))
+
+# Extra time the host waits for the runner to report a timed-out child
+TIMEOUT_GRACE_SECONDS = 2.0
+
+
+class SandboxCrashed(RuntimeError):
+    """The warm sandbox process died or stopped responding."""
+
+
+class OutputLimitExceeded(RuntimeError):
+    """A run wrote more than MAX_OUTPUT_BYTES."""
+
+
+class WarmSandbox:
+    """A runner process with a problem's tests preloaded, executing one submission at a time."""
+
+    def __init__(
+        self,
+        test_code: str,
+        module_path: str,
+        function_name: str | None = None,
+        test_cases: list[tuple[Any, Any, str]] | None = None,
+        fixtures: dict[str, tuple[str, str]] | None = None,
+    ):
+        self._tmpdir = tempfile.mkdtemp(prefix="sandbox-")
+        tmp_path = Path(self._tmpdir)
+        test_runner, _, job = prepare_sandbox(tmp_path, test_code, module_path, function_name, test_cases, fixtures)
+        self._lock = threading.Lock()
+        self._buffer = b""
+        self.process = subprocess.Popen(
+            [python_executable(), str(test_runner), "--serve"],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            cwd=str(tmp_path),
+            env=sandbox_env(tmp_path),
+            start_new_session=True,
+        )
+        assert self.process.stdin is not None
+        try:
+            # The runner reads its job before anything else; requests follow on the same pipe
+            self.process.stdin.write(job.encode("utf-8"))
+            self.process.stdin.flush()
+        except BrokenPipeError:
+            pass
+        lines, _ = self._read_until(("READY",), time.monotonic() + 10)
+        if not lines or lines[-1] != "READY":
+            self.close()
+            raise SandboxCrashed("\n".join(lines) or "Sandbox failed to start")
+
+    @property
+    def alive(self) -> bool:
+        return self.process.poll() is None
+
+    def _read_until(self, markers: tuple[str, ...], deadline: float) -> tuple[list[str], bool]:
+        """Read output lines until one starts with a marker; returns (lines, timed out)."""
+        assert self.process.stdout is not None
+        fd = self.process.stdout.fileno()
+        lines: list[str] = []
+        received = 0
+        while True:
+            while b"\n" in self._buffer:
+                raw, self._buffer = self._buffer.split(b"\n", 1)
+                line = raw.decode("utf-8", errors="replace")
+                lines.append(line)
+                if line.startswith(markers):
+                    return lines, False
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return lines, True
+            ready, _, _ = select.select([fd], [], [], remaining)
+            if ready:
+                chunk = os.read(fd, 65536)
+                if not chunk:
+                    return lines, False
+                received += len(chunk)
+                if received > MAX_OUTPUT_BYTES:
+                    raise OutputLimitExceeded
+                self._buffer += chunk
+
+    def run(self, user_code: str, timeout: float = 5) -> ExecutionResult:
+        is_valid, error = validate_code(user_code)
+        if not is_valid:
+            return validation_failure(error)
+
+        with self._lock:
+            if not self.alive:
+                raise SandboxCrashed("Sandbox process has exited")
+            assert self.process.stdin is not None
+            # Only lines carrying this run's token end it; the submission can print anything else
+            token = uuid.uuid4().hex
+            done, timeout_marker = f"DONE {token} ", f"TIMEOUT {token}"
+            request = json.dumps({"code": user_code, "timeout": timeout, "token": token}) + "\n"
+            try:
+                self.process.stdin.write(request.encode("utf-8"))
+                self.process.stdin.flush()
+            except BrokenPipeError as e:
+                raise SandboxCrashed("Sandbox process has exited") from e
+
+            try:
+                lines, timed_out = self._read_until((done,), time.monotonic() + timeout + TIMEOUT_GRACE_SECONDS)
+            except OutputLimitExceeded:
+                # The flood may still be running; the next run starts a fresh sandbox
+                self.close()
+                return output_limit_failure()
+            if timed_out or not lines or not lines[-1].startswith(done):
+                self.close()
+                raise SandboxCrashed("Sandbox stopped responding")
+            if timeout_marker in lines:
+                return timeout_failure(timeout, "\n".join(line for line in lines[:-1] if line != timeout_marker))
+            exit_code = int(lines[-1][len(done) :])
+            return parse_test_output("\n".join(lines[:-1]) + "\n", exit_code == 0)
+
+    def close(self) -> None:
+        kill_process_group(self.process)
+        shutil.rmtree(self._tmpdir, ignore_errors=True)
+
+
+class SessionManager:
+    """Tracks warm sandboxes by (client, problem, version) and reaps idle ones."""
+
+    def __init__(self, idle_seconds: float = SESSION_IDLE_SECONDS, max_sessions: int = MAX_SESSIONS):
+        self.idle_seconds = idle_seconds
+        self.max_sessions = max_sessions
+        self._sessions: dict[tuple, tuple[WarmSandbox, float]] = {}
+        self._lock = threading.Lock()
+        self.reaped = 0
+
+    def get(self, key: tuple) -> WarmSandbox | None:
+        with self._lock:
+            entry = self._sessions.get(key)
+            if entry is None:
+                return None
+            sandbox, _ = entry
+            if not sandbox.alive:
+                del self._sessions[key]
+                return None
+            self._sessions[key] = (sandbox, time.monotonic())
+            return sandbox
+
+    def add(self, key: tuple, sandbox: WarmSandbox) -> None:
+        evicted = []
+        with self._lock:
+            if key in self._sessions:
+                evicted.append(self._sessions[key][0])
+            self._sessions[key] = (sandbox, time.monotonic())
+            # Evict least recently used sessions beyond the cap
+            while len(self._sessions) > self.max_sessions:
+                oldest = min(self._sessions, key=lambda k: self._sessions[k][1])
+                evicted.append(self._sessions.pop(oldest)[0])
+        for old in evicted:
+            old.close()
+
+    def discard(self, key: tuple) -> None:
+        with self._lock:
+            entry = self._sessions.pop(key, None)
+        if entry:
+            entry[0].close()
+
+    def reap(self) -> int:
+        cutoff = time.monotonic() - self.idle_seconds
+        with self._lock:
+            stale = [k for k, (_, last_used) in self._sessions.items() if last_used < cutoff]
+            sandboxes = [self._sessions.pop(k)[0] for k in stale]
+        for sandbox in sandboxes:
+            sandbox.close()
+        self.reaped += len(sandboxes)
+        return len(sandboxes)
+
+    async def reap_forever(self, interval: float = 10.0) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            await asyncio.to_thread(self.reap)
+
+    def close_all(self) -> None:
+        with self._lock:
+            sandboxes = [sandbox for sandbox, _ in self._sessions.values()]
+            self._sessions.clear()
+        for sandbox in sandboxes:
+            sandbox.close()
+
+    def metrics(self) -> dict[str, int]:
+        return {"active": len(self._sessions), "reaped": self.reaped}
+
+
+sessions = SessionManager()
@@ -0,0 +1,143 @@
+"""
+Running one submission's tests across several sandbox processes at once.
+
+A problem's ``test_shards`` says how many processes its suite may be split across. Each
+shard runs the same job with a ``shard`` of ``(index, count)``: the runner deals the test
+functions, cases and stress run round-robin and runs only its share, each shard with the
+full time limit. Results are merged back in the order a single process reports them, so
+a sharded verdict reads exactly like an unsharded one.
+
+The submission's own scheduler slot pays for its first shard. Extra shards need cores
+from a process-wide budget of ``SHARD_CORE_BUDGET``, and are only granted while the
+scheduler has idle slots, so sharding uses spare capacity and never slows other
+submissions down. A run that gets fewer cores than it asked for runs in fewer shards.
+"""
+
+import ast
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any
+
+from app.results import ExecutionResult, TestResult
+from app.scheduler import scheduler
+
+SHARD_CORE_BUDGET = int(os.getenv("SHARD_CORE_BUDGET", str(os.cpu_count() or 1)))
+
+# Most shards a problem may ask for
+MAX_TEST_SHARDS = 16
+
+# Results reported for the run as a whole rather than for one test; listed once when merged
+RUN_LEVEL_TESTS = ("Execution", "Test setup", "All tests", "Code validation")
+
+
+class CoreBudget:
+    """Cores for extra shards, handed out without waiting: a run takes what is free."""
+
+    def __init__(self, cores: int):
+        self.cores = max(0, cores)
+        self.in_use = 0
+        self.granted = 0
+        self.denied = 0
+        self._lock = threading.Lock()
+
+    def acquire(self, wanted: int) -> int:
+        """Take up to ``wanted`` cores, no more than the scheduler's idle slots; returns how many."""
+        with self._lock:
+            granted = max(0, min(wanted, self.cores - self.in_use, scheduler.idle_slots()))
+            self.in_use += granted
+            self.granted += granted
+            self.denied += wanted - granted
+            return granted
+
+    def release(self, cores: int) -> None:
+        with self._lock:
+            self.in_use -= cores
+
+    def metrics(self) -> dict[str, int]:
+        return {"cores": self.cores, "in_use": self.in_use, "granted": self.granted, "denied": self.denied}
+
+
+core_budget = CoreBudget(SHARD_CORE_BUDGET)
+
+
+def shardable_units(test_code: str, test_cases: list | None, stress: dict[str, Any] | None) -> int:
+    """Test functions, cases and stress runs in a job: more shards than this would sit idle."""
+    try:
+        tree = ast.parse(test_code)
+    except SyntaxError:
+        return 1
+    functions = sum(1 for node in tree.body if isinstance(node, ast.FunctionDef) and node.name.startswith("test_"))
+    return functions + len(test_cases or []) + (1 if stress else 0)
+
+
+def result_order(test: TestResult) -> tuple[int, str]:
+    """Where a test reports in an unsharded run: test functions by name, cases, stress, then run-level results."""
+    if test.name.startswith("case_"):
+        return 1, test.name
+    if test.name == "stress":
+        return 2, test.name
+    if test.name in RUN_LEVEL_TESTS:
+        return 3, test.name
+    return 0, test.name
+
+
+def merge_results(results: list[ExecutionResult]) -> ExecutionResult:
+    """Combine shard results into the result a single process would have produced."""
+    # A failure to load the code or the tests hits every shard alike; report it once
+    for result in results:
+        if not result.success and all(test.name in RUN_LEVEL_TESTS for test in result.test_results):
+            return result
+
+    test_results: list[TestResult] = []
+    seen: set[str] = set()
+    for test in sorted((test for result in results for test in result.test_results), key=result_order):
+        if test.name not in seen:
+            seen.add(test.name)
+            test_results.append(test)
+
+    success = all(result.success for result in results)
+    passed_count = sum(result.passed_count for result in results)
+    failed_count = sum(result.failed_count for result in results)
+    total_count = sum(result.total_count for result in results)
+    timed_out = next((r.error for r in results if r.error and r.error.startswith("Execution timed out")), None)
+    if success:
+        error = None
+    elif timed_out:
+        error = timed_out
+    elif failed_count:
+        error = f"{failed_count} of {total_count} tests failed"
+    else:
+        error = next((result.error for result in results if result.error), "Tests failed")
+    return ExecutionResult(
+        success=success,
+        error=error,
+        test_results=test_results,
+        output="\n".join(result.output for result in results if result.output),
+        passed_count=passed_count,
+        failed_count=failed_count,
+        total_count=total_count,
+        not_run_count=sum(result.not_run_count for result in results),
+        stress=next((result.stress for result in results if result.stress), None),
+    )
+
+
+def execute_sharded(backend: Any, shards: int, user_code: str, timeout: float, **job: Any) -> ExecutionResult:
+    """Run ``job`` in up to ``shards`` parallel sandboxes on ``backend`` and merge the results."""
+    wanted = min(shards, MAX_TEST_SHARDS, shardable_units(job["test_code"], job.get("test_cases"), job.get("stress")))
+    extra = core_budget.acquire(wanted - 1) if wanted > 1 else 0
+    try:
+        count = 1 + extra
+        if count == 1:
+            return backend.execute(user_code, timeout=timeout, **job)
+        # The threads only wait on their sandbox processes
+        with ThreadPoolExecutor(max_workers=count) as pool:
+            results = list(
+                pool.map(
+                    lambda index: backend.execute(user_code, timeout=timeout, shard=(index, count), **job),
+                    range(count),
+                )
+            )
+        return merge_results(results)
+    finally:
+        core_budget.release(extra)
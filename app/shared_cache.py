@@ -0,0 +1,177 @@
+"""
+Host-local cache shared by every web process on a node.
+
+With ``uvicorn --workers N`` each process would otherwise load the same test jobs from
+the database and run the same code on its own. When ``SHARED_CACHE_PATH`` is set, they
+share one SQLite database in WAL mode instead: readers never block each other or the
+writer, and an entry stored by one worker is a hit for all of them.
+
+Entries are JSON under ``namespace:key`` and carry the problem version they were built
+from; a read with another version is a miss, and the next write replaces the stale
+entry. Triggers bump the version on any change to a problem row or to its test cases
+and fixtures (migrations 008 and 016), so edits need no invalidation. Past ``SHARED_CACHE_MAX_BYTES``
+the least recently read entries are evicted. The cache is best effort: if the database
+is locked for too long or unusable, reads miss and writes are dropped.
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any
+
+logger = logging.getLogger("uvicorn.error.shared_cache")
+
+SHARED_CACHE_PATH = os.getenv("SHARED_CACHE_PATH", "")
+SHARED_CACHE_MAX_BYTES = int(os.getenv("SHARED_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+# Bumped whenever the shape of cached values changes, so old entries are never read
+CACHE_FORMAT = 1
+# How long a reader waits for the writer's lock before treating the read as a miss
+BUSY_TIMEOUT_SECONDS = 0.2
+# An entry's last-read time is only rewritten once this stale, so hits rarely write
+ACCESS_RESOLUTION_SECONDS = 60
+# Eviction frees down to this share of the size bound, so it doesn't run on every write
+EVICT_TO = 0.9
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    version INTEGER NOT NULL,
+    value TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    accessed REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed);
+CREATE TABLE IF NOT EXISTS totals (id INTEGER PRIMARY KEY CHECK (id = 0), size INTEGER NOT NULL);
+INSERT OR IGNORE INTO totals VALUES (0, 0);
+"""
+
+
+class SharedCache:
+    """Versioned JSON entries in a WAL-mode SQLite file, bounded to ``max_bytes``."""
+
+    def __init__(self, path: str, max_bytes: int):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.writes = 0
+        self.evictions = 0
+        self.errors = 0
+        # sqlite3 connections can't be shared between threads
+        self._local = threading.local()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.path)
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT_SECONDS, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            # Losing the last writes on a power cut only costs cache misses
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.executescript(SCHEMA)
+            self._local.connection = connection
+        return connection
+
+    def get(self, namespace: str, key: str, version: int) -> Any | None:
+        """The value stored for ``key`` at ``version``, or None."""
+        if not self.enabled:
+            return None
+        full_key = f"{CACHE_FORMAT}:{namespace}:{key}"
+        try:
+            connection = self._connect()
+            row = connection.execute(
+                "SELECT version, value, accessed FROM entries WHERE key = ?", (full_key,)
+            ).fetchone()
+            if row is None or row[0] != version:
+                self.stale += row is not None
+                self.misses += 1
+                return None
+            now = time.time()
+            if now - row[2] > ACCESS_RESOLUTION_SECONDS:
+                connection.execute("UPDATE entries SET accessed = ? WHERE key = ?", (now, full_key))
+            self.hits += 1
+            return json.loads(row[1])
+        except (sqlite3.Error, ValueError) as e:
+            self._failed("read", e)
+            return None
+
+    def put(self, namespace: str, key: str, version: int, value: Any) -> None:
+        """Store ``value`` for ``key`` at ``version``, replacing any other version."""
+        if not self.enabled:
+            return
+        full_key = f"{CACHE_FORMAT}:{namespace}:{key}"
+        data = json.dumps(value, default=str)
+        size = len(full_key) + len(data)
+        if size > self.max_bytes * (1 - EVICT_TO):
+            # One entry this large would flush most of the cache
+            return
+        try:
+            connection = self._connect()
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                old = connection.execute("SELECT size FROM entries WHERE key = ?", (full_key,)).fetchone()
+                connection.execute(
+                    "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?)",
+                    (full_key, version, data, size, time.time()),
+                )
+                connection.execute("UPDATE totals SET size = size + ? WHERE id = 0", (size - (old[0] if old else 0),))
+                (total,) = connection.execute("SELECT size FROM totals WHERE id = 0").fetchone()
+                if total > self.max_bytes:
+                    self._evict(connection, total - int(self.max_bytes * EVICT_TO))
+                connection.execute("COMMIT")
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+            self.writes += 1
+        except sqlite3.Error as e:
+            self._failed("write", e)
+
+    def _evict(self, connection: sqlite3.Connection, excess: int) -> None:
+        """Delete least recently read entries until ``excess`` bytes are freed."""
+        freed = 0
+        keys = []
+        cursor = connection.execute("SELECT key, size FROM entries ORDER BY accessed")
+        for key, size in cursor:
+            if freed >= excess:
+                break
+            keys.append((key,))
+            freed += size
+        cursor.close()
+        connection.executemany("DELETE FROM entries WHERE key = ?", keys)
+        connection.execute("UPDATE totals SET size = size - ? WHERE id = 0", (freed,))
+        self.evictions += len(keys)
+
+    def _failed(self, operation: str, error: Exception) -> None:
+        self.errors += 1
+        logger.warning("Shared cache %s failed: %s", operation, error)
+
+    def metrics(self) -> dict[str, Any]:
+        metrics: dict[str, Any] = {
+            "enabled": self.enabled,
+            "hits": self.hits,
+            "misses": self.misses,
+            "stale": self.stale,
+            "writes": self.writes,
+            "evictions": self.evictions,
+            "errors": self.errors,
+        }
+        if self.enabled:
+            try:
+                connection = self._connect()
+                metrics["entries"] = connection.execute("SELECT count(*) FROM entries").fetchone()[0]
+                metrics["bytes"] = connection.execute("SELECT size FROM totals WHERE id = 0").fetchone()[0]
+                metrics["max_bytes"] = self.max_bytes
+            except sqlite3.Error as e:
+                self._failed("metrics read", e)
+        return metrics
+
+
+shared_cache = SharedCache(SHARED_CACHE_PATH, SHARED_CACHE_MAX_BYTES)
@@ -0,0 +1,88 @@
+"""
+Warm-up phase run when a web process starts.
+
+The first submissions after a deploy or scale-up used to pay for Jinja template
+compilation, opening database connections and a cold Python/sandbox start. ``warm_up``
+does that work up front and flips ``readiness`` once it is done; ``/ready`` reports it
+so the router only sends traffic to warm processes.
+"""
+
+import asyncio
+import logging
+import time
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import text
+
+from app.code_executor import execute_code_secure
+from app.database import engine
+from app.routes import templates
+
+# Child of uvicorn's logger so startup timings show up in the dyno logs
+logger = logging.getLogger("uvicorn.error.startup")
+
+WARM_UP_CODE = "def warm_up(x):\n    return x\n"
+WARM_UP_TESTS = "from warm_up.warm_up import warm_up\n\n\ndef test_warm_up():\n    assert warm_up(1) == 1\n"
+
+
+class Readiness:
+    def __init__(self) -> None:
+        self.ready = False
+        self.started_at = time.monotonic()
+        self.ready_after: float | None = None
+        self.phases: dict[str, float] = {}
+
+
+readiness = Readiness()
+
+
+def precompile_templates() -> None:
+    for name in templates.env.list_templates(extensions=["html"]):
+        templates.env.get_template(name)
+
+
+def open_db_pool() -> None:
+    """Open every pooled connection once so the first requests don't pay for connecting."""
+    size = getattr(engine.pool, "size", lambda: 1)()
+    connections = [engine.connect() for _ in range(size)]
+    try:
+        for connection in connections:
+            connection.execute(text("SELECT 1"))
+    finally:
+        for connection in connections:
+            connection.close()
+
+
+def warm_sandbox() -> None:
+    result = execute_code_secure(WARM_UP_CODE, WARM_UP_TESTS, "warm_up.warm_up", timeout=10)
+    if not result.success:
+        raise RuntimeError(f"Warm-up execution failed: {result.error}")
+
+
+WARM_UP_PHASES = [
+    ("templates", precompile_templates),
+    ("db_pool", open_db_pool),
+    ("sandbox", warm_sandbox),
+]
+
+
+async def warm_up(max_backoff: float = 30.0) -> None:
+    """Run each warm-up phase (retrying failures with backoff), then mark the process ready."""
+    for name, phase in WARM_UP_PHASES:
+        backoff = 1.0
+        # Timed across retries, so the time spent on failed attempts shows too
+        phase_started = time.monotonic()
+        while True:
+            try:
+                await run_in_threadpool(phase)
+                break
+            except Exception as e:
+                logger.warning("Warm-up phase %s failed (%s), retrying in %.0fs", name, e, backoff)
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, max_backoff)
+        readiness.phases[name] = time.monotonic() - phase_started
+        logger.info("Warm-up phase %s took %.3fs", name, readiness.phases[name])
+
+    readiness.ready_after = time.monotonic() - readiness.started_at
+    readiness.ready = True
+    logger.info("Ready to serve after %.3fs", readiness.ready_after)
@@ -0,0 +1,194 @@
+"""
+Background "Submit" runs against a problem's full hidden suite.
+
+"Run" executes only the visible sample tests and answers synchronously. "Submit" runs
+everything - sample and hidden tests, every case and, when the problem has a reference
+solution, a stress comparison - so it is queued on the scheduler's background lane and
+the client polls for the verdict. Hidden tests report only pass/fail: their expected
+and actual values, and anything the code printed, would give the hidden inputs away.
+Visible tests report only the exception type, since code that got hold of a hidden
+input could otherwise smuggle it out in a message - and only builtin types by name, as
+the code could name a class of its own after the input.
+
+Submissions are kept in memory for ``SUBMISSION_TTL_SECONDS`` after they finish.
+"""
+
+import asyncio
+import builtins
+import logging
+import os
+import re
+import time
+import uuid
+from typing import Any
+
+from fastapi.concurrency import run_in_threadpool
+
+from app.analytics import record_outcome
+from app.captures import RunContext, captures
+from app.code_executor import execute_code_secure
+from app.concurrency import concurrency
+from app.results import ExecutionResult, SubmissionStatus
+from app.runtime_stats import runtime_stats
+from app.scheduler import scheduler
+
+logger = logging.getLogger("uvicorn.error.submissions")
+
+SUBMISSION_TTL_SECONDS = float(os.getenv("SUBMISSION_TTL_SECONDS", "600"))
+MAX_SUBMISSIONS = int(os.getenv("MAX_SUBMISSIONS", "1000"))
+
+# A full suite costs several interactive runs, so it gets a smaller share of the background lane
+SUBMIT_WEIGHT = 0.5
+
+HIDDEN_TEST_ERROR = "Hidden test failed"
+# Errors that say nothing about a test's inputs
+GENERIC_ERRORS = {"Not run", HIDDEN_TEST_ERROR}
+# Errors written by the host rather than by anything the user's code controls
+HOST_ERROR_PREFIXES = ("Execution timed out", "Output limit exceeded", "Execution error:")
+HOST_ERROR_TESTS = {"Code validation", "Test setup"}
+# "Type: message", as the runner formats exceptions
+EXCEPTION_TYPE = re.compile(r"([A-Za-z_][\w.]*): ")
+# Reported for exception types the user's code may have defined and named
+OTHER_EXCEPTION = "Exception"
+
+
+class Submission:
+    __slots__ = ("id", "client_id", "problem_id", "status", "result", "created_at", "finished_at")
+
+    def __init__(self, client_id: str, problem_id: uuid.UUID):
+        self.id = uuid.uuid4()
+        self.client_id = client_id
+        self.problem_id = problem_id
+        self.status = "queued"
+        self.result: ExecutionResult | None = None
+        self.created_at = time.monotonic()
+        self.finished_at: float | None = None
+
+    def summary(self) -> SubmissionStatus:
+        wait = scheduler.expected_wait(background=True) if self.status == "queued" else None
+        return SubmissionStatus(id=str(self.id), status=self.status, result=self.result, expected_wait_seconds=wait)
+
+
+def exception_type(error: str | None) -> str:
+    """The builtin exception type of a failure message; assertion messages carry none."""
+    match = EXCEPTION_TYPE.match(error or "")
+    if not match:
+        return "AssertionError"
+    builtin = getattr(builtins, match.group(1), None)
+    return match.group(1) if isinstance(builtin, type) and issubclass(builtin, BaseException) else OTHER_EXCEPTION
+
+
+def redact_hidden(result: ExecutionResult, visible: set[str]) -> ExecutionResult:
+    """
+    Strip what failed tests could reveal about hidden inputs: hidden tests keep only
+    pass/fail, visible ones their builtin exception type, and the run's output is dropped.
+    """
+    failures = [test for test in result.test_results if not test.passed]
+    for test in failures:
+        test.actual = None
+        test.diff = None
+        if (
+            test.error in GENERIC_ERRORS
+            or test.name in HOST_ERROR_TESTS
+            or (test.error or "").startswith(HOST_ERROR_PREFIXES)
+        ):
+            continue
+        test.error = exception_type(test.error) if test.name in visible else HIDDEN_TEST_ERROR
+    if result.stress and result.stress.counterexample:
+        result.stress.counterexample.actual = None
+    if result.error and result.error not in {test.error for test in failures}:
+        if result.failed_count or not failures:
+            result.error = f"{result.failed_count} of {result.total_count} tests failed"
+        else:
+            result.error = failures[0].error
+    result.output = ""
+    return result
+
+
+class SubmissionQueue:
+    """In-memory submissions, each run by its own task once the background lane has a slot."""
+
+    def __init__(self, ttl: float = SUBMISSION_TTL_SECONDS, max_submissions: int = MAX_SUBMISSIONS):
+        self.ttl = ttl
+        self.max_submissions = max_submissions
+        self._submissions: dict[uuid.UUID, Submission] = {}
+        self._tasks: set[asyncio.Task] = set()
+        self.completed = 0
+
+    def submit(
+        self,
+        client_id: str,
+        problem_id: uuid.UUID,
+        code: str,
+        job: dict[str, Any],
+        timeout: float,
+        visible: set[str],
+        expected: float = 0.0,
+        version: int = 0,
+    ) -> Submission:
+        self.expire()
+        submission = Submission(client_id, problem_id)
+        self._submissions[submission.id] = submission
+        context = RunContext(problem_id, version, "submit", code, job, timeout)
+        task = asyncio.create_task(self._run(submission, context, visible, expected))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return submission
+
+    async def _run(
+        self,
+        submission: Submission,
+        context: RunContext,
+        visible: set[str],
+        expected: float,
+    ) -> None:
+        try:
+            async with scheduler.slot(submission.client_id, weight=SUBMIT_WEIGHT, background=True, expected=expected):
+                submission.status = "running"
+                started = time.perf_counter()
+                result = await run_in_threadpool(
+                    execute_code_secure, user_code=context.code, timeout=context.time_limit, **context.job
+                )
+                seconds = time.perf_counter() - started
+                await captures.consider(context, seconds, result)
+                concurrency.observe((submission.problem_id, "submit"), seconds, result)
+                runtime_stats.record_result((submission.problem_id, "submit"), seconds, result)
+                record_outcome(submission.problem_id, "submit", seconds, result)
+            submission.result = redact_hidden(result, visible)
+        except asyncio.CancelledError:
+            submission.result = ExecutionResult.failure("Submission was cancelled")
+            raise
+        except Exception as e:
+            logger.warning("Submission %s failed: %s", submission.id, e)
+            submission.result = ExecutionResult.failure("Submission could not be run")
+        finally:
+            submission.status = "done"
+            submission.finished_at = time.monotonic()
+            self.completed += 1
+
+    def get(self, submission_id: uuid.UUID) -> Submission | None:
+        return self._submissions.get(submission_id)
+
+    def expire(self) -> None:
+        """Forget finished submissions past their TTL, and the oldest finished ones over the cap."""
+        now = time.monotonic()
+        for key, submission in list(self._submissions.items()):
+            if submission.finished_at is not None and now - submission.finished_at > self.ttl:
+                del self._submissions[key]
+        if len(self._submissions) >= self.max_submissions:
+            finished = sorted(
+                (s for s in self._submissions.values() if s.finished_at is not None), key=lambda s: s.finished_at
+            )
+            for submission in finished[: len(self._submissions) - self.max_submissions + 1]:
+                del self._submissions[submission.id]
+
+    def cancel_all(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+
+    def metrics(self) -> dict[str, int]:
+        pending = sum(1 for s in self._submissions.values() if s.status != "done")
+        return {"pending": pending, "stored": len(self._submissions), "completed": self.completed}
+
+
+submissions = SubmissionQueue()
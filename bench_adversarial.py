@@ -0,0 +1,251 @@
+"""Benchmark how a running app holds up against hostile but valid submissions.
+
+Legitimate traffic (submissions of the starter code plus page loads) runs throughout
+three phases:
+
+    baseline   legitimate traffic only
+    attack     the same traffic while attacker threads submit resource-exhausting code
+    recovery   legitimate traffic only, until latency is back near the baseline
+
+The report compares legitimate latency across phases, samples the server's RSS from
+/metrics, and measures how long the service takes to recover once the attack stops.
+
+The scheduler rate-limits per client, so each simulated client sends its own
+X-Forwarded-For address. Run the server with a generous SUBMISSION_RATE, otherwise
+most submissions are answered with 429 (counted separately in the report).
+
+Usage:
+    python bench_adversarial.py [--url http://127.0.0.1:8000] [--problem-id UUID]
+                                [--seconds 20] [--clients 4] [--attackers 4]
+"""
+
+import argparse
+import html
+import json
+import re
+import statistics
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+
+# Hostile function bodies; each is valid code that passes validate_code
+ATTACKS = {
+    "infinite_loop": "    while True:\n        pass\n",
+    "huge_allocation": "    data = [0] * 10**10\n    return data\n",
+    "print_flood": "    while True:\n        print('x' * 10000)\n",
+    "deep_recursion": ("    def dive(n):\n        return dive(n + 1) + 1\n    return dive(0)\n"),
+    "combinatorial_explosion": ("    import itertools\n    return sum(1 for _ in itertools.permutations(range(20)))\n"),
+    "memory_growth": "    chunks = []\n    while True:\n        chunks.append(bytearray(10**7))\n",
+}
+
+# Recovery is reached when legitimate p50 latency is within this factor of the baseline
+RECOVERY_FACTOR = 1.5
+RECOVERY_TIMEOUT = 60.0
+
+
+def request(url, data=None, client="10.0.0.1", timeout=30.0):
+    """Send a request; returns (status, seconds, body)."""
+    headers = {"X-Forwarded-For": client}
+    body = None
+    if data is not None:
+        body = json.dumps(data).encode("utf-8")
+        headers["Content-Type"] = "application/json"
+    req = urllib.request.Request(url, data=body, headers=headers, method="POST" if body else "GET")
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as response:
+            payload = response.read()
+            status = response.status
+    except urllib.error.HTTPError as e:
+        payload = e.read()
+        status = e.code
+    except (urllib.error.URLError, TimeoutError, ConnectionError) as e:
+        payload = str(e).encode("utf-8")
+        status = 0
+    return status, time.perf_counter() - start, payload
+
+
+def find_problem(base_url, problem_id):
+    """Return (problem id, function name, starter code) for the given or first listed problem."""
+    if problem_id is None:
+        _, _, page = request(f"{base_url}/")
+        match = re.search(rb"/problems/([0-9a-f-]{36})", page)
+        if not match:
+            sys.exit("No problems found on the problem list; pass --problem-id")
+        problem_id = match.group(1).decode()
+    status, _, page = request(f"{base_url}/problems/{problem_id}")
+    if status != 200:
+        sys.exit(f"Problem {problem_id} not found (HTTP {status})")
+    starter = re.search(rb'<textarea\s+id="code-editor"[^>]*>(.*?)</textarea>', page, re.DOTALL)
+    starter_code = html.unescape(starter.group(1).decode()) if starter else ""
+    function = re.search(r"def (\w+)\(", starter_code)
+    if not function:
+        sys.exit("Could not find the function name in the starter code")
+    return problem_id, function.group(1), starter_code
+
+
+class Recorder:
+    """Thread-safe latency samples per (phase, kind)."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.samples = {}
+        self.statuses = {}
+        self.phase = "baseline"
+
+    def record(self, kind, status, seconds):
+        with self.lock:
+            key = (self.phase, kind)
+            self.samples.setdefault(key, []).append(seconds)
+            counts = self.statuses.setdefault(key, {})
+            counts[status] = counts.get(status, 0) + 1
+
+    def recent(self, kind, since):
+        with self.lock:
+            return list(self.samples.get((self.phase, kind), []))[since:]
+
+
+def legitimate_client(base_url, problem_id, starter_code, client, recorder, stop):
+    run_url = f"{base_url}/api/problems/{problem_id}/run"
+    while not stop.is_set():
+        status, seconds, _ = request(run_url, {"code": starter_code}, client=client)
+        recorder.record("submission", status, seconds)
+        status, seconds, _ = request(f"{base_url}/problems/{problem_id}", client=client)
+        recorder.record("page", status, seconds)
+        status, seconds, _ = request(f"{base_url}/", client=client)
+        recorder.record("list", status, seconds)
+
+
+def attacker(base_url, problem_id, function_name, client, recorder, stop):
+    run_url = f"{base_url}/api/problems/{problem_id}/run"
+    while not stop.is_set():
+        for name, body in ATTACKS.items():
+            if stop.is_set():
+                break
+            code = f"def {function_name}(*args, **kwargs):\n{body}"
+            status, seconds, _ = request(run_url, {"code": code}, client=client)
+            recorder.record(f"attack:{name}", status, seconds)
+
+
+def sample_rss(base_url, rss, stop):
+    while not stop.is_set():
+        _, _, body = request(f"{base_url}/metrics", client="127.0.0.1")
+        try:
+            process = json.loads(body)["process"]
+            rss.append((time.monotonic(), process["rss_bytes"]))
+        except (ValueError, KeyError):
+            pass
+        stop.wait(0.5)
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))] if values else 0.0
+
+
+def run(args):
+    base_url = args.url.rstrip("/")
+    problem_id, function_name, starter_code = find_problem(base_url, args.problem_id)
+    print(f"Benchmarking {base_url} with problem {problem_id} ({function_name})")
+
+    recorder = Recorder()
+    stop_legit = threading.Event()
+    stop_rss = threading.Event()
+    rss = []
+    threads = [threading.Thread(target=sample_rss, args=(base_url, rss, stop_rss), daemon=True)]
+    threads += [
+        threading.Thread(
+            target=legitimate_client,
+            args=(base_url, problem_id, starter_code, f"10.1.0.{i + 1}", recorder, stop_legit),
+            daemon=True,
+        )
+        for i in range(args.clients)
+    ]
+    for thread in threads:
+        thread.start()
+
+    phase_rss = {}
+
+    def mark(phase):
+        phase_rss[phase] = rss[-1][1] if rss else None
+        recorder.phase = phase
+        print(f"-- {phase}")
+
+    mark("baseline")
+    time.sleep(args.seconds)
+
+    mark("attack")
+    stop_attack = threading.Event()
+    attackers = [
+        threading.Thread(
+            target=attacker,
+            args=(base_url, problem_id, function_name, f"10.2.0.{i + 1}", recorder, stop_attack),
+            daemon=True,
+        )
+        for i in range(args.attackers)
+    ]
+    for thread in attackers:
+        thread.start()
+    time.sleep(args.seconds)
+    stop_attack.set()
+    for thread in attackers:
+        thread.join()
+    attack_peak_rss = max((value for _, value in rss), default=None)
+
+    mark("recovery")
+    recovery_started = time.monotonic()
+    baseline_p50 = statistics.median(recorder.samples.get(("baseline", "submission"), [0.0]) or [0.0])
+    recovered_after = None
+    seen = 0
+    while time.monotonic() - recovery_started < RECOVERY_TIMEOUT:
+        time.sleep(1.0)
+        window = recorder.recent("submission", seen)
+        seen += len(window)
+        if window and statistics.median(window) <= baseline_p50 * RECOVERY_FACTOR:
+            recovered_after = time.monotonic() - recovery_started
+            break
+    stop_legit.set()
+    stop_rss.set()
+    for thread in threads:
+        thread.join()
+    final_rss = rss[-1][1] if rss else None
+
+    print()
+    print(f"{'phase':<10} {'kind':<32} {'count':>6} {'p50 ms':>9} {'p95 ms':>9} {'max ms':>9}  statuses")
+    for (phase, kind), values in sorted(recorder.samples.items()):
+        statuses = ", ".join(f"{status}: {count}" for status, count in sorted(recorder.statuses[(phase, kind)].items()))
+        print(
+            f"{phase:<10} {kind:<32} {len(values):>6} {percentile(values, 0.5) * 1000:>9.1f} "
+            f"{percentile(values, 0.95) * 1000:>9.1f} {max(values) * 1000:>9.1f}  {statuses}"
+        )
+
+    def mib(value):
+        return f"{value / 2**20:.1f} MiB" if value is not None else "n/a"
+
+    print()
+    print(f"RSS at baseline start: {mib(phase_rss.get('baseline'))}")
+    print(f"RSS peak during attack: {mib(attack_peak_rss)}")
+    print(f"RSS after recovery:    {mib(final_rss)}")
+    if recovered_after is None:
+        print(f"Did not recover to {RECOVERY_FACTOR}x baseline submission latency within {RECOVERY_TIMEOUT:.0f}s")
+    else:
+        print(f"Recovered to {RECOVERY_FACTOR}x baseline submission latency after {recovered_after:.1f}s")
+
+    for kind in ("submission", "page", "list"):
+        before = percentile(recorder.samples.get(("baseline", kind), []), 0.95)
+        during = percentile(recorder.samples.get(("attack", kind), []), 0.95)
+        if before:
+            print(f"Legitimate {kind} p95 slowdown under attack: {during / before:.2f}x")
+    return 0 if recovered_after is not None else 1
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--problem-id")
+    parser.add_argument("--seconds", type=float, default=20.0, help="length of the baseline and attack phases")
+    parser.add_argument("--clients", type=int, default=4, help="concurrent legitimate clients")
+    parser.add_argument("--attackers", type=int, default=4, help="concurrent attacking clients")
+    sys.exit(run(parser.parse_args()))
@@ -0,0 +1,119 @@
+"""Compare executor backends by running the same submission corpus through each.
+
+The corpus is built from the problem packages: every package's starter code, and its
+reference solution when it ships one, against its full test suite (sample and hidden
+tests plus every case). Each backend first gets one untimed run, which includes starting
+its helper processes, then runs the corpus ``--rounds`` times from ``--concurrency``
+threads. The report shows throughput, per-run latency, and whether every backend
+reached the same verdicts.
+
+Usage:
+    python bench_executors.py [--backends spawn,fork-server,persistent-worker]
+                              [--rounds 5] [--concurrency 4] [--problems problems/]
+"""
+
+import argparse
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from app.executors import BACKENDS, make_backend
+from app.importer import load_packages
+
+
+def build_corpus(directory):
+    """(label, code, job) for each package's starter code and reference solution."""
+    corpus = []
+    for package in load_packages(directory):
+        problem = package["problem"]
+        test_code = problem["test_code"]
+        if problem["hidden_test_code"]:
+            test_code += "\n\n" + problem["hidden_test_code"]
+        job = {
+            "test_code": test_code,
+            "module_path": f"{problem['category'].replace('-', '_')}.{problem['function_name']}",
+            "function_name": problem["function_name"],
+            "test_cases": [(case["args"], case["expected"], case["comparison"]) for case in package["cases"]],
+        }
+        corpus.append((f"{problem['slug']}:starter", problem["starter_code"], job))
+        if problem["reference_solution"]:
+            corpus.append((f"{problem['slug']}:reference", problem["reference_solution"], job))
+    return corpus
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))] if values else 0.0
+
+
+def bench(name, corpus, rounds, concurrency, timeout):
+    backend = make_backend(name)
+    try:
+        started = time.perf_counter()
+        label, code, job = corpus[0]
+        backend.execute(code, timeout=timeout, **job)
+        first_run = time.perf_counter() - started
+
+        def timed(item):
+            label, code, job = item
+            run_started = time.perf_counter()
+            result = backend.execute(code, timeout=timeout, **job)
+            return label, result.success, result.passed_count, time.perf_counter() - run_started
+
+        items = corpus * rounds
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            runs = list(pool.map(timed, items))
+        wall = time.perf_counter() - started
+        return {
+            "first_run": first_run,
+            "wall": wall,
+            "latencies": [seconds for *_, seconds in runs],
+            "verdicts": {(label, success, passed) for label, success, passed, _ in runs},
+            "metrics": backend.metrics(),
+        }
+    finally:
+        backend.close()
+
+
+def run(args):
+    corpus = build_corpus(Path(args.problems))
+    if not corpus:
+        sys.exit(f"No problem packages found in {args.problems}")
+    names = [name.strip() for name in args.backends.split(",") if name.strip()]
+    unknown = [name for name in names if name not in BACKENDS]
+    if unknown:
+        sys.exit(f"Unknown backends: {', '.join(unknown)} (choose from {', '.join(BACKENDS)})")
+    print(f"{len(corpus)} submissions x {args.rounds} rounds, {args.concurrency} concurrent")
+
+    reports = {name: bench(name, corpus, args.rounds, args.concurrency, args.timeout) for name in names}
+
+    print()
+    print(f"{'backend':<18} {'first ms':>9} {'runs/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'max ms':>8}  metrics")
+    for name, report in reports.items():
+        latencies = report["latencies"]
+        print(
+            f"{name:<18} {report['first_run'] * 1000:>9.1f} {len(latencies) / report['wall']:>8.1f} "
+            f"{statistics.median(latencies) * 1000:>8.1f} {percentile(latencies, 0.95) * 1000:>8.1f} "
+            f"{max(latencies) * 1000:>8.1f}  {report['metrics']}"
+        )
+
+    baseline = next(iter(reports.values()))["verdicts"]
+    mismatched = [name for name, report in reports.items() if report["verdicts"] != baseline]
+    if mismatched:
+        print(f"\nVerdicts differ from {names[0]} for: {', '.join(mismatched)}")
+        return 1
+    print("\nAll backends reached the same verdicts")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--backends", default=",".join(BACKENDS))
+    parser.add_argument("--rounds", type=int, default=5, help="times the corpus is run per backend")
+    parser.add_argument("--concurrency", type=int, default=4, help="runs in flight at once")
+    parser.add_argument("--timeout", type=float, default=10.0, help="time limit per run, in seconds")
+    parser.add_argument("--problems", default=str(Path(__file__).parent / "problems"))
+    sys.exit(run(parser.parse_args()))
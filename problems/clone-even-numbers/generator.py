@@ -0,0 +1,20 @@
+def pad(values):
+    return [values + [-1] * sum(1 for v in values if v % 2 == 0)]
+
+
+def generate(rng, size):
+    values = [rng.randint(0, 20) for _ in range(rng.randint(0, size))]
+    return pad(values)
+
+
+def shrink(args):
+    arr = args[0]
+    evens = 0
+    while evens < len(arr) and arr[len(arr) - 1 - evens] == -1:
+        evens += 1
+    values = arr[: len(arr) - evens]
+    for i in range(len(values)):
+        yield pad(values[:i] + values[i + 1 :])
+    for i, v in enumerate(values):
+        if v > 1:
+            yield pad(values[:i] + [v // 2] + values[i + 1 :])
@@ -0,0 +1,15 @@
+from arrays_and_strings.clone_even_numbers import clone_even_numbers
+
+
+def test_all_even_numbers():
+    assert clone_even_numbers([2, 4, 6, -1, -1, -1]) == [2, 2, 4, 4, 6, 6]
+
+
+def test_mixed_numbers():
+    assert clone_even_numbers([1, 2, 3, 4, 5, 6, -1, -1, -1]) == [1, 2, 2, 3, 4, 4, 5, 6, 6]
+
+
+def test_large_array():
+    size = 100000
+    arr = [2] * size + [-1] * size
+    assert clone_even_numbers(arr) == [2] * (2 * size)
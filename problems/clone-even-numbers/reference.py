@@ -0,0 +1,13 @@
+def clone_even_numbers(arr):
+    write = len(arr) - 1
+    read = len(arr) - 1
+    while read >= 0 and arr[read] == -1:
+        read -= 1
+    while read >= 0:
+        arr[write] = arr[read]
+        write -= 1
+        if arr[read] % 2 == 0:
+            arr[write] = arr[read]
+            write -= 1
+        read -= 1
+    return arr
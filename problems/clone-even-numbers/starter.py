@@ -0,0 +1,3 @@
+def clone_even_numbers(arr):
+    # Your code here
+    pass
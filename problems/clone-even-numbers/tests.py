@@ -0,0 +1,17 @@
+from arrays_and_strings.clone_even_numbers import clone_even_numbers
+
+
+def test_empty_array():
+    assert clone_even_numbers([]) == []
+
+
+def test_single_odd_number():
+    assert clone_even_numbers([1]) == [1]
+
+
+def test_single_even_number():
+    assert clone_even_numbers([2, -1]) == [2, 2]
+
+
+def test_all_odd_numbers():
+    assert clone_even_numbers([1, 3, 5]) == [1, 3, 5]
@@ -0,0 +1,164 @@
+"""Test script to verify BatchWriter coalescing and its handling of rows that can't be written."""
+
+import sys
+
+from sqlalchemy.exc import IntegrityError, OperationalError
+
+from app.batch_writer import BatchWriter
+
+
+class FakeModel:
+    __tablename__ = "fake_rows"
+
+
+class FakeWriter(BatchWriter):
+    """Writes to a dict instead of the database; rows with ``bad`` set violate a constraint."""
+
+    def __init__(self, **kwargs):
+        super().__init__(FakeModel, ["id"], interval=60, **kwargs)
+        self.stored = {}
+        self.statements = 0
+        self.down = False
+
+    def _upsert(self, rows):
+        self.statements += 1
+        if self.down:
+            raise OperationalError("INSERT", {}, Exception("connection refused"))
+        if any(row.get("bad") for row in rows):
+            raise IntegrityError("INSERT", {}, Exception("foreign key violation"))
+        for row in rows:
+            stored = self.stored.get(row["id"])
+            if stored is not None and self.increment_columns:
+                row = {**row, **{column: stored[column] + row[column] for column in self.increment_columns}}
+            self.stored[row["id"]] = row
+
+
+def test_coalescing():
+    """Test that repeated writes to a key between flushes become one row, and counters add up."""
+    print("=" * 60)
+    print("Testing Coalescing")
+    print("=" * 60)
+
+    writer = FakeWriter()
+    writer.put({"id": 1, "code": "a"})
+    writer.put({"id": 1, "code": "b"})
+    writer.put({"id": 2, "code": "c"})
+    pending = writer.pending((1,))
+    written = writer.flush()
+
+    counters = FakeWriter(increment_columns=["count"])
+    counters.put({"id": 1, "count": 2})
+    counters.put({"id": 1, "count": 3})
+    counters.flush()
+    counters.put({"id": 1, "count": 1})
+    counters.flush()
+
+    checks = [
+        ("latest pending row served", pending == {"id": 1, "code": "b"}),
+        ("one row per key", written == 2 and writer.stored[1]["code"] == "b"),
+        ("coalesced writes counted", writer.coalesced == 1),
+        ("one statement per flush", writer.statements == 1),
+        ("counter deltas summed", counters.stored[1]["count"] == 6),
+    ]
+    return report(checks)
+
+
+def test_bad_row_mid_batch():
+    """Test that one row violating a constraint is dropped alone, with the rows after it written."""
+    print("=" * 60)
+    print("Testing a Bad Row Mid-Batch")
+    print("=" * 60)
+
+    writer = FakeWriter()
+    for index in range(1, 6):
+        writer.put({"id": index, "bad": index == 3})
+    written = writer.flush()
+
+    checks = [
+        ("other rows written", sorted(writer.stored) == [1, 2, 4, 5]),
+        ("written count excludes the bad row", written == 4 and writer.flushed_rows == 4),
+        ("bad row counted", writer.dropped_rows == 1 and writer.metrics()["dropped_rows"] == 1),
+        ("batch failure counted once", writer.failures == 1),
+        ("nothing left pending", writer.metrics()["pending"] == 0),
+    ]
+    return report(checks)
+
+
+def test_database_down():
+    """Test that rows are kept for the next flush when the database itself fails."""
+    print("=" * 60)
+    print("Testing Database Failures")
+    print("=" * 60)
+
+    writer = FakeWriter(increment_columns=["count"])
+    writer.put({"id": 1, "count": 1})
+    writer.put({"id": 2, "count": 1})
+    writer.down = True
+    try:
+        writer.flush()
+        raised = False
+    except OperationalError:
+        raised = True
+    writer.put({"id": 1, "count": 1})
+    writer.down = False
+    writer.flush()
+
+    # The database fails partway through the row-by-row fallback
+    fallback = FakeWriter()
+    for index in range(1, 5):
+        fallback.put({"id": index, "bad": index == 1})
+    original = fallback._upsert
+
+    def fail_after_two(rows):
+        if len(rows) == 1 and fallback.statements >= 3:
+            fallback.down = True
+        return original(rows)
+
+    fallback._upsert = fail_after_two
+    try:
+        fallback.flush()
+    except OperationalError:
+        pass
+    requeued = sorted(key for (key,) in fallback._pending)
+
+    checks = [
+        ("error raised", raised),
+        ("rows kept and counters merged", writer.stored == {1: {"id": 1, "count": 2}, 2: {"id": 2, "count": 1}}),
+        ("unwritten rows requeued after a fallback failure", requeued == [3, 4] and sorted(fallback.stored) == [2]),
+    ]
+    return report(checks)
+
+
+def report(checks: list[tuple[str, bool]]) -> bool:
+    for description, passed in checks:
+        print(f"{'✓' if passed else '✗'} {description}")
+    return all(passed for _, passed in checks)
+
+
+if __name__ == "__main__":
+    print("\n" + "=" * 60)
+    print("BATCH WRITER TEST SUITE")
+    print("=" * 60 + "\n")
+
+    results = [
+        ("Coalescing", test_coalescing()),
+        ("Bad Row Mid-Batch", test_bad_row_mid_batch()),
+        ("Database Failures", test_database_down()),
+    ]
+
+    print("\n" + "=" * 60)
+    print("TEST SUMMARY")
+    print("=" * 60)
+    for test_name, passed in results:
+        status = "✓ PASS" if passed else "✗ FAIL"
+        print(f"{status}: {test_name}")
+
+    all_passed = all(result[1] for result in results)
+    print("\n" + "=" * 60)
+    if all_passed:
+        print("✓ ALL BATCH WRITER TESTS PASSED")
+    else:
+        print("✗ SOME BATCH WRITER TESTS FAILED")
+    print("=" * 60 + "\n")
+
+    sys.exit(0 if all_passed else 1)
@@ -0,0 +1,333 @@
+"""Test script to verify the sandbox runner: its line protocol, case comparisons, reports and profiling."""
+
+import os
+import sys
+import tempfile
+import time
+
+from app.code_executor import FULL_VALUE_CHARS, MAX_FULL_VALUES, execute_code_secure, parse_test_output, profile_job
+from app.executors import BACKENDS, SpawnBackend, make_backend
+from app.fixtures import pack_fixture
+from app.results import ExecutionResult
+from app.sandbox_runner import COMPARATORS, DIFF_CONTEXT, MAX_CONTEXT_CHARS, structural_diff, value_diff
+from app.sharding import merge_results
+
+MODULE_PATH = "test.runner_test"
+# A suite of two test functions and four cases, one of each failing
+TEST_CODE = """from test.runner_test import double
+
+def test_one():
+    assert double(1) == 2
+
+def test_negative():
+    assert double(-1) == 2
+"""
+CASES = [([2], 4, "exact"), ([3], 7, "exact"), ([4], 8, "exact"), ([5], 10, "exact")]
+
+
+def test_comparators():
+    """Test each case comparison on its own, and cases run in one batch with mixed comparisons."""
+    print("=" * 60)
+    print("Testing Case Comparators")
+    print("=" * 60)
+
+    exact, unordered, approx = COMPARATORS["exact"], COMPARATORS["unordered"], COMPARATORS["approx"]
+    checks = [
+        ("exact: equal values", exact([1, [2, 3]], [1, [2, 3]])),
+        ("exact: tuples and int keys as JSON has them", exact((1, {2: "a"}), [1, {"2": "a"}])),
+        ("exact: order matters", not exact([2, 1], [1, 2])),
+        ("unordered: any order", unordered([3, 1, 2], [1, 2, 3])),
+        ("unordered: unsortable elements", unordered([{"b": 1}, 1], [1, {"b": 1}])),
+        ("unordered: duplicates count", not unordered([1, 1, 2], [1, 2, 2])),
+        ("approx: float rounding", approx(0.1 + 0.2, 0.3)),
+        ("approx: nested floats", approx({"x": [1.0000000001]}, {"x": [1.0]})),
+        ("approx: real differences", not approx(0.31, 0.3)),
+    ]
+
+    result = execute_code_secure(
+        user_code="def split(n):\n    return [n / 3] * 3 if n else [2, 1]\n",
+        test_code="",
+        module_path=MODULE_PATH,
+        function_name="split",
+        test_cases=[([1], [1 / 3] * 3, "approx"), ([0], [1, 2], "unordered"), ([0], [1, 2], "exact")],
+        timeout=5,
+    )
+    verdicts = {test.name: test.passed for test in result.test_results}
+    checks += [
+        ("batch ran every case", result.total_count == 3),
+        ("comparison chosen per case", verdicts == {"case_1": True, "case_2": True, "case_3": False}),
+    ]
+    return report(checks)
+
+
+def test_structural_diff():
+    """Test that diffs point at the first difference, say what kind it is, and stay small."""
+    print("=" * 60)
+    print("Testing Structural Diff")
+    print("=" * 60)
+
+    big = list(range(100_000))
+    changed = big[:50_000] + ["x" * 10_000] + big[50_001:]
+    value = structural_diff(changed, big)
+    length = structural_diff([1, 2], [1, 2, 3])
+    keys = structural_diff({"a": 1}, {"a": 1, "b": 2})
+    nested = structural_diff({"a": [1, "2"]}, {"a": [1, 2]})
+    unordered = value_diff([3, 1, 2], [1, 2, 4], "unordered")
+    checks = [
+        ("path to the first mismatch", value["path"] == "[50000]" and value["reason"] == "type"),
+        ("context either side", value["context_start"] == 50_000 - DIFF_CONTEXT),
+        ("context bounded", len(value["actual_context"]) == 2 * DIFF_CONTEXT + 1),
+        ("context values previewed", all(len(v) <= MAX_CONTEXT_CHARS + 30 for v in value["actual_context"])),
+        ("whole diff small", len(str(value)) < 2000),
+        ("missing element", length["reason"] == "length" and length["actual"] is None and length["expected"] == "3"),
+        ("missing keys", keys["reason"] == "keys" and keys["missing_keys"] == ["b"] and keys["extra_keys"] == []),
+        ("nested type mismatch", nested["path"] == '["a"][1]' and nested["reason"] == "type"),
+        ("unordered lists compared sorted", unordered["compared_sorted"] and unordered["path"] == "[2]"),
+        ("plain values have no diff", value_diff(1, 2) is None),
+    ]
+    return report(checks)
+
+
+def test_full_values_fit_output_limit():
+    """Test that the most full values a run may ask for, all huge, still fit the output limit."""
+    print("=" * 60)
+    print("Testing Full Values (huge values within the output limit)")
+    print("=" * 60)
+
+    size = 2 * FULL_VALUE_CHARS
+    cases = [([index], "x" * size, "exact") for index in range(MAX_FULL_VALUES)]
+    names = [f"case_{index + 1}" for index in range(MAX_FULL_VALUES)]
+    result = execute_code_secure(
+        user_code=f"def reverse(n):\n    return 'y' * {size}\n",
+        test_code="",
+        module_path=MODULE_PATH,
+        function_name="reverse",
+        test_cases=cases,
+        full_values=names,
+        timeout=10,
+    )
+
+    reported = {test.name: test for test in result.test_results}
+    problems = []
+    if result.error and result.error.startswith("Output limit exceeded"):
+        problems.append(result.error)
+    for name in names:
+        test = reported.get(name)
+        if test is None or test.actual is None:
+            problems.append(f"{name} not reported")
+        elif not test.actual.startswith("'" + "y" * (FULL_VALUE_CHARS - 1)):
+            problems.append(f"{name} value cut short ({len(test.actual)} characters)")
+        elif not test.actual.endswith(f"... ({size + 2} characters)"):
+            problems.append(f"{name} value not capped")
+
+    if problems:
+        print("✗ Full values not reported within the output limit: " + "; ".join(problems))
+        return False
+    print(f"✓ {MAX_FULL_VALUES} full values of {FULL_VALUE_CHARS} characters fit the output limit")
+    return True
+
+
+def test_line_protocol():
+    """Test that protocol lines become test results and everything else stays output, as printed."""
+    print("=" * 60)
+    print("Testing Line Protocol")
+    print("=" * 60)
+
+    output = "\n".join(
+        [
+            "Found 3 test(s)",
+            "TESTS: test_a test_b",
+            "PASSED: test_a",
+            "    indented print",
+            "",
+            "\ttabbed print  ",
+            "FAILED: test_b - assert 1 == 2",
+            "ACTUAL_VALUE: test_b - 1",
+            'DIFF: test_b - {"path": "", "reason": "value", "expected": "2", "actual": "1"}',
+            "ERROR in case_1: ValueError: bad input",
+            "",
+        ]
+    )
+    result = parse_test_output(output, False)
+    tests = {test.name: test for test in result.test_results}
+    checks = [
+        ("counts", (result.passed_count, result.failed_count, result.total_count) == (1, 2, 3)),
+        ("passed test", tests["test_a"].passed),
+        ("failed test message", tests["test_b"].error == "assert 1 == 2"),
+        ("actual value", tests["test_b"].actual == "1"),
+        ("diff", tests["test_b"].diff is not None and tests["test_b"].diff.expected == "2"),
+        ("errored case", tests["case_1"].error == "ValueError: bad input"),
+        ("output kept as printed", result.output == "    indented print\n\n\ttabbed print  "),
+        ("summary error", result.error == "2 of 3 tests failed"),
+    ]
+    return report(checks)
+
+
+def test_sharded_runs():
+    """Test that a suite split across shards merges into the result of one unsharded run."""
+    print("=" * 60)
+    print("Testing Sharded Runs")
+    print("=" * 60)
+
+    backend = SpawnBackend()
+    code = "def double(n):\n    return n * 2\n"
+    job = {"test_code": TEST_CODE, "module_path": MODULE_PATH, "function_name": "double", "test_cases": CASES}
+    whole = backend.execute(code, timeout=5, **job)
+    merged = merge_results([backend.execute(code, timeout=5, shard=(index, 3), **job) for index in range(3)])
+    # Hangs on the last case only, so one shard times out while the others fail or pass
+    hanging = "def double(n):\n    while n == 5:\n        pass\n    return n * 2\n"
+    hung = merge_results([backend.execute(hanging, timeout=1, shard=(index, 3), **job) for index in range(3)])
+    broken = merge_results([backend.execute("def double(n):\n    return n *\n", timeout=5, **job) for _ in range(3)])
+
+    def verdicts(result: ExecutionResult) -> list[tuple[str, bool]]:
+        return [(test.name, test.passed) for test in result.test_results]
+
+    checks = [
+        ("same tests in the same order", verdicts(merged) == verdicts(whole)),
+        ("same counts", (merged.passed_count, merged.failed_count, merged.total_count) == (4, 2, 6)),
+        ("same verdict", not merged.success and merged.error == whole.error == "2 of 6 tests failed"),
+        (
+            "a failure of the whole run reported once",
+            [test.name for test in broken.test_results] == ["Code validation"],
+        ),
+        ("a timed-out shard's timeout reported", hung.error == "Execution timed out after 1 seconds"),
+        ("other shards' results kept", ("test_negative", False) in verdicts(hung) and hung.passed_count >= 1),
+    ]
+    return report(checks)
+
+
+def test_backends_agree():
+    """Test that every executor backend reports the same result for a suite, and times out a hung run."""
+    print("=" * 60)
+    print("Testing Executor Backends")
+    print("=" * 60)
+
+    checks = []
+    expected = None
+    for name in BACKENDS:
+        backend = make_backend(name)
+        try:
+            prepared = backend.prepare(
+                test_code=TEST_CODE, module_path=MODULE_PATH, function_name="double", test_cases=CASES
+            )
+            try:
+                result = backend.run(prepared, "def double(n):\n    return n * 2\n", timeout=5)
+                started = time.monotonic()
+                hung = backend.run(prepared, "def double(n):\n    while True:\n        pass\n", timeout=1)
+                elapsed = time.monotonic() - started
+                again = backend.run(prepared, "def double(n):\n    return n + n\n", timeout=5)
+            finally:
+                prepared.cleanup()
+        finally:
+            backend.close()
+        summary = (result.success, result.error, [(test.name, test.passed) for test in result.test_results])
+        expected = expected or summary
+        checks += [
+            (f"{name}: same result as {list(BACKENDS)[0]}", summary == expected),
+            (f"{name}: hung run timed out", (hung.error or "").startswith("Execution timed out") and elapsed < 5),
+            (f"{name}: next run unaffected", again.model_dump() == result.model_dump()),
+        ]
+    return report(checks)
+
+
+def test_fixture_cases():
+    """Test that cases naming a fixture all get the one list it was converted to, not a copy each."""
+    print("=" * 60)
+    print("Testing Fixture Cases")
+    print("=" * 60)
+
+    # True while every case has been handed the list the first case got
+    code = "first = []\ndef total(arr):\n    first.append(arr)\n    return sum(arr) if arr is first[0] else -1\n"
+    values = list(range(100_000))
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "values.bin")
+        with open(path, "wb") as fixture:
+            fixture.write(pack_fixture(values))
+        result = execute_code_secure(
+            user_code=code,
+            test_code="",
+            module_path=MODULE_PATH,
+            function_name="total",
+            test_cases=[([{"$fixture": "values"}], sum(values), "exact")] * 20,
+            fixtures={"values": ("q", path)},
+            timeout=10,
+        )
+
+    if not result.success or result.passed_count != 20:
+        print(f"✗ Cases didn't share the fixture's list: {result.error}")
+        return False
+    print("✓ 20 cases shared one list of the fixture's values")
+    return True
+
+
+def test_profile_uses_fresh_case_args():
+    """Test that the profiling pass gets the cases' original arguments, not ones the tests mutated."""
+    print("=" * 60)
+    print("Testing Profile Case Arguments")
+    print("=" * 60)
+
+    # Sums its list, then doubles it in place; line 4 runs once per element it was given
+    code = (
+        "def total(arr):\n"
+        "    result = 0\n"
+        "    for x in arr:\n"
+        "        result += x\n"
+        "    arr.extend(arr)\n"
+        "    return result\n"
+    )
+    result = execute_code_secure(
+        user_code=code,
+        test_code="",
+        module_path=MODULE_PATH,
+        function_name="total",
+        test_cases=[([[1, 2, 3]], 6, "exact")],
+        profile=profile_job(timeout=5),
+        timeout=5,
+    )
+    hits = {line.line: line.hits for line in result.profile.lines} if result.profile else {}
+
+    if not result.success or hits.get(4) != 3:
+        print(f"✗ Profiled on mutated arguments: success={result.success}, line hits {hits}")
+        return False
+    print("✓ The profile ran on a fresh copy of the case's arguments")
+    return True
+
+
+def report(checks: list[tuple[str, bool]]) -> bool:
+    for description, passed in checks:
+        print(f"{'✓' if passed else '✗'} {description}")
+    return all(passed for _, passed in checks)
+
+
+if __name__ == "__main__":
+    print("\n" + "=" * 60)
+    print("SANDBOX RUNNER TEST SUITE")
+    print("=" * 60 + "\n")
+
+    results = [
+        ("Line Protocol", test_line_protocol()),
+        ("Case Comparators", test_comparators()),
+        ("Structural Diff", test_structural_diff()),
+        ("Full Values", test_full_values_fit_output_limit()),
+        ("Fixture Cases", test_fixture_cases()),
+        ("Profile Case Arguments", test_profile_uses_fresh_case_args()),
+        ("Sharded Runs", test_sharded_runs()),
+        ("Executor Backends", test_backends_agree()),
+    ]
+
+    print("\n" + "=" * 60)
+    print("TEST SUMMARY")
+    print("=" * 60)
+    for test_name, passed in results:
+        status = "✓ PASS" if passed else "✗ FAIL"
+        print(f"{status}: {test_name}")
+
+    all_passed = all(result[1] for result in results)
+    print("\n" + "=" * 60)
+    if all_passed:
+        print("✓ ALL SANDBOX RUNNER TESTS PASSED")
+    else:
+        print("✗ SOME SANDBOX RUNNER TESTS FAILED")
+    print("=" * 60 + "\n")
+
+    sys.exit(0 if all_passed else 1)
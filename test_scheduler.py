@@ -0,0 +1,293 @@
+"""Test script to verify rate limiting, fair scheduling and adaptive concurrency of submissions."""
+
+import asyncio
+import inspect
+import sys
+import time
+import uuid
+
+import app.concurrency
+from app.concurrency import ConcurrencyLimiter
+from app.results import ExecutionResult
+from app.runtime_stats import runtime_stats
+from app.scheduler import FairScheduler, RateLimiter, RejectedError
+
+
+def test_rate_limiter():
+    """Test that each client gets its burst, then waits for refills, independently of others."""
+    print("=" * 60)
+    print("Testing Rate Limiter")
+    print("=" * 60)
+
+    limiter = RateLimiter(rate=10.0, burst=3)
+    burst = [limiter.take("a") for _ in range(3)]
+    limited = limiter.take("a")
+    other = limiter.take("b")
+    time.sleep(0.15)
+    refilled = limiter.take("a")
+
+    # Admission takes its tokens from a limiter of its own
+    scheduler = FairScheduler(slots=1, rate=10.0, burst=2)
+    admitted = [admit(scheduler, "a") for _ in range(3)] + [admit(scheduler, "b")]
+
+    checks = [
+        ("burst allowed", burst == [0.0, 0.0, 0.0]),
+        ("limited past the burst", 0 < limited <= 0.1),
+        ("other clients unaffected", other == 0.0),
+        ("allowed again after a refill", refilled == 0.0),
+        ("limited requests counted", limiter.limited == 1),
+        ("submissions limited past the burst", admitted == ["admitted", "admitted", "rate_limited", "admitted"]),
+        ("limited submissions counted", scheduler.metrics()["rejected"]["rate_limited"] == 1),
+    ]
+    return report(checks)
+
+
+def test_fair_order():
+    """Test that a client with several queued runs doesn't hold up one who just arrived."""
+    print("=" * 60)
+    print("Testing Fair Queueing")
+    print("=" * 60)
+
+    async def scenario() -> tuple[list[str], int]:
+        scheduler = FairScheduler(slots=1)
+        order = []
+
+        async def run(client_id: str, name: str) -> None:
+            async with scheduler.slot(client_id):
+                order.append(name)
+                await asyncio.sleep(0)
+
+        await scheduler.acquire("holder")
+        tasks = [asyncio.create_task(run("a", f"a{index}")) for index in range(1, 4)]
+        await asyncio.sleep(0)
+        tasks.append(asyncio.create_task(run("b", "b1")))
+        await asyncio.sleep(0)
+        queued = scheduler.queued
+        scheduler.release()
+        await asyncio.gather(*tasks)
+        return order, queued
+
+    order, queued = asyncio.run(scenario())
+    checks = [
+        ("all runs queued behind the busy slot", queued == 4),
+        ("late client served after one run of the busy client", order == ["a1", "b1", "a2", "a3"]),
+    ]
+    return report(checks)
+
+
+def test_queue_limits():
+    """Test that admission turns away clients with too much queued, and too many submissions overall."""
+    print("=" * 60)
+    print("Testing Queue Limits")
+    print("=" * 60)
+
+    async def scenario() -> list[str]:
+        scheduler = FairScheduler(slots=1, rate=100.0, burst=100, max_queue=3, max_queue_per_client=2)
+        await scheduler.acquire("holder")
+        waiting = [asyncio.create_task(scheduler.acquire(client)) for client in ("a", "a", "b")]
+        await asyncio.sleep(0)
+        outcomes = [admit(scheduler, "a"), admit(scheduler, "c")]
+        for task in waiting:
+            task.cancel()
+        await asyncio.gather(*waiting, return_exceptions=True)
+        outcomes.append(admit(scheduler, "c"))
+        return outcomes
+
+    outcomes = asyncio.run(scenario())
+    checks = [
+        ("client over its own limit refused", outcomes[0] == "queue_full"),
+        ("anyone refused once the queue is full", outcomes[1] == "queue_full"),
+        ("admitted again once cancelled waits left the queue", outcomes[2] == "admitted"),
+    ]
+    return report(checks)
+
+
+def test_admission_on_event_loop():
+    """Test that the routes admit submissions on the event loop, where the scheduler's state changes."""
+    print("=" * 60)
+    print("Testing Admission on the Event Loop")
+    print("=" * 60)
+
+    from app.routes import admit_background_submission, admit_submission
+
+    checks = [
+        ("interactive admission is async", inspect.iscoroutinefunction(admit_submission)),
+        ("background admission is async", inspect.iscoroutinefunction(admit_background_submission)),
+    ]
+    return report(checks)
+
+
+def test_shedding():
+    """Test that heavy runs are shed when heavy work fills its slots or the wait is too long, light ones never."""
+    print("=" * 60)
+    print("Testing Load Shedding")
+    print("=" * 60)
+
+    async def scenario() -> dict[str, str]:
+        outcomes = {}
+        # One of two slots kept for light work, and a heavy run already holds the other
+        scheduler = FairScheduler(slots=2, rate=100.0, burst=100, reserved_slots=1, shed_wait=5.0)
+        await scheduler.acquire("a", expected=2.0, heavy=True)
+        outcomes["heavy slots full"] = admit(scheduler, "b", heavy=True)
+        outcomes["light beside heavy"] = admit(scheduler, "b")
+        scheduler.release(expected=2.0, heavy=True)
+        outcomes["heavy slot freed"] = admit(scheduler, "b", heavy=True)
+
+        # A long backlog of light work holds the only slot
+        scheduler = FairScheduler(slots=1, rate=100.0, burst=100, reserved_slots=0, shed_wait=5.0)
+        await scheduler.acquire("a", expected=10.0)
+        try:
+            scheduler.admit("b", expected=3.0, heavy=True)
+        except RejectedError as e:
+            outcomes["long wait"] = f"{e.reason} {e.retry_after}"
+        outcomes["light in a long wait"] = admit(scheduler, "b")
+        outcomes["overloaded counted"] = str(scheduler.metrics()["rejected"]["overloaded"])
+        return outcomes
+
+    outcomes = asyncio.run(scenario())
+    checks = [
+        ("heavy run shed while heavy work fills its slots", outcomes["heavy slots full"] == "overloaded"),
+        ("light run admitted beside heavy work", outcomes["light beside heavy"] == "admitted"),
+        ("heavy run admitted once its slot is free", outcomes["heavy slot freed"] == "admitted"),
+        (
+            "heavy run shed past the wait threshold, retry after the wait",
+            outcomes.get("long wait") == "overloaded 10.0",
+        ),
+        ("light run admitted whatever the wait", outcomes["light in a long wait"] == "admitted"),
+        ("shed runs counted", outcomes["overloaded counted"] == "1"),
+    ]
+    return report(checks)
+
+
+def test_background_waits():
+    """Test that background waits are recorded on their own lane and inform its wait estimate."""
+    print("=" * 60)
+    print("Testing Background Lane Waits")
+    print("=" * 60)
+
+    async def scenario() -> tuple[dict, float]:
+        scheduler = FairScheduler(slots=1, background_slots=1)
+        # An interactive run holds the only slot while background work queues behind it
+        await scheduler.acquire("a", expected=0.01)
+        waiting = asyncio.create_task(scheduler.acquire("b", background=True))
+        await asyncio.sleep(0.2)
+        scheduler.release(expected=0.01)
+        await waiting
+        # No expected runtimes, so the backlog alone would say the next one is due at once
+        queued = asyncio.create_task(scheduler.acquire("c", background=True))
+        await asyncio.sleep(0)
+        estimate = scheduler.expected_wait(background=True)
+        scheduler.release(background=True)
+        await queued
+        scheduler.release(background=True)
+        return scheduler.metrics(), estimate
+
+    metrics, estimate = asyncio.run(scenario())
+    interactive = metrics["queue_wait_seconds"]
+    background = metrics["background_queue_wait_seconds"]
+    checks = [
+        ("interactive wait recorded on its lane", interactive["count"] == 1 and interactive["max"] == 0.0),
+        ("background waits recorded on their lane", background["count"] == 2),
+        ("queued background wait measured", background["max"] >= 0.15),
+        ("estimate follows observed waits", estimate >= 0.15),
+    ]
+    return report(checks)
+
+
+def test_adaptive_concurrency():
+    """Test that slots grow by one while saturated and healthy, and shrink by a share under pressure."""
+    print("=" * 60)
+    print("Testing Adaptive Concurrency")
+    print("=" * 60)
+
+    pressure = {"cpu": 0.0, "memory": 0.5}
+    originals = app.concurrency.cpu_pressure, app.concurrency.memory_pressure
+    app.concurrency.cpu_pressure = lambda: pressure["cpu"]
+    app.concurrency.memory_pressure = lambda: pressure["memory"]
+    try:
+        scheduler = FairScheduler(slots=4)
+        limiter = ConcurrencyLimiter(scheduler, minimum=2, maximum=5)
+        idle = limiter.adjust()
+        asyncio.run(fill(scheduler))
+        grown = [limiter.adjust() for _ in range(3)]
+
+        pressure["cpu"] = 0.9
+        cut = limiter.adjust()
+        pressure["cpu"] = 0.0
+
+        # Runs taking three times their problem's usual runtime
+        key = (uuid.uuid4(), "run")
+        runtime_stats.record(key, 0.2)
+        for _ in range(3):
+            limiter.observe(key, 0.6, ExecutionResult(success=True))
+        slow = limiter.adjust()
+
+        pressure["memory"] = 0.95
+        floor = [limiter.adjust() for _ in range(3)]
+        metrics = limiter.metrics()
+    finally:
+        app.concurrency.cpu_pressure, app.concurrency.memory_pressure = originals
+
+    checks = [
+        ("unchanged while idle", idle == 4),
+        ("one more slot per saturated interval, up to the maximum", grown == [5, 5, 5]),
+        ("cut under CPU pressure", cut == 3),
+        ("cut when runs slow down", slow == 2),
+        ("never below the minimum, even under memory pressure", floor == [2, 2, 2]),
+        ("scheduler follows the limit", scheduler.slots == 2),
+        ("adjustments counted", metrics["increases"] == 1 and metrics["decreases"] == 2),
+        ("signals reported", metrics["signals"] == {"latency": None, "cpu": 0.0, "memory": 0.95}),
+    ]
+    return report(checks)
+
+
+async def fill(scheduler: FairScheduler) -> None:
+    for _ in range(scheduler.slots):
+        await scheduler.acquire("a")
+
+
+def admit(scheduler: FairScheduler, client_id: str, heavy: bool = False) -> str:
+    try:
+        scheduler.admit(client_id, heavy=heavy)
+    except RejectedError as e:
+        return e.reason
+    return "admitted"
+
+
+def report(checks: list[tuple[str, bool]]) -> bool:
+    for description, passed in checks:
+        print(f"{'✓' if passed else '✗'} {description}")
+    return all(passed for _, passed in checks)
+
+
+if __name__ == "__main__":
+    print("\n" + "=" * 60)
+    print("SCHEDULER TEST SUITE")
+    print("=" * 60 + "\n")
+
+    results = [
+        ("Rate Limiter", test_rate_limiter()),
+        ("Fair Queueing", test_fair_order()),
+        ("Queue Limits", test_queue_limits()),
+        ("Load Shedding", test_shedding()),
+        ("Admission on the Event Loop", test_admission_on_event_loop()),
+        ("Background Lane Waits", test_background_waits()),
+        ("Adaptive Concurrency", test_adaptive_concurrency()),
+    ]
+
+    print("\n" + "=" * 60)
+    print("TEST SUMMARY")
+    print("=" * 60)
+    for test_name, passed in results:
+        status = "✓ PASS" if passed else "✗ FAIL"
+        print(f"{status}: {test_name}")
+
+    all_passed = all(result[1] for result in results)
+    print("\n" + "=" * 60)
+    if all_passed:
+        print("✓ ALL SCHEDULER TESTS PASSED")
+    else:
+        print("✗ SOME SCHEDULER TESTS FAILED")
+    print("=" * 60 + "\n")
+
+    sys.exit(0 if all_passed else 1)
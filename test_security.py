@@ -2,6 +2,8 @@
 
 import sys
 from app.code_executor import validate_code, execute_code_secure
+from app.results import ExecutionResult, TestResult
+from app.submissions import HIDDEN_TEST_ERROR, OTHER_EXCEPTION, redact_hidden
 
 # Test cases that should be BLOCKED
 MALICIOUS_TESTS = [
@@ -31,6 +33,19 @@ MALICIOUS_TESTS = [
     ("import sys; sys.path.insert(0, '/'); import os", "Path manipulation"),
     # Indirect imports
     ("import importlib; importlib.import_module('os')", "Importlib usage"),
+    # The runner's own state
+    ("import __main__; __main__.SANDBOX_DIR", "Runner module import"),
+    ("from __main__ import run_test_functions", "Import from runner module"),
+    ("import builtins; builtins.open('/etc/passwd')", "Builtins module import"),
+    ("try:\n    1 / 0\nexcept Exception as e:\n    e.__traceback__.tb_frame.f_back", "Frame walk from a traceback"),
+    ("def f(): pass\nf.__globals__", "Function globals"),
+    ("getattr((x for x in []), 'gi_frame')", "Getattr on a frame attribute"),
+    ("object.__subclasses__()", "Subclass enumeration"),
+    ("import collections\ngetattr(collections, '_s' + 'ys')", "Getattr with a computed name"),
+    ("import collections\ncollections._sys", "Private attribute of a module"),
+    ("import typing\ntyping.sys._getframe(1)", "Sys through another module"),
+    ("import collections as c\nvars(c)", "Vars on a module"),
+    ("from collections import _sys", "Import of a private name"),
 ]
 
 # Test cases that should be ALLOWED (legitimate code)
@@ -43,6 +58,9 @@ LEGITIMATE_TESTS = [
     ("x = isinstance(5, int)", "Isinstance usage"),
     ("x = type(5)", "Type usage"),
     ("x = callable(len)", "Callable usage"),
+    ("x = getattr([], 'append', None)", "Getattr with a constant name"),
+    ("class Node:\n    def __init__(self):\n        self._next = None", "Private attributes of own objects"),
+    ("from collections import deque\nq = deque()", "Import from an allowed module"),
 ]
 
 
@@ -132,16 +150,242 @@ def test_timeout():
         timeout=2,  # Short timeout for testing
     )
 
-    if "timed out" in result.get("error", "").lower() or result.get("error", "").startswith("Execution timed out"):
+    error = result.error or ""
+    if "timed out" in error.lower() or error.startswith("Execution timed out"):
         print("✓ Infinite loop was properly timed out")
         return True
     else:
         print("✗ Infinite loop was not timed out properly")
-        print(f"  Error: {result.get('error', 'No error message')}")
-        print(f"  Output: {result.get('output', 'No output')[:200]}")
+        print(f"  Error: {result.error or 'No error message'}")
+        print(f"  Output: {result.output[:200] or 'No output'}")
         return False
 
 
+# Each tries to read the hidden tests from the runner's frames, and otherwise passes
+FRAME_WALKS = [
+    (
+        "collections._sys with a computed attribute name",
+        "import collections\n"
+        "def leak(depth):\n"
+        '    return getattr(collections._sys._getframe(depth), "f_" + "locals")["job"]["test_code"]\n',
+    ),
+    (
+        "sys reached through typing",
+        "import typing\ndef leak(depth):\n    return typing.sys._getframe(depth).f_locals['job']['test_code']\n",
+    ),
+    (
+        "a module aliased to a plain name",
+        "import collections\n"
+        "module = collections\n"
+        "def leak(depth):\n"
+        "    frame = module._sys._getframe(depth)\n"
+        "    return frame.f_locals['job']['test_code']\n",
+    ),
+    (
+        "a module's dict",
+        "import collections\n"
+        "def leak(depth):\n"
+        "    return vars(collections)['_sys']._getframe(depth).f_locals['job']['test_code']\n",
+    ),
+    (
+        "a traceback",
+        "def leak(depth):\n"
+        "    try:\n"
+        "        raise ValueError\n"
+        "    except ValueError as e:\n"
+        "        frame = e.__traceback__.tb_frame\n"
+        "    for _ in range(depth):\n"
+        "        frame = frame.f_back\n"
+        "    return frame.f_locals['job']['test_code']\n",
+    ),
+]
+FRAME_WALK_SOLUTION = """
+def clone_even_numbers(arr):
+    for depth in range(1, 12):
+        try:
+            print(leak(depth))
+            break
+        except Exception:
+            pass
+    return arr * 2
+"""
+
+
+def test_hidden_tests_unreachable():
+    """Test that no sandbox file holds the tests or reference solution, and frame walks to the job are refused."""
+    print("=" * 60)
+    print("Testing Hidden Test Isolation (no job file, no frame walks)")
+    print("=" * 60)
+
+    from app.code_executor import stress_job
+    from app.executors import BACKENDS, make_backend
+
+    test_code = """from test.hidden_test import clone_even_numbers
+
+def test_hidden_secret():
+    assert clone_even_numbers([42]) == [42, 42]
+"""
+    reference = "def clone_even_numbers(arr):\n    reference_secret = arr * 2\n    return reference_secret\n"
+    generator = "def generate(rng, size):\n    return [[rng.randint(0, 9) for _ in range(size)]]\n"
+    stress = stress_job(reference, generator, timeout=1, seed=1)
+    secrets = ("test_hidden_secret", "reference_secret")
+    leaks = []
+    for name in BACKENDS:
+        backend = make_backend(name)
+        prepared = backend.prepare(
+            test_code=test_code, module_path="test.hidden_test", function_name="clone_even_numbers", stress=dict(stress)
+        )
+        try:
+            files = [path for path in prepared.path.rglob("*") if path.is_file()]
+            for path in files:
+                if any(secret in path.read_text() for secret in secrets):
+                    leaks.append(f"{name}: {path.name}")
+            result = backend.run(prepared, "def clone_even_numbers(arr):\n    return arr * 2\n", timeout=5)
+            if not result.success:
+                leaks.append(f"{name}: run failed ({result.error})")
+            for description, walk in FRAME_WALKS:
+                result = backend.run(prepared, walk + FRAME_WALK_SOLUTION, timeout=5)
+                if any(secret in result.model_dump_json() for secret in secrets):
+                    leaks.append(f"{name}: tests read through {description}")
+        finally:
+            prepared.cleanup()
+            backend.close()
+
+    if leaks:
+        print("✗ Tests reachable from the sandbox or not run:")
+        for leak in leaks:
+            print(f"  {leak}")
+        return False
+    print(f"✓ No sandbox file holds the tests, and {len(FRAME_WALKS)} frame walks failed on {len(BACKENDS)} backends")
+    return True
+
+
+def test_worker_isolation():
+    """Test that a job on a persistent worker can't change the verdict of the next one."""
+    print("=" * 60)
+    print("Testing Worker Isolation (a job can't tamper with later jobs)")
+    print("=" * 60)
+
+    from app.executors import PersistentWorkerBackend
+
+    test_code = """from test.worker_test import clone_even_numbers
+
+def test_clone():
+    assert clone_even_numbers([2]) == [2, 2]
+"""
+    # Patches the runner so every test passes; started without validation, as if it had slipped through
+    tampering = """import __main__
+__main__.run_test_functions = lambda namespace, names, *args: [print("PASSED: " + name) for name in names]
+def clone_even_numbers(arr):
+    return arr
+"""
+    wrong = "def clone_even_numbers(arr):\n    return None\n"
+
+    backend = PersistentWorkerBackend(pool_size=1)
+    try:
+        prepared = backend.prepare(test_code=test_code, module_path="test.worker_test")
+        try:
+            prepared.write_code(tampering)
+            backend.start(prepared, timeout=5).result()
+            result = backend.run(prepared, wrong, timeout=5)
+        finally:
+            prepared.cleanup()
+    finally:
+        backend.close()
+
+    if backend.started != 1:
+        print(f"✗ The second job didn't reuse the worker ({backend.started} started)")
+        return False
+    if result.success:
+        print("✗ Wrong code passed after an earlier job patched the worker")
+        return False
+    print("✓ The next job on the same worker was judged on its own code")
+    return True
+
+
+def test_session_markers():
+    """Test that code printing a warm sandbox's end-of-run markers can't end or shift its runs."""
+    print("=" * 60)
+    print("Testing Session Markers (printed markers don't end a run)")
+    print("=" * 60)
+
+    from app.sessions import WarmSandbox
+
+    test_code = """from test.session_test import clone_even_numbers
+
+def test_clone():
+    assert clone_even_numbers([2]) == [2, 2]
+"""
+    faking = (
+        'def clone_even_numbers(arr):\n    print("TIMEOUT")\n    print("DONE 0")\n    print("DONE x")\n    return arr\n'
+    )
+    correct = "def clone_even_numbers(arr):\n    return arr * 2\n"
+    wrong = "def clone_even_numbers(arr):\n    return arr\n"
+
+    sandbox = WarmSandbox(test_code, "test.session_test")
+    try:
+        verdicts = [sandbox.run(code, timeout=5).success for code in (faking, correct, wrong)]
+    finally:
+        sandbox.close()
+
+    if verdicts != [False, True, False]:
+        print(f"✗ Runs misjudged after printing markers: {verdicts} (expected [False, True, False])")
+        return False
+    print("✓ Printed markers were treated as output, and later runs got their own verdicts")
+    return True
+
+
+def test_submit_redaction():
+    """Test that Submit results give nothing away beyond pass/fail and exception types."""
+    print("=" * 60)
+    print("Testing Submit Redaction (hidden details and messages removed)")
+    print("=" * 60)
+
+    result = ExecutionResult(
+        success=False,
+        error="5 of 7 tests failed",
+        test_results=[
+            TestResult(name="test_sample", passed=False, error="ValueError: def test_hidden(): ...", actual="[1]"),
+            TestResult(name="test_visible", passed=False, error="assert [1] == [2]", actual="[1]"),
+            TestResult(name="test_custom", passed=False, error="Hidden_42_42: stashed by a hidden test"),
+            TestResult(name="test_dotted", passed=False, error="json.JSONDecodeError: Expecting value"),
+            TestResult(name="test_hidden", passed=False, error="Expected [42, 42]", actual="[42]"),
+            TestResult(name="test_slow", passed=False, error="Execution timed out after 5 seconds"),
+            TestResult(name="test_passing", passed=True),
+        ],
+        output="def test_hidden(): ...",
+        passed_count=1,
+        failed_count=5,
+        total_count=7,
+    )
+    redacted = redact_hidden(result, {"test_sample", "test_visible", "test_custom", "test_dotted", "test_passing"})
+    errors = {test.name: test.error for test in redacted.test_results}
+    expected = {
+        "test_sample": "ValueError",
+        "test_visible": "AssertionError",
+        "test_custom": OTHER_EXCEPTION,
+        "test_dotted": OTHER_EXCEPTION,
+        "test_hidden": HIDDEN_TEST_ERROR,
+        "test_slow": "Execution timed out after 5 seconds",
+        "test_passing": None,
+    }
+    problems = []
+    if errors != expected:
+        problems.append(f"errors {errors}")
+    if any(test.actual is not None for test in redacted.test_results):
+        problems.append("actual values kept")
+    if redacted.output:
+        problems.append("output kept")
+    if redacted.error != "5 of 7 tests failed":
+        problems.append(f"error {redacted.error!r}")
+
+    if problems:
+        print("✗ Submit result not redacted: " + "; ".join(problems))
+        return False
+    print("✓ Visible failures reduced to builtin exception types, hidden ones to pass/fail")
+    return True
+
+
 if __name__ == "__main__":
     print("\n" + "=" * 60)
     print("SECURITY TEST SUITE")
@@ -161,6 +405,22 @@ if __name__ == "__main__":
     results.append(("Timeout Protection", test_execution_timeout()))
     print("\n")
 
+    # Test 4: No sandbox file holds the tests, and frame walks can't read them
+    results.append(("Hidden Test Isolation", test_hidden_tests_unreachable()))
+    print("\n")
+
+    # Test 5: Persistent workers don't carry state between jobs
+    results.append(("Worker Isolation", test_worker_isolation()))
+    print("\n")
+
+    # Test 6: Submit results are redacted
+    results.append(("Submit Redaction", test_submit_redaction()))
+    print("\n")
+
+    # Test 7: Warm sandbox runs end only on the host's markers
+    results.append(("Session Markers", test_session_markers()))
+    print("\n")
+
     # Summary
     print("=" * 60)
     print("TEST SUMMARY")
@@ -0,0 +1,132 @@
+"""Test script to verify the shared result and job cache keys, versions and eviction."""
+
+import os
+import sys
+import tempfile
+import uuid
+
+from app.routes import result_cache_key
+from app.shared_cache import SharedCache
+
+CODE = "def clone_even_numbers(arr):\n    return arr\n"
+
+
+def test_result_cache_key():
+    """Test that result keys separate problems and runs but not identical ones."""
+    print("=" * 60)
+    print("Testing Result Cache Keys")
+    print("=" * 60)
+
+    problem, other = uuid.uuid4(), uuid.uuid4()
+    key = result_cache_key(problem, CODE, ["test_a"], 5.0)
+    checks = [
+        ("same run, same key", result_cache_key(problem, CODE, ["test_a"], 5.0) == key),
+        ("other problem, other key", result_cache_key(other, CODE, ["test_a"], 5.0) != key),
+        ("other code, other key", result_cache_key(problem, CODE + "\n", ["test_a"], 5.0) != key),
+        ("other time limit, other key", result_cache_key(problem, CODE, ["test_a"], 7.5) != key),
+        ("other full values, other key", result_cache_key(problem, CODE, [], 5.0) != key),
+        ("random code isn't cached", result_cache_key(problem, "import random\n" + CODE, [], 5.0) is None),
+        ("unparsable code isn't cached", result_cache_key(problem, "def f(:\n", [], 5.0) is None),
+    ]
+    return report(checks)
+
+
+def test_versions():
+    """Test that an entry is only read back at the version it was stored at."""
+    print("=" * 60)
+    print("Testing Shared Cache Versions")
+    print("=" * 60)
+
+    with tempfile.TemporaryDirectory() as directory:
+        cache = SharedCache(os.path.join(directory, "cache.db"), 1024 * 1024)
+        cache.put("job", "p1", 1, {"tests": 1})
+        hit = cache.get("job", "p1", 1)
+        stale = cache.get("job", "p1", 2)
+        cache.put("job", "p1", 2, {"tests": 2})
+        replaced = cache.get("job", "p1", 2)
+        old = cache.get("job", "p1", 1)
+        other_namespace = cache.get("result", "p1", 2)
+        checks = [
+            ("hit at the stored version", hit == {"tests": 1}),
+            ("miss at a newer version", stale is None),
+            ("newer version replaces the entry", replaced == {"tests": 2}),
+            ("old version no longer read", old is None),
+            ("namespaces kept apart", other_namespace is None),
+            ("stale read counted", cache.stale == 2),
+            ("disabled cache always misses", SharedCache("", 1024).get("job", "p1", 1) is None),
+        ]
+    return report(checks)
+
+
+def test_eviction():
+    """Test that the cache stays under its size bound, dropping least recently read entries first."""
+    print("=" * 60)
+    print("Testing Shared Cache Eviction")
+    print("=" * 60)
+
+    with tempfile.TemporaryDirectory() as directory:
+        cache = SharedCache(os.path.join(directory, "cache.db"), 20_000)
+        value = "x" * 1000
+        for index in range(15):
+            cache.put("result", f"k{index}", 1, value)
+        size, evicted = cache.metrics()["bytes"], cache.evictions
+        # As if k0, the oldest entry, had just been read (reads only rewrite stale access times)
+        cache._connect().execute("UPDATE entries SET accessed = accessed + 3600 WHERE key LIKE '%:k0'")
+        for index in range(15, 25):
+            cache.put("result", f"k{index}", 1, value)
+        metrics = cache.metrics()
+        checks = [
+            ("nothing evicted under the bound", size <= 20_000 and evicted == 0),
+            ("stays under the bound", metrics["bytes"] <= 20_000),
+            ("evicted entries", cache.evictions > 0),
+            ("least recently read goes first", cache.get("result", "k1", 1) is None),
+            ("recently read entry kept", cache.get("result", "k0", 1) == value),
+            ("newest entries kept", cache.get("result", "k24", 1) == value),
+            ("size total matches the entries", metrics["bytes"] == total_size(cache)),
+            ("oversized entries dropped", put_oversized(cache)),
+        ]
+    return report(checks)
+
+
+def total_size(cache: SharedCache) -> int:
+    return cache._connect().execute("SELECT coalesce(sum(size), 0) FROM entries").fetchone()[0]
+
+
+def put_oversized(cache: SharedCache) -> bool:
+    cache.put("result", "huge", 1, "x" * cache.max_bytes)
+    return cache.get("result", "huge", 1) is None
+
+
+def report(checks: list[tuple[str, bool]]) -> bool:
+    for description, passed in checks:
+        print(f"{'✓' if passed else '✗'} {description}")
+    return all(passed for _, passed in checks)
+
+
+if __name__ == "__main__":
+    print("\n" + "=" * 60)
+    print("SHARED CACHE TEST SUITE")
+    print("=" * 60 + "\n")
+
+    results = [
+        ("Result Cache Keys", test_result_cache_key()),
+        ("Versions", test_versions()),
+        ("Eviction", test_eviction()),
+    ]
+
+    print("\n" + "=" * 60)
+    print("TEST SUMMARY")
+    print("=" * 60)
+    for test_name, passed in results:
+        status = "✓ PASS" if passed else "✗ FAIL"
+        print(f"{status}: {test_name}")
+
+    all_passed = all(result[1] for result in results)
+    print("\n" + "=" * 60)
+    if all_passed:
+        print("✓ ALL SHARED CACHE TESTS PASSED")
+    else:
+        print("✗ SOME SHARED CACHE TESTS FAILED")
+    print("=" * 60 + "\n")
+
+    sys.exit(0 if all_passed else 1)